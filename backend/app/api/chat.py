@@ -4,16 +4,17 @@ from __future__ import annotations
 import logging
 from typing import Optional
 
-from fastapi import APIRouter, HTTPException, Query, Path
-from google.cloud.firestore import Client
+from fastapi import APIRouter, Body, HTTPException, Query, Path
 
 from ..firestore_db import get_db
-from ..schemas import ChatMessageCreate, ChatMessageOut, ChatMessageUpdate, ChatMessageEdit
+from ..schemas import BULK_MAX_ROWS, BulkMutationOut, BulkWriteOut, ChatConversationStatusUpdate, ChatMessageCreate, ChatMessageOut, ChatMessageUpdate, ChatMessageEdit
 from ..service.chat_service import (
     create_chat_message,
+    create_chat_messages_bulk,
     get_chat_messages,
     get_conversations,
     update_message_status,
+    update_conversation_status,
     get_chat_message_by_id
 )
 from ..service.chat_service import delete_chat_message, update_chat_message
@@ -39,6 +40,22 @@ def send_message(payload: ChatMessageCreate) -> dict:
         raise HTTPException(status_code=500, detail=f"Failed to create chat message: {str(e)}")
 
 
+@router.post("/messages/bulk", response_model=BulkWriteOut, summary="Send many chat messages")
+def send_messages(
+    payloads: list[ChatMessageCreate] = Body(..., min_length=1, max_length=BULK_MAX_ROWS)
+) -> BulkWriteOut:
+    """Create chat messages in batched commits; results are returned per row, in request order."""
+    try:
+        with get_db() as db:
+            results = create_chat_messages_bulk(db, payloads)
+            succeeded = sum(1 for r in results if r["ok"])
+            logger.info(f"Bulk created {succeeded}/{len(results)} chat messages")
+            return {"succeeded": succeeded, "failed": len(results) - succeeded, "results": results}
+    except Exception as e:
+        logger.error(f"Failed to bulk create chat messages: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to bulk create chat messages: {str(e)}")
+
+
 @router.get("/messages", summary="Get chat messages")
 def get_messages(
     conversation_id: Optional[str] = Query(None, description="Filter by conversation ID"),
@@ -60,6 +77,20 @@ def get_messages(
         raise HTTPException(status_code=500, detail=f"Failed to get chat messages: {str(e)}")
 
 
+@router.patch("/messages", response_model=BulkMutationOut, summary="Update status of a conversation's messages")
+def update_messages_status(
+    payload: ChatConversationStatusUpdate,
+    conversation_id: str = Query(..., min_length=1, max_length=100, description="Conversation ID"),
+) -> BulkMutationOut:
+    """Advance every message in a conversation to a status, e.g. mark the whole conversation read."""
+    try:
+        with get_db() as db:
+            return update_conversation_status(db, conversation_id, payload.status)
+    except Exception as e:
+        logger.error(f"Failed to update messages in {conversation_id}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to update conversation messages: {str(e)}")
+
+
 @router.get("/messages/{message_id}", summary="Get chat message by ID")
 def get_message(
     message_id: str = Path(..., description="Message ID")
@@ -125,6 +156,19 @@ def get_recent_conversations(
         raise HTTPException(status_code=500, detail=f"Failed to get conversations: {str(e)}")
 
 
+@router.post("/conversations/{conversation_id}/read", response_model=BulkMutationOut, summary="Mark a conversation read")
+def mark_conversation_read(
+    conversation_id: str = Path(..., min_length=1, max_length=100, description="Conversation ID")
+) -> BulkMutationOut:
+    """Mark every unread message in a conversation read and recount its counters."""
+    try:
+        with get_db() as db:
+            return update_conversation_status(db, conversation_id, "read")
+    except Exception as e:
+        logger.error(f"Failed to mark conversation {conversation_id} read: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to mark conversation read: {str(e)}")
+
+
 @router.get("/messages/{conversation_id}")
 def get_conversation_messages(
     conversation_id: str,
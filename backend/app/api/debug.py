@@ -0,0 +1,75 @@
+"""Debug API endpoints (profiles and diagnostics)."""
+from __future__ import annotations
+
+import hmac
+import logging
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Path
+from fastapi.responses import PlainTextResponse
+
+from ..config.settings import get_settings
+from ..profiling import get_profile_store
+from ..firestore_queries import get_query_stats, missing_indexes, forget_missing_indexes
+
+router = APIRouter()
+logger = logging.getLogger("myvault.debug")
+
+
+def debug_access_allowed(token: Optional[str]) -> bool:
+    """Check a caller-supplied debug token against the DEBUG_TOKEN setting."""
+    settings = get_settings()
+    if settings.debug_token:
+        return bool(token) and hmac.compare_digest(token, settings.debug_token)
+    return settings.environment != "production"
+
+
+def require_debug_access(x_debug_token: Optional[str] = Header(None)) -> None:
+    if not debug_access_allowed(x_debug_token):
+        raise HTTPException(status_code=403, detail="Debug access denied")
+
+
+@router.get("/profiles", summary="List recent request profiles", dependencies=[Depends(require_debug_access)])
+def list_profiles() -> list[dict]:
+    """List profiles held in the in-memory ring, newest first."""
+    return [profile.summary() for profile in get_profile_store().list()]
+
+
+@router.get("/profiles/{profile_id}", summary="Get a request profile", dependencies=[Depends(require_debug_access)])
+def get_profile(
+    profile_id: str = Path(..., description="Profile ID (from the X-Profile-Id response header)"),
+    format: Literal["json", "collapsed"] = Query("json", description="json, or folded stacks for flame graphs"),
+):
+    """Get a full profile: call tree, per-function time and Firestore/Storage/Python split."""
+    profile = get_profile_store().get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "collapsed":
+        return PlainTextResponse(
+            profile.collapsed(),
+            headers={"Content-Disposition": f'attachment; filename="profile-{profile.id}.folded"'},
+        )
+    return profile.to_dict()
+
+
+@router.delete("/profiles", summary="Clear request profiles", dependencies=[Depends(require_debug_access)])
+def clear_profiles() -> dict:
+    get_profile_store().clear()
+    return {"message": "Profiles cleared"}
+
+
+@router.get("/queries", summary="Firestore query shape statistics", dependencies=[Depends(require_debug_access)])
+def list_query_stats(
+    top: int = Query(20, ge=1, le=200, description="Number of shapes per ranking")
+) -> dict:
+    """Slowest, most frequent and largest Firestore query shapes seen by this instance."""
+    result = get_query_stats().top(top)
+    result["missing_indexes"] = missing_indexes()
+    return result
+
+
+@router.delete("/queries", summary="Reset Firestore query statistics", dependencies=[Depends(require_debug_access)])
+def clear_query_stats() -> dict:
+    get_query_stats().clear()
+    forget_missing_indexes()
+    return {"message": "Query statistics cleared"}
@@ -2,28 +2,40 @@
 from __future__ import annotations
 
 import logging
+from calendar import monthrange
 from datetime import date
 from typing import Optional
 
-from fastapi import APIRouter, HTTPException, Query, Path
-from google.cloud.firestore import Client
+from fastapi import APIRouter, Body, HTTPException, Query, Path
 
 from ..firestore_db import get_db
 from ..schemas import (
+    BULK_MAX_ROWS,
+    BulkMutationOut,
+    BulkWriteOut,
     ExpenseCreate, 
     ExpenseOut, 
     ExpenseUpdate, 
     ExpenseCategory,
     ExpenseReport,
+    ExpenseRollingOut,
+    ExpenseSeriesOut,
+    ExpenseTrendOut,
+    ExpenseWeekdayOut,
+    Granularity,
     MonthlyReport
 )
+from ..expense_ledger import get_expense_ledger
 from ..service.expense_service import (
     create_expense,
+    create_expenses_bulk,
     get_expenses,
     update_expense,
     delete_expense,
+    delete_expenses_matching,
     get_expense_by_category_report,
-    get_monthly_report
+    get_monthly_report,
+    get_report_series
 )
 
 router = APIRouter()
@@ -43,6 +55,22 @@ def create_expense_entry(payload: ExpenseCreate) -> ExpenseOut:
         raise HTTPException(status_code=500, detail=f"Failed to create expense: {str(e)}")
 
 
+@router.post("/bulk", response_model=BulkWriteOut, summary="Create many expenses")
+def create_expense_entries(
+    payloads: list[ExpenseCreate] = Body(..., min_length=1, max_length=BULK_MAX_ROWS)
+) -> BulkWriteOut:
+    """Create expenses in batched commits; results are returned per row, in request order."""
+    try:
+        with get_db() as db:
+            results = create_expenses_bulk(db, payloads)
+            succeeded = sum(1 for r in results if r["ok"])
+            logger.info(f"Bulk created {succeeded}/{len(results)} expenses")
+            return {"succeeded": succeeded, "failed": len(results) - succeeded, "results": results}
+    except Exception as e:
+        logger.error(f"Failed to bulk create expenses: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to bulk create expenses: {str(e)}")
+
+
 @router.get("/", response_model=list[ExpenseOut], summary="Get expenses")
 def list_expenses(
     is_income: Optional[bool] = Query(None, description="Filter by income/expense type"),
@@ -63,6 +91,24 @@ def list_expenses(
         raise HTTPException(status_code=500, detail=f"Failed to list expenses: {str(e)}")
 
 
+@router.delete("/", response_model=BulkMutationOut, summary="Delete expenses matching filters")
+def delete_expense_entries(
+    is_income: Optional[bool] = Query(None, description="Filter by income/expense type"),
+    category: Optional[ExpenseCategory] = Query(None, description="Filter by category"),
+    start_date: Optional[date] = Query(None, description="Start date filter"),
+    end_date: Optional[date] = Query(None, description="End date filter"),
+) -> BulkMutationOut:
+    """Delete all matching expenses and their linked items, in 500-write batches."""
+    if is_income is None and category is None and start_date is None and end_date is None:
+        raise HTTPException(status_code=400, detail="At least one filter is required")
+    try:
+        with get_db() as db:
+            return delete_expenses_matching(db, is_income, category, start_date, end_date)
+    except Exception as e:
+        logger.error(f"Failed to bulk delete expenses: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to bulk delete expenses: {str(e)}")
+
+
 @router.get("/categories", summary="Get available expense categories")
 def get_expense_categories() -> list[str]:
     """Get list of available expense categories."""
@@ -99,6 +145,99 @@ def get_monthly_expense_report(
         raise HTTPException(status_code=500, detail=f"Failed to get monthly report: {str(e)}")
 
 
+def _check_range(start_date: Optional[date], end_date: Optional[date], max_days: Optional[int] = None) -> None:
+    if start_date and end_date and end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date is before start_date")
+    if max_days and start_date and end_date and (end_date - start_date).days >= max_days:
+        raise HTTPException(status_code=400, detail=f"Range is limited to {max_days} days")
+
+
+MONTH_PATTERN = r"^\d{4}-(0[1-9]|1[0-2])$"
+
+
+@router.get("/report/series", response_model=ExpenseSeriesOut, summary="Get expense report for a range of months")
+def get_expense_report_series(
+    from_month: str = Query(..., alias="from", pattern=MONTH_PATTERN, description="First month, YYYY-MM"),
+    to_month: str = Query(..., alias="to", pattern=MONTH_PATTERN, description="Last month, YYYY-MM"),
+    granularity: Granularity = Query("month", description="Bucket size"),
+    compare: bool = Query(False, description="Add the same buckets a year earlier (year over year)"),
+) -> ExpenseSeriesOut:
+    """Income, expense and per-category totals for every bucket in the range, in one request."""
+    from ..service.analytics_service import MAX_SERIES_DAYS
+
+    first_year, first_month = map(int, from_month.split("-"))
+    last_year, last_month = map(int, to_month.split("-"))
+    start_date = date(first_year, first_month, 1)
+    end_date = date(last_year, last_month, monthrange(last_year, last_month)[1])
+    _check_range(start_date, end_date, MAX_SERIES_DAYS)
+    try:
+        with get_db() as db:
+            return get_report_series(db, start_date, end_date, granularity, compare)
+    except Exception as e:
+        logger.error(f"Failed to get report series: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to get report series: {str(e)}")
+
+
+@router.get("/analytics/trend", response_model=ExpenseTrendOut, summary="Income and expense per day, week or month")
+def get_expense_trend(
+    granularity: Granularity = Query("month", description="Bucket size"),
+    start_date: Optional[date] = Query(None, description="Start date filter"),
+    end_date: Optional[date] = Query(None, description="End date filter"),
+    category: Optional[ExpenseCategory] = Query(None, description="Filter by category"),
+) -> ExpenseTrendOut:
+    """Totals, counts and expense amount percentiles per bucket, computed from the in-memory ledger."""
+    from ..service.analytics_service import MAX_SERIES_DAYS, expense_trend
+
+    _check_range(start_date, end_date, MAX_SERIES_DAYS if granularity == "day" else None)
+    try:
+        with get_db() as db:
+            view = get_expense_ledger().view(db)
+        return expense_trend(view, granularity, start_date, end_date, category)
+    except Exception as e:
+        logger.error(f"Failed to compute expense trend: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to compute expense trend: {str(e)}")
+
+
+@router.get("/analytics/by-weekday", response_model=ExpenseWeekdayOut, summary="Spending by day of the week")
+def get_expense_by_weekday(
+    start_date: Optional[date] = Query(None, description="Start date filter"),
+    end_date: Optional[date] = Query(None, description="End date filter"),
+    category: Optional[ExpenseCategory] = Query(None, description="Filter by category"),
+    is_income: bool = Query(False, description="Analyse income instead of expenses"),
+) -> ExpenseWeekdayOut:
+    """Totals, averages and amount percentiles per weekday, computed from the in-memory ledger."""
+    from ..service.analytics_service import expense_by_weekday
+
+    _check_range(start_date, end_date)
+    try:
+        with get_db() as db:
+            view = get_expense_ledger().view(db)
+        return expense_by_weekday(view, start_date, end_date, category, is_income)
+    except Exception as e:
+        logger.error(f"Failed to compute weekday analytics: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to compute weekday analytics: {str(e)}")
+
+
+@router.get("/analytics/rolling", response_model=ExpenseRollingOut, summary="Trailing-window income and expense sums")
+def get_expense_rolling(
+    window: int = Query(30, ge=1, le=366, description="Trailing window in days"),
+    start_date: Optional[date] = Query(None, description="First day of the series (default: a year before end_date)"),
+    end_date: Optional[date] = Query(None, description="Last day of the series (default: the latest expense)"),
+    category: Optional[ExpenseCategory] = Query(None, description="Filter by category"),
+) -> ExpenseRollingOut:
+    """Daily totals with rolling sums and daily spend percentiles, computed from the in-memory ledger."""
+    from ..service.analytics_service import MAX_SERIES_DAYS, expense_rolling
+
+    _check_range(start_date, end_date, MAX_SERIES_DAYS)
+    try:
+        with get_db() as db:
+            view = get_expense_ledger().view(db)
+        return expense_rolling(view, window, start_date, end_date, category)
+    except Exception as e:
+        logger.error(f"Failed to compute rolling totals: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to compute rolling totals: {str(e)}")
+
+
 @router.put("/{expense_id}", response_model=ExpenseOut, summary="Update expense")
 def update_expense_entry(
     expense_id: str = Path(..., description="Expense ID"),
@@ -1,16 +1,26 @@
 """File upload API endpoints."""
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import logging
+from email.utils import format_datetime, parsedate_to_datetime
 from typing import Optional
+from urllib.parse import quote
 
-from fastapi import APIRouter, HTTPException, File, UploadFile, Form, Query as FastAPIQuery
+from fastapi import APIRouter, HTTPException, File, UploadFile, Form, Request, Query as FastAPIQuery
+from fastapi.concurrency import run_in_threadpool
 
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
 
+from ..config.settings import get_settings
 from ..firestore_db import get_db
-from ..schemas import FileUploadOut, DocumentCreate
-from ..storage import upload_file, delete_file, get_file_info, generate_signed_url
+from ..firestore_queries import stream_query
+from ..profiling import profiled, profiled_iter
+from ..schemas import FileUploadOut, FileUploadManyOut, DocumentCreate, SignedUrlBatchRequest, SignedUrlBatchOut
+from ..service.file_service import store_file, store_files, delete_file_record
+from ..storage import get_file_info, generate_signed_url, get_signed_urls, stat_file, iter_file_range
+from ..storage_backends import get_storage_backend
 
 router = APIRouter()
 logger = logging.getLogger("myvault.files")
@@ -23,6 +33,57 @@ ALLOWED_DOCUMENT_TYPES = {"application/pdf", "text/plain", "application/msword",
                          "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"}
 ALLOWED_TYPES = ALLOWED_IMAGE_TYPES | ALLOWED_DOCUMENT_TYPES
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_FILES_PER_UPLOAD = 20
+# Whole request bodies per upload route (enforced before buffering by UploadSizeLimitMiddleware);
+# the overhead covers multipart headers and form fields
+FORM_OVERHEAD = 64 * 1024
+UPLOAD_BODY_LIMITS = {
+    "/upload": MAX_FILE_SIZE + FORM_OVERHEAD,
+    "/upload-many": MAX_FILE_SIZE * MAX_FILES_PER_UPLOAD + FORM_OVERHEAD,
+}
+# Content served through the proxy; storage paths are unique per upload, so a file ID's bytes never change
+CONTENT_CACHE_CONTROL = "public, max-age=86400"
+USER_FOLDERS = ["Personal", "Work", "Medical", "Financial", "Education", "Travel", "Legal", "images", "documents"]
+
+
+async def _read_upload(file: UploadFile) -> tuple[bytes, str]:
+    """Read an upload in chunks, hashing as it arrives and stopping early once it is too large."""
+    hasher = hashlib.sha256()
+    chunks = []
+    size = 0
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        size += len(chunk)
+        if size > MAX_FILE_SIZE:
+            raise HTTPException(
+                status_code=400,
+                detail=f"File size exceeds maximum allowed size of {MAX_FILE_SIZE // (1024*1024)}MB"
+            )
+        hasher.update(chunk)
+        chunks.append(chunk)
+    return b"".join(chunks), hasher.hexdigest()
+
+
+def _resolve_folder(folder: Optional[str], content_type: Optional[str]) -> str:
+    # Use user-selected folder, but validate it's reasonable
+    # Only override if user didn't specify a folder or specified an invalid one
+    if folder and folder in USER_FOLDERS:
+        return folder
+    # Fallback to type-based folder only if user selection is invalid
+    return "images" if content_type in ALLOWED_IMAGE_TYPES else "documents"
+
+
+@profiled
+def _store_upload(data: bytes, content_hash: str, **metadata) -> dict:
+    with get_db() as db:
+        file_doc, deduplicated = store_file(db, data, content_hash, **metadata)
+    return {**file_doc, "deduplicated": deduplicated}
+
+
+@profiled
+def _store_uploads(uploads: list[dict]) -> list:
+    with get_db() as db:
+        return store_files(db, uploads, max_in_flight=get_settings().upload_concurrency)
 
 
 @router.post("/upload", response_model=FileUploadOut, summary="Upload file")
@@ -45,82 +106,27 @@ async def upload_document(
                 detail=f"File type {file.content_type} not allowed. Allowed types: {', '.join(ALLOWED_TYPES)}"
             )
         
-        # Read file content
-        file_content = await file.read()
+        # Read file content, hashing it for deduplication (size is validated as it streams)
+        file_content, content_hash = await _read_upload(file)
         
-        # Validate file size
-        if len(file_content) > MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File size exceeds maximum allowed size of {MAX_FILE_SIZE // (1024*1024)}MB"
-            )
-        
-        # Use user-selected folder, but validate it's reasonable
-        # Only override if user didn't specify a folder or specified an invalid one
-        if not folder or folder not in ["Personal", "Work", "Medical", "Financial", "Education", "Travel", "Legal", "images", "documents"]:
-            # Fallback to type-based folder only if user selection is invalid
-            if file.content_type in ALLOWED_IMAGE_TYPES:
-                folder = "images"
-            elif file.content_type in ALLOWED_DOCUMENT_TYPES:
-                folder = "documents"
-            else:
-                folder = "documents"
+        folder = _resolve_folder(folder, file.content_type)
         
-        # Upload to Firebase Storage
-        from io import BytesIO
-        file_data = BytesIO(file_content)
-        
-        storage_info = upload_file(
-            file_data=file_data,
+        # Store the bytes (unless identical content is already stored) and create item/file records
+        file_doc = await run_in_threadpool(
+            _store_upload,
+            file_content,
+            content_hash,
             filename=file.filename or "unknown",
             content_type=file.content_type or "application/octet-stream",
-            folder=folder
+            folder=folder,
+            title=title,
+            content=content,
+            category=category,
+            person=person,
         )
         
-        # Create item and file records in Firestore
-        with get_db() as db:
-            from datetime import datetime, timezone
-            now = datetime.now(timezone.utc)
-            
-            # Create item document
-            item_ref = db.collection("items").document()
-            item_doc = {
-                "id": item_ref.id,
-                "kind": "file",
-                "title": title or file.filename or "Uploaded file",
-                "content": content,
-                "created_at": now,
-                "updated_at": now,
-            }
-            
-            # Create file document
-            file_ref = db.collection("files").document()
-            file_doc = {
-                "id": file_ref.id,
-                "item_id": item_ref.id,
-                "original_filename": file.filename or "unknown",
-                "storage_path": storage_info["storage_path"],
-                "storage_bucket": storage_info["storage_bucket"],
-                "public_url": storage_info["public_url"],
-                "content_type": file.content_type or "application/octet-stream",
-                "size": len(file_content),
-                "folder": folder,
-                "uploaded_at": now,
-                "item": item_doc,
-                # Add user metadata
-                "user_folder": folder,  # Store the user's selected folder
-                "category": category,   # User-selected category
-                "person": person,       # User-selected person
-            }
-            
-            # Write both documents in batch
-            batch = db.batch()
-            batch.set(item_ref, item_doc)
-            batch.set(file_ref, file_doc)
-            batch.commit()
-            
-            logger.info(f"File uploaded successfully: {file_ref.id}")
-            return file_doc
+        logger.info(f"File uploaded successfully: {file_doc['id']}")
+        return file_doc
             
     except HTTPException:
         raise
@@ -129,6 +135,75 @@ async def upload_document(
         raise HTTPException(status_code=500, detail=f"Failed to upload file: {str(e)}")
 
 
+@router.post("/upload-many", response_model=FileUploadManyOut, summary="Upload several files")
+async def upload_documents(
+    files: list[UploadFile] = File(...),
+    folder: str = Form("documents"),
+    category: Optional[str] = Form("other"),
+    person: Optional[str] = Form("Unknown")
+) -> FileUploadManyOut:
+    """
+    Upload several files in one request.
+
+    Storage uploads run concurrently (UPLOAD_CONCURRENCY at a time) and all item/file
+    records are committed together. Each file gets its own status; an invalid or failed
+    file doesn't stop the others.
+    """
+    if len(files) > MAX_FILES_PER_UPLOAD:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_FILES_PER_UPLOAD} files per request")
+    try:
+        logger.info(f"Uploading {len(files)} files")
+        results: list[dict] = [
+            {"index": index, "ok": False, "filename": file.filename} for index, file in enumerate(files)
+        ]
+        reads = await asyncio.gather(
+            *(_read_upload(file) for file in files if file.content_type in ALLOWED_TYPES), return_exceptions=True
+        )
+
+        uploads = []
+        indexes = []
+        read_iter = iter(reads)
+        for index, file in enumerate(files):
+            if file.content_type not in ALLOWED_TYPES:
+                results[index]["error"] = f"File type {file.content_type} not allowed"
+                continue
+            read = next(read_iter)
+            if isinstance(read, HTTPException):
+                results[index]["error"] = read.detail
+                continue
+            if isinstance(read, Exception):
+                raise read
+            data, content_hash = read
+            uploads.append({
+                "data": data,
+                "content_hash": content_hash,
+                "filename": file.filename or "unknown",
+                "content_type": file.content_type,
+                "folder": _resolve_folder(folder, file.content_type),
+                "category": category,
+                "person": person,
+            })
+            indexes.append(index)
+
+        stored = await run_in_threadpool(_store_uploads, uploads) if uploads else []
+        for index, result in zip(indexes, stored):
+            if isinstance(result, Exception):
+                results[index]["error"] = str(result)
+            else:
+                file_doc, deduplicated = result
+                results[index].update(ok=True, id=file_doc["id"], file={**file_doc, "deduplicated": deduplicated})
+
+        succeeded = sum(1 for result in results if result["ok"])
+        logger.info(f"Uploaded {succeeded}/{len(files)} files")
+        return {"succeeded": succeeded, "failed": len(files) - succeeded, "results": results}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to upload files: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to upload files: {str(e)}")
+
+
 @router.get("/", response_model=list[FileUploadOut], summary="List files")
 def list_files(
     folder: Optional[str] = FastAPIQuery(None, description="Filter by folder"),
@@ -147,12 +222,8 @@ def list_files(
             if content_type:
                 q = q.where("content_type", "==", content_type)
             
-            try:
-                q = q.order_by("uploaded_at", direction="DESCENDING")
-                docs = list(q.offset(offset).limit(limit).stream())
-            except Exception as order_error:
-                logger.warning(f"Failed to order by uploaded_at: {order_error}")
-                docs = list(q.offset(offset).limit(limit).stream())
+            ordered = q.order_by("uploaded_at", direction="DESCENDING")
+            docs = list(stream_query(ordered.offset(offset).limit(limit), fallback=q.offset(offset).limit(limit)))
             
             result = []
             for doc in docs:
@@ -174,6 +245,59 @@ def list_files(
         raise HTTPException(status_code=500, detail=f"Failed to list files: {str(e)}")
 
 
+@router.post("/signed-urls", response_model=SignedUrlBatchOut, summary="Get signed URLs for many files")
+def get_signed_download_urls(payload: SignedUrlBatchRequest) -> SignedUrlBatchOut:
+    """Signed download URLs for a page of files (e.g. a gallery view), in one call."""
+    try:
+        file_ids = list(dict.fromkeys(payload.file_ids))
+        with get_db() as db:
+            refs = [db.collection("files").document(file_id) for file_id in file_ids]
+            paths = {
+                snap.id: snap.get("storage_path")
+                for snap in db.get_all(refs, field_paths=["storage_path"])
+                if snap.exists and snap.get("storage_path")
+            }
+        signed = get_signed_urls(paths.values(), expiration_hours=payload.expiration_hours)
+        urls = []
+        missing = []
+        for file_id in file_ids:
+            entry = signed.get(paths.get(file_id))
+            if entry:
+                urls.append({"file_id": file_id, "url": entry[0], "expires_at": entry[1]})
+            else:
+                missing.append(file_id)
+        return {"urls": urls, "missing": missing}
+    except Exception as e:
+        logger.error(f"Failed to get signed URLs: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to get signed URLs: {str(e)}")
+
+
+@router.get("/local/{storage_path:path}", summary="Serve a locally stored file")
+def get_local_file(
+    storage_path: str,
+    request: Request,
+    expires: Optional[int] = FastAPIQuery(None),
+    signature: Optional[str] = FastAPIQuery(None),
+):
+    """Public and signed URLs of the local storage backend resolve here."""
+    try:
+        backend = get_storage_backend()
+        if backend.name != "local":
+            raise HTTPException(status_code=404, detail="Local storage is not enabled")
+        stat = backend.stat(storage_path)
+        if stat is None:
+            raise HTTPException(status_code=404, detail="File not found")
+        if not stat["public"] and not backend.verify_signature(storage_path, expires, signature):
+            raise HTTPException(status_code=403, detail="Invalid or expired signature")
+        return _stream_file(request, stat, storage_path.rsplit("/", 1)[-1])
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to serve local file {storage_path}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to serve file: {str(e)}")
+
+
 @router.get("/{file_id}", response_model=FileUploadOut, summary="Get file by ID")
 def get_file(file_id: str) -> FileUploadOut:
     """Get a specific file by ID."""
@@ -220,8 +344,8 @@ def download_file(file_id: str, signed: bool = FastAPIQuery(False, description="
                 raise HTTPException(status_code=404, detail="File storage path not found")
             
             if signed:
-                # Generate signed URL for private access
-                signed_url = generate_signed_url(storage_path, expiration_hours=1)
+                # Generate signed URL for private access; the files document proves the blob exists
+                signed_url = generate_signed_url(storage_path, expiration_hours=1, verify_exists=False)
                 if not signed_url:
                     raise HTTPException(status_code=404, detail="Failed to generate download URL")
                 return {"download_url": signed_url}
@@ -239,38 +363,133 @@ def download_file(file_id: str, signed: bool = FastAPIQuery(False, description="
         raise HTTPException(status_code=500, detail=f"Failed to download file: {str(e)}")
 
 
+def _parse_range(header: str, size: int) -> Optional[tuple[int, int]]:
+    """
+    Parse a single-range `Range` header into inclusive offsets.
+
+    Returns None when the header should be ignored (malformed, another unit, or
+    several ranges) so the full content is served; raises 416 when it can't be satisfied.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        elif last:
+            # Suffix range: the final N bytes
+            suffix = int(last)
+            start, end = (max(size - suffix, 0), size - 1) if suffix else (size, size - 1)
+        else:
+            return None
+    except ValueError:
+        return None
+    if end < start and start < size:
+        return None
+    if start >= size:
+        raise HTTPException(status_code=416, detail="Requested range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, min(end, size - 1)
+
+
+def _not_modified(if_none_match: Optional[str], if_modified_since: Optional[str], etag: str, updated) -> bool:
+    if if_none_match is not None:
+        # If-None-Match takes precedence over If-Modified-Since
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags
+    if if_modified_since and updated:
+        try:
+            return updated.replace(microsecond=0) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _range_applies(if_range: Optional[str], etag: str, last_modified: Optional[str]) -> bool:
+    # A Range guarded by If-Range is honoured only while the validator still matches
+    return if_range is None or if_range.strip() in (etag, last_modified)
+
+
+def _stream_file(request: Request, stat: dict, filename: str, content_type: Optional[str] = None) -> Response:
+    """
+    Respond with a stored object's bytes, honouring a single `Range` (206/416) and
+    `ETag`/`Last-Modified` conditional GETs (304). Bytes are read from storage in
+    chunks as the response is sent.
+    """
+    size = stat["size"] or 0
+    etag = f'"{stat["etag"]}"'
+    last_modified = format_datetime(stat["updated"], usegmt=True) if stat.get("updated") else None
+    headers = {"Accept-Ranges": "bytes", "ETag": etag, "Cache-Control": CONTENT_CACHE_CONTROL}
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+
+    if _not_modified(request.headers.get("if-none-match"), request.headers.get("if-modified-since"), etag, stat.get("updated")):
+        return Response(status_code=304, headers=headers)
+
+    status_code = 200
+    start, end = 0, size - 1
+    range_header = request.headers.get("range")
+    if range_header and size and _range_applies(request.headers.get("if-range"), etag, last_modified):
+        byte_range = _parse_range(range_header, size)
+        if byte_range:
+            start, end = byte_range
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    ascii_name = filename.encode("ascii", "ignore").decode().replace('"', "") or "file"
+    headers["Content-Length"] = str(end - start + 1 if size else 0)
+    headers["Content-Disposition"] = f"inline; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename)}"
+    return StreamingResponse(
+        profiled_iter(iter_file_range(stat, start, end)) if size else iter(()),
+        status_code=status_code,
+        media_type=stat.get("content_type") or content_type or "application/octet-stream",
+        headers=headers,
+    )
+
+
+@router.get("/{file_id}/content", summary="Stream file content")
+def get_file_content(file_id: str, request: Request):
+    """
+    Stream a file's bytes through the API, for private blobs that have no public URL.
+
+    Supports single `Range` requests (206/416), `ETag`/`Last-Modified` validators and
+    conditional GETs (304), so viewers can fetch just the pages they need and the
+    response can be cached in front of the API.
+    """
+    try:
+        with get_db() as db:
+            snap = db.collection("files").document(file_id).get()
+            if not snap.exists:
+                raise HTTPException(status_code=404, detail="File not found")
+            file_data = snap.to_dict()
+        storage_path = file_data.get("storage_path")
+        if not storage_path:
+            raise HTTPException(status_code=404, detail="File storage path not found")
+
+        stat = stat_file(storage_path)
+        if stat is None:
+            raise HTTPException(status_code=404, detail="File content not found")
+        return _stream_file(request, stat, file_data.get("original_filename") or "file", file_data.get("content_type"))
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to stream file {file_id}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to stream file: {str(e)}")
+
+
 @router.delete("/{file_id}", summary="Delete file")
 def delete_uploaded_file(file_id: str) -> dict:
     """Delete a file and its storage."""
     try:
         with get_db() as db:
-            ref = db.collection("files").document(file_id)
-            snap = ref.get()
-            if not snap.exists:
+            # Storage objects go only once no other file shares the same content
+            if not delete_file_record(db, file_id):
                 raise HTTPException(status_code=404, detail="File not found")
             
-            file_data = snap.to_dict()
-            storage_path = file_data.get("storage_path")
-            item_id = file_data.get("item_id")
-            
-            # Delete from Firebase Storage
-            if storage_path:
-                delete_success = delete_file(storage_path)
-                if not delete_success:
-                    logger.warning(f"Failed to delete storage file: {storage_path}")
-            
-            # Delete from Firestore
-            batch = db.batch()
-            batch.delete(ref)
-            
-            # Also delete associated item
-            if item_id:
-                item_ref = db.collection("items").document(item_id)
-                if item_ref.get().exists:
-                    batch.delete(item_ref)
-            
-            batch.commit()
-            
             logger.info(f"File deleted successfully: {file_id}")
             return {"message": "File deleted successfully"}
             
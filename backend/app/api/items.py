@@ -6,9 +6,9 @@ from datetime import datetime, timezone
 
 from fastapi import APIRouter, HTTPException, Query, Path
 import logging
-from google.cloud.firestore import Client, FieldFilter
 
-from ..firestore_db import get_db
+from ..firestore_db import get_db, tombstone
+from ..firestore_queries import stream_query
 from ..schemas import ItemCreate, ItemOut, ItemKind, ItemUpdate
 
 router = APIRouter()
@@ -44,6 +44,8 @@ def list_items(
     offset: int = Query(0, ge=0, description="Number of items to skip")
 ) -> list[ItemOut]:
     """Get items with optional filters."""
+    from google.cloud.firestore import FieldFilter
+
     try:
         with get_db() as db:
             logger.info(f"Listing items: kind={kind}, limit={limit}, offset={offset}")
@@ -52,12 +54,8 @@ def list_items(
             if kind:
                 q = q.where(filter=FieldFilter("kind", "==", kind))
             
-            try:
-                q = q.order_by("created_at", direction="DESCENDING")
-                docs = list(q.offset(offset).limit(limit).stream())
-            except Exception as order_error:
-                logger.warning(f"Failed to order by created_at: {order_error}")
-                docs = list(q.offset(offset).limit(limit).stream())
+            ordered = q.order_by("created_at", direction="DESCENDING")
+            docs = list(stream_query(ordered.offset(offset).limit(limit), fallback=q.offset(offset).limit(limit)))
             
             result = []
             for doc in docs:
@@ -182,8 +180,11 @@ def delete_item(
                 except Exception as e:
                     logger.warning(f"Failed to delete associated file: {str(e)}")
             
-            # Delete the item document
-            ref.delete()
+            # Delete the item document, leaving a tombstone for incremental exports
+            batch = db.batch()
+            batch.delete(ref)
+            batch.set(*tombstone(db, ref))
+            batch.commit()
             logger.info(f"Deleted item {item_id}")
             return {"message": "Item deleted successfully"}
     except HTTPException:
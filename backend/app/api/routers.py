@@ -7,6 +7,7 @@ from .tasks import router as tasks_router
 from .items import router as items_router
 from .calendar import router as calendar_router
 from .files import router as files_router
+from .debug import router as debug_router
 
 api_router = APIRouter()
 
@@ -17,3 +18,4 @@ api_router.include_router(tasks_router, prefix="/tasks", tags=["Tasks"])
 api_router.include_router(items_router, prefix="/items", tags=["Items"])
 api_router.include_router(calendar_router, prefix="/calendar", tags=["Calendar"])
 api_router.include_router(files_router, prefix="/files", tags=["Files"])
+api_router.include_router(debug_router, prefix="/debug", tags=["Debug"])
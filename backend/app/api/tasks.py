@@ -5,15 +5,16 @@ import logging
 from datetime import date
 from typing import Optional
 
-from fastapi import APIRouter, HTTPException, Query, Path
-from google.cloud.firestore import Client
+from fastapi import APIRouter, Body, HTTPException, Query, Path
 
 from ..firestore_db import get_db
-from ..schemas import TaskCreate, TaskOut, TaskUpdate
+from ..schemas import BULK_MAX_ROWS, BulkMutationOut, BulkWriteOut, TaskBulkUpdate, TaskCreate, TaskOut, TaskUpdate
 from ..service.task_service import (
     create_task,
+    create_tasks_bulk,
     get_tasks,
     update_task,
+    update_tasks_matching,
     toggle_task_completion,
     delete_task,
     get_tasks_for_calendar
@@ -36,6 +37,22 @@ def create_task_entry(payload: TaskCreate) -> TaskOut:
         raise HTTPException(status_code=500, detail=f"Failed to create task: {str(e)}")
 
 
+@router.post("/bulk", response_model=BulkWriteOut, summary="Create many tasks")
+def create_task_entries(
+    payloads: list[TaskCreate] = Body(..., min_length=1, max_length=BULK_MAX_ROWS)
+) -> BulkWriteOut:
+    """Create tasks in batched commits; results are returned per row, in request order."""
+    try:
+        with get_db() as db:
+            results = create_tasks_bulk(db, payloads)
+            succeeded = sum(1 for r in results if r["ok"])
+            logger.info(f"Bulk created {succeeded}/{len(results)} tasks")
+            return {"succeeded": succeeded, "failed": len(results) - succeeded, "results": results}
+    except Exception as e:
+        logger.error(f"Failed to bulk create tasks: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to bulk create tasks: {str(e)}")
+
+
 @router.get("/", response_model=list[TaskOut], summary="Get tasks")
 def list_tasks(
     is_done: Optional[bool] = Query(None, description="Filter by completion status"),
@@ -55,6 +72,26 @@ def list_tasks(
         raise HTTPException(status_code=500, detail=f"Failed to list tasks: {str(e)}")
 
 
+@router.patch("/", response_model=BulkMutationOut, summary="Update tasks matching filters")
+def update_task_entries(
+    payload: TaskBulkUpdate,
+    is_done: Optional[bool] = Query(None, description="Filter by completion status"),
+    due_date: Optional[date] = Query(None, description="Filter by due date"),
+    overdue: bool = Query(False, description="Only overdue tasks"),
+) -> BulkMutationOut:
+    """Apply one update to every matching task, e.g. `PATCH /api/tasks?overdue=true` with `{"is_done": true}`."""
+    if is_done is None and due_date is None and not overdue:
+        raise HTTPException(status_code=400, detail="At least one filter is required")
+    if payload.is_done is None and payload.due_at is None:
+        raise HTTPException(status_code=400, detail="Nothing to update")
+    try:
+        with get_db() as db:
+            return update_tasks_matching(db, payload, is_done, due_date, overdue)
+    except Exception as e:
+        logger.error(f"Failed to bulk update tasks: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to bulk update tasks: {str(e)}")
+
+
 @router.get("/calendar", response_model=list[TaskOut], summary="Get tasks for calendar")
 def get_calendar_tasks(
     start_date: date = Query(..., description="Start date for calendar view"),
@@ -0,0 +1,231 @@
+"""
+Coalesced chat message status writes.
+
+Clients report "delivered" and then "read" for a message within moments of each
+other. Status changes for the same message that arrive within a short window are
+merged into one update (a message never moves backwards). The requests that
+queued them wait out the window and the write before answering, flushing it
+themselves when it is due, so an acknowledged change is already stored: nothing
+waits on a background timer that a throttled or stopped instance might never
+run. Each window's updates
+are committed in transactions together with the conversations' unread-counter
+adjustments: every message is re-read first, so one deleted inside the window
+is skipped instead of failing its neighbours, and a message another path already
+marked read isn't counted twice.
+
+Conversation counters are only trusted once `counted_at` is set, i.e. their
+totals came from counting the conversation's messages. Every counter write reads
+the counter in its transaction and backfills an untrusted one (e.g. a conversation
+from before the counters) with a recount first, so adjustments never start from
+a missing or partial total.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Optional
+
+from .firestore_db import MAX_BATCH_WRITES, get_client
+
+logger = logging.getLogger("myvault.chat_status")
+
+# Delivery statuses in the order a message moves through them
+MESSAGE_STATUSES = ("sent", "delivered", "read")
+
+
+# Messages per flush transaction: each can add a message update and a counter write
+FLUSH_CHUNK = MAX_BATCH_WRITES // 2
+
+# How long a request waits for its window's write once the window is due
+FLUSH_WAIT_SECONDS = 10.0
+
+
+def status_rank(status: Optional[str]) -> int:
+    return MESSAGE_STATUSES.index(status) if status in MESSAGE_STATUSES else -1
+
+
+def conversation_ref(db, conversation_id: str):
+    """Counter document for a conversation (conversation IDs are client-chosen; keep them valid doc IDs)."""
+    return db.collection("conversations").document(str(conversation_id).replace("/", "_"))
+
+
+def read_counter(db, transaction, conversation_id: str, recount: bool = False) -> tuple[dict, bool]:
+    """
+    A conversation's message and unread counts as of `transaction`.
+
+    Returns (counts, recounted). Counts come from the counter document when it is
+    trusted; otherwise (or with `recount`) the conversation's messages are counted
+    inside the transaction and `recounted` is True.
+    """
+    from google.cloud.firestore import FieldFilter
+
+    snap = conversation_ref(db, conversation_id).get(transaction=transaction)
+    counter = snap.to_dict() if snap.exists else None
+    if not recount and counter and counter.get("counted_at") and counter.get("conversation_id"):
+        return {"message_count": counter.get("message_count", 0), "unread_count": counter.get("unread_count", 0)}, False
+
+    counts = {"message_count": 0, "unread_count": 0}
+    messages = (
+        db.collection("chat_messages")
+        .where(filter=FieldFilter("conversation_id", "==", conversation_id))
+        .select(["is_user", "status"])
+    )
+    for msg in transaction.get(messages):
+        data = msg.to_dict() or {}
+        counts["message_count"] += 1
+        if not data.get("is_user") and data.get("status") != "read":
+            counts["unread_count"] += 1
+    return counts, True
+
+
+def set_counter(db, transaction, conversation_id: str, counts: dict, recounted: bool, now: datetime, **fields) -> None:
+    """Write a conversation's counts (clamped at 0) read by `read_counter`, adjusted by the caller."""
+    values = {
+        "conversation_id": conversation_id,
+        "message_count": max(0, counts["message_count"]),
+        "unread_count": max(0, counts["unread_count"]),
+        "updated_at": now,
+        **fields,
+    }
+    if recounted:
+        values["counted_at"] = now
+    transaction.set(conversation_ref(db, conversation_id), values, merge=True)
+
+
+class _Window:
+    """One coalescing window: when it is due, and once written, the messages that failed."""
+
+    def __init__(self, seconds: float):
+        self.deadline = time.monotonic() + seconds
+        self.flushed = threading.Event()
+        self.failed: set[str] = set()
+
+
+class StatusWriteCoalescer:
+    """Buffers per-message status updates for `window_ms` and writes them together."""
+
+    def __init__(self, window_ms: float):
+        self._window = window_ms / 1000
+        self._pending: dict[str, dict] = {}
+        self._current: Optional[_Window] = None
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        message_id: str,
+        current_status: Optional[str],
+        status: str,
+        at: datetime,
+    ) -> tuple[Optional[dict], Optional[_Window]]:
+        """
+        Queue a status change for a message whose stored status is `current_status`.
+        Changes that would not advance the message past its stored or already queued
+        status are ignored.
+
+        Returns the field updates queued for the message and the window they will be
+        written in (pass it to wait()), or (None, None) if nothing is queued.
+        """
+        with self._lock:
+            entry = self._pending.get(message_id)
+            if status_rank(status) <= status_rank(entry["status"] if entry else current_status):
+                return (dict(entry["updates"]), self._current) if entry else (None, None)
+            if entry is None:
+                entry = self._pending[message_id] = {"status": status, "updates": {}}
+            entry["status"] = status
+            entry["updates"].update({"status": status, "updated_at": at, f"{status}_at": at})
+            if self._current is None:
+                self._current = _Window(self._window)
+            return dict(entry["updates"]), self._current
+
+    def wait(self, window: _Window, message_id: str) -> bool:
+        """
+        Block until `window` is written, flushing it once it is due. Returns False if
+        `message_id` wasn't written: its chunk failed, or the write didn't finish
+        within FLUSH_WAIT_SECONDS.
+        """
+        remaining = window.deadline - time.monotonic()
+        if remaining > 0:
+            window.flushed.wait(remaining)
+        if not window.flushed.is_set():
+            self.flush()
+        if not window.flushed.wait(FLUSH_WAIT_SECONDS):
+            logger.error(f"Status write for message {message_id} didn't finish within {FLUSH_WAIT_SECONDS}s")
+            return False
+        return message_id not in window.failed
+
+    def flush(self) -> int:
+        """Write everything queued so far; returns the number of messages written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            window, self._current = self._current, None
+        if window is None:
+            return 0
+
+        entries = list(pending.items())
+        written = skipped = failed = 0
+        try:
+            for start in range(0, len(entries), FLUSH_CHUNK):
+                chunk = entries[start:start + FLUSH_CHUNK]
+                try:
+                    chunk_written, chunk_skipped = self._commit_chunk(get_client(), chunk)
+                    written += chunk_written
+                    skipped += chunk_skipped
+                except Exception as e:
+                    failed += len(chunk)
+                    window.failed.update(mid for mid, _ in chunk)
+                    logger.error(f"Failed to flush {len(chunk)} status writes: {str(e)}", exc_info=True)
+        finally:
+            window.flushed.set()
+        if skipped or failed:
+            logger.warning(f"Status flush: {written} written, {skipped} skipped (deleted or already there), {failed} failed")
+        return written
+
+    @staticmethod
+    def _commit_chunk(db, chunk: list[tuple[str, dict]]) -> tuple[int, int]:
+        """Apply one chunk in a transaction; returns (messages written, messages skipped)."""
+        from google.cloud import firestore
+
+        refs = {mid: db.collection("chat_messages").document(mid) for mid, _ in chunk}
+
+        @firestore.transactional
+        def apply(transaction) -> tuple[int, int]:
+            stored = {snap.id: snap for snap in db.get_all(list(refs.values()), transaction=transaction)}
+            newly_read: Counter = Counter()
+            to_write = []
+            for mid, entry in chunk:
+                snap = stored.get(mid)
+                if snap is None or not snap.exists:
+                    continue
+                data = snap.to_dict() or {}
+                if status_rank(entry["status"]) <= status_rank(data.get("status")):
+                    continue
+                to_write.append((mid, entry))
+                if entry["status"] == "read" and not data.get("is_user") and data.get("conversation_id"):
+                    newly_read[data["conversation_id"]] += 1
+            # Transactions read everything before writing; counts are as of before this chunk
+            counters = {cid: read_counter(db, transaction, cid) for cid in newly_read}
+
+            for mid, entry in to_write:
+                transaction.update(refs[mid], entry["updates"])
+            now = datetime.now(timezone.utc)
+            for cid, n in newly_read.items():
+                counts, recounted = counters[cid]
+                counts["unread_count"] -= n
+                set_counter(db, transaction, cid, counts, recounted, now)
+            return len(to_write), len(chunk) - len(to_write)
+
+        return apply(db.transaction())
+
+
+_coalescer: Optional[StatusWriteCoalescer] = None
+
+
+def get_status_coalescer() -> StatusWriteCoalescer:
+    global _coalescer
+    if _coalescer is None:
+        from .config.settings import get_settings
+        _coalescer = StatusWriteCoalescer(get_settings().chat_status_coalesce_ms)
+    return _coalescer
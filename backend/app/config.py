@@ -1,38 +0,0 @@
-from pydantic import BaseModel
-import os
-from typing import List
-
-
-def _default_cors_origins() -> List[str]:
-    # Common local dev ports for Vite and production origins
-    defaults = [
-        os.getenv("FRONTEND_ORIGIN", "http://localhost:5173"),
-        "http://localhost:5173",
-        "http://localhost:5174", 
-        "http://127.0.0.1:5173",
-        "http://127.0.0.1:5174",
-        "https://localhost:5173",
-        "https://localhost:5174",
-        # Add production origins if specified
-        os.getenv("PROD_FRONTEND_ORIGIN", ""),
-    ]
-    # De-duplicate while preserving order
-    seen = set()
-    result: List[str] = []
-    for o in defaults:
-        if o and o not in seen:
-            seen.add(o)
-            result.append(o)
-    return result
-
-
-class Settings(BaseModel):
-    app_name: str = "MyVault API"
-    environment: str = os.getenv("ENV", "local")
-    cors_origins: list[str] = _default_cors_origins()
-
-
-def get_settings() -> Settings:
-    return Settings()
-
-
@@ -1,3 +1,3 @@
-from .settings import Settings, get_settings  # re-export
+from .settings import Settings, get_settings, get_project_id  # re-export
 
 
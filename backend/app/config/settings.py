@@ -1,55 +1,142 @@
-from pydantic import BaseModel
+from functools import lru_cache
+from typing import Any, Optional
 import os
 
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+
+
+# Environment is read when Settings is built (after load_dotenv), not at import time
+def _env(name: str, default: str) -> Any:
+    return Field(default_factory=lambda: os.getenv(name, default))
+
+
+def _env_bool(name: str, default: bool) -> Any:
+    return Field(default_factory=lambda: os.getenv(name, str(default)).lower() == "true")
+
+
+def _env_int(name: str, default: int) -> Any:
+    return Field(default_factory=lambda: int(os.getenv(name, str(default))))
+
+
+def _env_float(name: str, default: float) -> Any:
+    return Field(default_factory=lambda: float(os.getenv(name, str(default))))
+
+
+_PRODUCTION_CORS_ORIGINS = (
+    "https://myvault-frontend-219371541860.asia-south1.run.app",
+    "https://myvault-frontend-219371541860.asia-south1.run.app/",
+    "https://myvault-frontend-219371541860.asia-south1.run.app/*",
+    "https://myvault-backend-219371541860.asia-south1.run.app",
+    "https://myvault-backend-219371541860.asia-south1.run.app/",
+    "https://myvault-backend-219371541860.asia-south1.run.app/*",
+)
+_LOCAL_CORS_ORIGINS = (
+    "http://localhost:5173",
+    "http://localhost:3000",
+    "http://localhost:8000",
+    "http://127.0.0.1:5173",
+    "http://127.0.0.1:3000",
+    "http://127.0.0.1:8000",
+)
+
 
 class Settings(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     app_name: str = "MyVault API"
-    environment: str = os.getenv("ENV", "local")
-    
+    environment: str = _env("ENV", "local")
+
     # CORS configuration - read from environment variables
-    cors_origins: list[str] = []
-    
+    cors_origins: tuple[str, ...] = ()
+
     # Database configuration
-    firestore_database_id: str = os.getenv("FIRESTORE_DATABASE_ID", "myvault")
-    
-    # Google Cloud Configuration
-    google_cloud_project: str = os.getenv("GOOGLE_CLOUD_PROJECT", "myvault-f3f99")
-    firebase_storage_bucket: str = os.getenv("FIREBASE_STORAGE_BUCKET", "")
-    
+    firestore_database_id: str = _env("FIRESTORE_DATABASE_ID", "myvault")
+
+    # Google Cloud Configuration (empty project falls back to Application Default Credentials)
+    google_cloud_project: str = Field(
+        default_factory=lambda: next(
+            (os.getenv(key) for key in ("GOOGLE_CLOUD_PROJECT", "GCLOUD_PROJECT", "FIRESTORE_PROJECT_ID", "FIREBASE_PROJECT_ID") if os.getenv(key)),
+            "",
+        )
+    )
+    firebase_storage_bucket: str = _env("FIREBASE_STORAGE_BUCKET", "")
+
+    # Where uploaded files live: "gcs" (Firebase Storage) or "local" (disk, served by the API)
+    storage_backend: str = _env("STORAGE_BACKEND", "gcs")
+    local_storage_root: str = _env("LOCAL_STORAGE_ROOT", "local_storage")
+    local_storage_base_url: str = _env("LOCAL_STORAGE_BASE_URL", "http://localhost:8000")
+    local_storage_signing_key: str = _env("LOCAL_STORAGE_SIGNING_KEY", "")
+
     # Server Configuration
-    port: int = int(os.getenv("PORT", "8000"))
-    host: str = os.getenv("HOST", "0.0.0.0")
-    
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        
+    port: int = _env_int("PORT", 8000)
+    host: str = _env("HOST", "0.0.0.0")
+
+    # Startup: build clients and issue a warm-up RPC before serving; /health reports readiness
+    warmup_on_startup: bool = _env_bool("WARMUP_ON_STARTUP", True)
+    warmup_timeout_seconds: float = _env_float("WARMUP_TIMEOUT_SECONDS", 10)
+
+    # Diagnostics (/api/debug/*). Without a token they are only served outside production.
+    debug_token: str = _env("DEBUG_TOKEN", "")
+    profile_all_requests: bool = _env_bool("PROFILE_ALL_REQUESTS", False)
+    profile_sample_interval_ms: float = _env_float("PROFILE_SAMPLE_INTERVAL_MS", 5)
+    profile_ring_size: int = _env_int("PROFILE_RING_SIZE", 20)
+    slow_query_ms: float = _env_float("SLOW_QUERY_MS", 500)
+    query_stats_max_shapes: int = _env_int("QUERY_STATS_MAX_SHAPES", 500)
+    missing_index_retry_seconds: float = _env_float("MISSING_INDEX_RETRY_SECONDS", 600)
+
+    # Signed download URLs are reused until this many seconds before they expire
+    signed_url_cache_size: int = _env_int("SIGNED_URL_CACHE_SIZE", 2000)
+    signed_url_margin_seconds: float = _env_float("SIGNED_URL_MARGIN_SECONDS", 300)
+
+    # Storage uploads in flight at once for a multi-file upload request
+    upload_concurrency: int = _env_int("UPLOAD_CONCURRENCY", 4)
+
+    # Background thumbnail/preview rendering for uploaded images and PDFs
+    preview_workers: int = _env_int("PREVIEW_WORKERS", 2)
+    preview_queue_limit: int = _env_int("PREVIEW_QUEUE_LIMIT", 16)
+
+    # Window in which status changes for the same chat message are merged into one write (0 = write immediately)
+    chat_status_coalesce_ms: float = _env_float("CHAT_STATUS_COALESCE_MS", 250)
+
+    # The in-memory expense ledger behind the analytics endpoints is reloaded after this many seconds
+    expense_ledger_ttl_seconds: float = _env_float("EXPENSE_LEDGER_TTL_SECONDS", 300)
+
+    @model_validator(mode="before")
+    @classmethod
+    def _default_cors_origins(cls, data: Any) -> Any:
+        if not isinstance(data, dict) or data.get("cors_origins"):
+            return data
         # Parse CORS origins from environment variable
         cors_origins_str = os.getenv("CORS_ORIGINS", "")
         if cors_origins_str:
-            self.cors_origins = [origin.strip() for origin in cors_origins_str.split(",") if origin.strip()]
-        else:
+            origins = tuple(origin.strip() for origin in cors_origins_str.split(",") if origin.strip())
+        elif data.get("environment", os.getenv("ENV", "local")) == "production":
             # Fallback to default origins based on environment
-            if self.environment == "production":
-                self.cors_origins = [
-                    "https://myvault-frontend-219371541860.asia-south1.run.app",
-                    "https://myvault-frontend-219371541860.asia-south1.run.app/",
-                    "https://myvault-frontend-219371541860.asia-south1.run.app/*",
-                    "https://myvault-backend-219371541860.asia-south1.run.app",
-                    "https://myvault-backend-219371541860.asia-south1.run.app/",
-                    "https://myvault-backend-219371541860.asia-south1.run.app/*"
-                ]
-            else:
-                self.cors_origins = [
-                    "http://localhost:5173",
-                    "http://localhost:3000",
-                    "http://localhost:8000",
-                    "http://127.0.0.1:5173",
-                    "http://127.0.0.1:3000",
-                    "http://127.0.0.1:8000"
-                ]
+            origins = _PRODUCTION_CORS_ORIGINS
+        else:
+            origins = _LOCAL_CORS_ORIGINS
+        return {**data, "cors_origins": origins}
 
 
+@lru_cache(maxsize=1)
 def get_settings() -> "Settings":
+    """Process-wide settings, built once on first use."""
     return Settings()
 
 
+_project_id: Optional[str] = None
+
+
+def get_project_id() -> Optional[str]:
+    """Google Cloud project ID from settings, falling back to the ADC default project (resolved once)."""
+    global _project_id
+    if _project_id is None:
+        project_id = get_settings().google_cloud_project
+        if not project_id:
+            try:
+                from google.auth import default as google_auth_default
+                _, project_id = google_auth_default()
+            except Exception:
+                return None
+        _project_id = project_id or None
+    return _project_id
@@ -0,0 +1,246 @@
+"""
+In-memory columnar ledger of expenses for analytics.
+
+Every expense is held as one row of NumPy columns: epoch day (int32), amount
+(float64), category code (uint8) and is_income (bool). The ledger is loaded
+once per instance from a projected stream of the expenses collection, kept
+current by the expense write paths, and reloaded after EXPENSE_LEDGER_TTL_SECONDS
+so writes made by other instances or scripts show up too.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Optional, TYPE_CHECKING
+
+from .firestore_queries import iter_query_pages
+from .schemas import ExpenseCategory
+
+if TYPE_CHECKING:
+    import numpy as np
+    from google.cloud.firestore import Client
+
+logger = logging.getLogger("myvault.expense_ledger")
+
+CATEGORIES = tuple(category.value for category in ExpenseCategory)
+CATEGORY_CODES = {name: code for code, name in enumerate(CATEGORIES)}
+# Stored category values that aren't an ExpenseCategory
+UNKNOWN_CATEGORY = 255
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+LEDGER_FIELDS = ["amount", "category", "is_income", "occurred_on", "created_at"]
+LOAD_PAGE_SIZE = 2000
+
+
+def epoch_day(value) -> Optional[int]:
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return value.toordinal() - EPOCH_ORDINAL
+    return None
+
+
+def ledger_row(doc: dict) -> Optional[tuple]:
+    """(epoch day, amount, category code, is_income) for an expense document, or None if unusable."""
+    day = epoch_day(doc.get("occurred_on"))
+    if day is None:
+        day = epoch_day(doc.get("created_at"))
+    if day is None:
+        return None
+    try:
+        amount = float(doc.get("amount") or 0)
+    except (TypeError, ValueError):
+        return None
+    category = CATEGORY_CODES.get(doc.get("category"), UNKNOWN_CATEGORY)
+    return day, amount, category, bool(doc.get("is_income"))
+
+
+@dataclass(frozen=True)
+class LedgerView:
+    """An immutable snapshot of the ledger's live rows."""
+    days: np.ndarray
+    amounts: np.ndarray
+    categories: np.ndarray
+    is_income: np.ndarray
+    loaded_at: float
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    @classmethod
+    def from_rows(cls, rows: list[tuple]) -> LedgerView:
+        """A view over ledger_row() tuples, e.g. from a one-off query."""
+        import numpy as np
+
+        days, amounts, categories, income = zip(*rows) if rows else ((), (), (), ())
+        return cls(
+            days=np.array(days, dtype=np.int32),
+            amounts=np.array(amounts, dtype=np.float64),
+            categories=np.array(categories, dtype=np.uint8),
+            is_income=np.array(income, dtype=bool),
+            loaded_at=time.monotonic(),
+        )
+
+
+class ExpenseLedger:
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._rows: dict[str, int] = {}
+        self._size = 0
+        self._alloc(0)
+        self._loaded_at: Optional[float] = None
+        # Writes that land while a load is streaming, replayed on top of it
+        self._pending: Optional[list[tuple]] = None
+        self._view: Optional[LedgerView] = None
+
+    def _alloc(self, capacity: int) -> None:
+        # Deferred: only instances serving analytics pay for importing NumPy
+        import numpy as np
+
+        self._days = np.zeros(capacity, dtype=np.int32)
+        self._amounts = np.zeros(capacity, dtype=np.float64)
+        self._categories = np.zeros(capacity, dtype=np.uint8)
+        self._income = np.zeros(capacity, dtype=bool)
+        self._alive = np.zeros(capacity, dtype=bool)
+
+    def _grow(self) -> None:
+        import numpy as np
+
+        capacity = max(1024, len(self._days) * 2)
+        for name in ("_days", "_amounts", "_categories", "_income", "_alive"):
+            old = getattr(self, name)
+            grown = np.zeros(capacity, dtype=old.dtype)
+            grown[:len(old)] = old
+            setattr(self, name, grown)
+
+    def _set(self, expense_id: str, row: Optional[tuple]) -> None:
+        # Caller holds the lock
+        index = self._rows.get(expense_id)
+        if row is None:
+            if index is not None:
+                self._alive[index] = False
+                del self._rows[expense_id]
+            return
+        if index is None:
+            if self._size == len(self._days):
+                self._grow()
+            index = self._size
+            self._size += 1
+            self._rows[expense_id] = index
+        self._days[index], self._amounts[index], self._categories[index], self._income[index] = row
+        self._alive[index] = True
+
+    def _apply(self, expense_id: str, row: Optional[tuple]) -> None:
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((expense_id, row))
+            if self._loaded_at is not None:
+                self._set(expense_id, row)
+                self._view = None
+
+    def upsert(self, expense_id: str, doc: dict) -> None:
+        """Record a created or updated expense (no-op until the ledger is loaded)."""
+        self._apply(str(expense_id), ledger_row(doc))
+
+    def remove(self, expense_id: str) -> None:
+        self._apply(str(expense_id), None)
+
+    def load(self, db: Client) -> None:
+        """Stream the expenses' ledger fields and replace the ledger's contents."""
+        start = time.perf_counter()
+        with self._lock:
+            self._pending = []
+        try:
+            ids, rows = [], []
+            q = db.collection("expenses").select(LEDGER_FIELDS)
+            for page in iter_query_pages(q, page_size=LOAD_PAGE_SIZE):
+                for snap in page:
+                    row = ledger_row(snap.to_dict() or {})
+                    if row is not None:
+                        ids.append(snap.id)
+                        rows.append(row)
+            with self._lock:
+                count = len(rows)
+                self._alloc(max(1024, count + count // 4))
+                if count:
+                    days, amounts, categories, income = zip(*rows)
+                    self._days[:count] = days
+                    self._amounts[:count] = amounts
+                    self._categories[:count] = categories
+                    self._income[:count] = income
+                    self._alive[:count] = True
+                self._rows = {expense_id: index for index, expense_id in enumerate(ids)}
+                self._size = count
+                for expense_id, row in self._pending:
+                    self._set(expense_id, row)
+                self._loaded_at = time.monotonic()
+                self._view = None
+        finally:
+            with self._lock:
+                self._pending = None
+        logger.info(f"Loaded {len(rows)} expenses into the ledger in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    def _stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl_seconds
+
+    def view(self, db: Client) -> LedgerView:
+        """Live rows, loading (or reloading once stale) first; one load runs at a time."""
+        if self._stale():
+            with self._load_lock:
+                if self._stale():
+                    self.load(db)
+        return self._snapshot()
+
+    def current(self) -> Optional[LedgerView]:
+        """Live rows if the ledger is loaded and fresh, without loading it."""
+        if self._stale():
+            return None
+        return self._snapshot()
+
+    def _snapshot(self) -> LedgerView:
+        with self._lock:
+            if self._view is None:
+                alive = self._alive[:self._size]
+                self._view = LedgerView(
+                    days=self._days[:self._size][alive],
+                    amounts=self._amounts[:self._size][alive],
+                    categories=self._categories[:self._size][alive],
+                    is_income=self._income[:self._size][alive],
+                    loaded_at=self._loaded_at,
+                )
+            return self._view
+
+    def invalidate(self) -> None:
+        """Force a reload on next use (e.g. after bulk changes made outside the write paths)."""
+        with self._lock:
+            self._loaded_at = None
+            self._view = None
+
+
+_ledger: Optional[ExpenseLedger] = None
+
+
+def get_expense_ledger() -> ExpenseLedger:
+    global _ledger
+    if _ledger is None:
+        from .config.settings import get_settings
+        _ledger = ExpenseLedger(get_settings().expense_ledger_ttl_seconds)
+    return _ledger
+
+
+def record_expense(expense_id: str, doc: dict) -> None:
+    """Expense write hook: keep the ledger current if this instance has one."""
+    if _ledger is not None:
+        _ledger.upsert(expense_id, doc)
+
+
+def forget_expense(expense_id: str) -> None:
+    """Expense delete hook."""
+    if _ledger is not None:
+        _ledger.remove(expense_id)
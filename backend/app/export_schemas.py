@@ -0,0 +1,203 @@
+"""
+Declared export columns per Firestore collection.
+
+Tabular exports (CSV) use these columns in this order, so files can be written
+in one pass and have the same header every run, and columnar exports (Parquet,
+Arrow) type their columns from them. Fields not listed still appear in NDJSON
+exports, but an import only restores the types of declared columns (an
+undeclared timestamp comes back as an ISO string), so every timestamp field a
+collection stores is declared. Types: string, category (a string from a small
+set, dictionary-encoded in columnar exports), int, float, bool, timestamp, json
+(nested values, serialised as JSON text).
+"""
+from __future__ import annotations
+
+import json
+from datetime import date, datetime, time, timezone
+from typing import Any
+
+EXPORT_COLUMNS: dict[str, tuple[tuple[str, str], ...]] = {
+    "items": (
+        ("id", "string"),
+        ("kind", "category"),
+        ("owner", "category"),
+        ("title", "string"),
+        ("content", "string"),
+        ("created_at", "timestamp"),
+        ("updated_at", "timestamp"),
+    ),
+    "expenses": (
+        ("id", "string"),
+        ("item_id", "string"),
+        ("title", "string"),
+        ("amount", "float"),
+        ("category", "category"),
+        ("is_income", "bool"),
+        ("occurred_on", "timestamp"),
+        ("created_at", "timestamp"),
+        ("updated_at", "timestamp"),
+    ),
+    "tasks": (
+        ("id", "string"),
+        ("item_id", "string"),
+        ("title", "string"),
+        ("content", "string"),
+        ("due_at", "timestamp"),
+        ("is_done", "bool"),
+        ("created_at", "timestamp"),
+        ("updated_at", "timestamp"),
+    ),
+    "chat_messages": (
+        ("id", "string"),
+        ("item_id", "string"),
+        ("conversation_id", "string"),
+        ("message", "string"),
+        ("is_user", "bool"),
+        ("status", "category"),
+        ("created_at", "timestamp"),
+        ("updated_at", "timestamp"),
+        ("delivered_at", "timestamp"),
+        ("read_at", "timestamp"),
+    ),
+    "conversations": (
+        ("message_count", "int"),
+        ("unread_count", "int"),
+        ("last_message_at", "timestamp"),
+        ("updated_at", "timestamp"),
+        ("counted_at", "timestamp"),
+        ("last_read_at", "timestamp"),
+    ),
+    "files": (
+        ("id", "string"),
+        ("item_id", "string"),
+        ("original_filename", "string"),
+        ("content_type", "category"),
+        ("size", "int"),
+        ("folder", "category"),
+        ("category", "category"),
+        ("person", "category"),
+        ("storage_path", "string"),
+        ("storage_bucket", "string"),
+        ("public_url", "string"),
+        ("content_hash", "string"),
+        ("thumbnail_path", "string"),
+        ("preview_path", "string"),
+        ("uploaded_at", "timestamp"),
+        ("updated_at", "timestamp"),
+        ("previews_generated_at", "timestamp"),
+    ),
+    "blob_hashes": (
+        ("sha256", "string"),
+        ("storage_path", "string"),
+        ("content_type", "string"),
+        ("size", "int"),
+        ("ref_count", "int"),
+        ("created_at", "timestamp"),
+        ("updated_at", "timestamp"),
+    ),
+    "tombstones": (
+        ("collection", "category"),
+        ("doc_id", "string"),
+        ("deleted_at", "timestamp"),
+    ),
+    "migration_logs": (
+        ("migration_date", "string"),
+        ("source_database", "string"),
+        ("tables_migrated", "json"),
+        ("status", "category"),
+        ("movements", "json"),
+        ("currencies", "json"),
+    ),
+}
+
+# Flattened expenses (fields of the migrated `content` JSON as columns) for analysis exports
+EXPENSE_ANALYSIS_COLUMNS: tuple[tuple[str, str], ...] = (
+    ("id", "string"),
+    ("title", "string"),
+    ("amount", "float"),
+    ("category", "category"),
+    ("is_income", "bool"),
+    ("occurred_on", "timestamp"),
+    ("created_at", "timestamp"),
+    ("updated_at", "timestamp"),
+    ("original_id", "int"),
+    ("account", "category"),
+    ("sign", "category"),
+    ("time", "string"),
+    ("confirmed", "bool"),
+    ("transfer", "bool"),
+    ("date_idx", "int"),
+    ("migrated_from", "category"),
+    ("migrated_at", "timestamp"),
+)
+
+# Collections exported by default, in export order; tombstones only go out with incremental exports
+EXPORT_COLLECTIONS = tuple(collection for collection in EXPORT_COLUMNS if collection != "tombstones")
+
+# The document ID is always the first column
+ID_COLUMN = "_id"
+
+
+def typed_export_columns(collection: str) -> list[tuple[str, str]]:
+    """(name, type) per column of a collection's export, starting with the ID."""
+    return [(ID_COLUMN, "string"), *EXPORT_COLUMNS.get(collection, ())]
+
+
+def export_columns(collection: str) -> list[str]:
+    """Column names for a collection's tabular export (just the ID for undeclared collections)."""
+    return [name for name, _ in typed_export_columns(collection)]
+
+
+def has_watermark(collection: str) -> bool:
+    """Whether every write to the collection stamps `updated_at`, so it can be exported incrementally."""
+    return any(name == "updated_at" for name, _ in EXPORT_COLUMNS.get(collection, ()))
+
+
+def to_json_value(value: Any) -> Any:
+    """`default=` hook for json.dumps: timestamps as ISO 8601, references as paths."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, "path"):  # DocumentReference
+        return value.path
+    if hasattr(value, "latitude") and hasattr(value, "longitude"):  # GeoPoint
+        return {"latitude": value.latitude, "longitude": value.longitude}
+    if isinstance(value, bytes):
+        return value.hex()
+    return str(value)
+
+
+def to_cell(value: Any) -> Any:
+    """A CSV cell: scalars as-is, timestamps as ISO 8601, nested values as JSON."""
+    if value is None:
+        return ""
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (dict, list, tuple)):
+        return json.dumps(value, default=to_json_value, ensure_ascii=False)
+    return to_json_value(value)
+
+
+def to_column_value(value: Any, kind: str) -> Any:
+    """A value coerced to its declared column type for columnar exports; None if it doesn't fit."""
+    if value is None or value == "":
+        return None
+    try:
+        if kind in ("string", "category"):
+            return value if isinstance(value, str) else to_cell(value)
+        if kind == "json":
+            return json.dumps(value, default=to_json_value, ensure_ascii=False)
+        if kind == "bool":
+            return value if isinstance(value, bool) else str(value).strip().lower() in ("1", "true", "yes")
+        if kind == "int":
+            return int(value)
+        if kind == "float":
+            return float(value)
+        if kind == "timestamp":
+            if isinstance(value, str):
+                value = datetime.fromisoformat(value)
+            elif not isinstance(value, datetime):
+                value = datetime.combine(value, time.min)
+            return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return value
@@ -1,37 +1,33 @@
 from __future__ import annotations
 
 from contextlib import contextmanager
-from typing import Iterator
-import os
+from datetime import datetime, timezone
+from typing import Iterator, Optional, Sequence, TYPE_CHECKING
 import logging
 
-from google.cloud import firestore
-from google.auth import default as google_auth_default
-from app.config.settings import get_settings
+from app.config.settings import get_settings, get_project_id
+
+if TYPE_CHECKING:
+    from google.cloud import firestore
 
 logger = logging.getLogger("myvault.firestore")
 
 _client: firestore.Client | None = None
 
+# Firestore caps a single commit at 500 writes
+MAX_BATCH_WRITES = 500
 
-def _resolve_project_id() -> str | None:
-    # Prefer explicit env vars
-    for key in ("GOOGLE_CLOUD_PROJECT", "GCLOUD_PROJECT", "FIRESTORE_PROJECT_ID", "FIREBASE_PROJECT_ID"):
-        val = os.getenv(key)
-        if val:
-            return val
-    # Fall back to ADC default project
-    try:
-        _, project_id = google_auth_default()
-        return project_id
-    except Exception:
-        return None
+# Deleted documents leave a marker here so incremental exports can replay the delete
+TOMBSTONES = "tombstones"
 
 
 def get_client() -> firestore.Client:
     global _client
     if _client is None:
-        project_id = _resolve_project_id()
+        # Deferred: the Firestore SDK is a large share of cold-start import time
+        from google.cloud import firestore
+
+        project_id = get_project_id()
         if not project_id:
             raise RuntimeError(
                 "Firestore project ID not found. Set env var GOOGLE_CLOUD_PROJECT to your project ID (e.g., myvault-f3f99)."
@@ -46,8 +42,90 @@ def get_client() -> firestore.Client:
     return _client
 
 
+def warm_up() -> None:
+    """Build the client and issue a trivial read so credentials and the gRPC channel are ready."""
+    client = get_client()
+    client.collection("_warmup").document("ping").get()
+
+
 @contextmanager
 def get_db() -> Iterator[firestore.Client]:
     yield get_client()
 
 
+def commit_write_groups(
+    db: firestore.Client,
+    groups: Sequence[Sequence[tuple]],
+    max_writes: int = MAX_BATCH_WRITES,
+) -> list[Optional[str]]:
+    """
+    Commit groups of writes using as few WriteBatches as possible.
+
+    Each group is a list of (op, ref, data) writes that must land together, such as
+    an item and its entity document; a group never spans two batches. op is one of
+    "set", "merge" (set with merge=True), "update", "create" or "delete" (data ignored).
+
+    Returns one entry per group: None if its batch committed, else the error message.
+    """
+    results: list[Optional[str]] = [None] * len(groups)
+    batch = db.batch()
+    pending: list[int] = []
+    pending_writes = 0
+
+    def _commit() -> None:
+        nonlocal batch, pending, pending_writes
+        if pending:
+            try:
+                batch.commit()
+            except Exception as e:
+                logger.error(f"Batch commit of {pending_writes} writes failed: {str(e)}")
+                for index in pending:
+                    results[index] = str(e)
+        batch = db.batch()
+        pending = []
+        pending_writes = 0
+
+    for index, group in enumerate(groups):
+        if len(group) > max_writes:
+            results[index] = f"Write group of {len(group)} exceeds the {max_writes}-write batch limit"
+            continue
+        if pending_writes + len(group) > max_writes:
+            _commit()
+        for op, ref, data in group:
+            if op == "set":
+                batch.set(ref, data)
+            elif op == "merge":
+                batch.set(ref, data, merge=True)
+            elif op == "update":
+                batch.update(ref, data)
+            elif op == "create":
+                batch.create(ref, data)
+            elif op == "delete":
+                batch.delete(ref)
+            else:
+                raise ValueError(f"Unknown batch operation: {op}")
+        pending.append(index)
+        pending_writes += len(group)
+    _commit()
+    return results
+
+
+def write_results(ids: Sequence[str], errors: Sequence[Optional[str]]) -> list[dict]:
+    """Per-row results of a bulk write: the document ID of each group, or its commit error."""
+    return [
+        {"index": i, "ok": error is None, "id": doc_id if error is None else None, "error": error}
+        for i, (doc_id, error) in enumerate(zip(ids, errors))
+    ]
+
+
+def tombstone(db: firestore.Client, ref, now: Optional[datetime] = None) -> tuple:
+    """(ref, data) of the tombstone recording that `ref` was deleted; write it in the same commit as the delete."""
+    collection = ref.parent.id
+    marker = db.collection(TOMBSTONES).document(f"{collection}__{ref.id}")
+    return marker, {"collection": collection, "doc_id": ref.id, "deleted_at": now or datetime.now(timezone.utc)}
+
+
+def delete_writes(db: firestore.Client, ref, now: Optional[datetime] = None) -> list[tuple]:
+    """commit_write_groups entries deleting `ref` and recording its tombstone."""
+    marker, data = tombstone(db, ref, now)
+    return [("delete", ref, None), ("set", marker, data)]
@@ -0,0 +1,313 @@
+"""
+Instrumented Firestore query execution.
+
+Service code streams queries through stream_query(), which records the
+normalized query shape (collection, filters, order_by, limit/offset), the
+duration, the number of documents returned and the calling route. Shapes are
+aggregated in a bounded in-process table served at /api/debug/queries.
+"""
+from __future__ import annotations
+
+import contextvars
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+
+logger = logging.getLogger("myvault.queries")
+
+_OPERATORS = {
+    "EQUAL": "==",
+    "NOT_EQUAL": "!=",
+    "LESS_THAN": "<",
+    "LESS_THAN_OR_EQUAL": "<=",
+    "GREATER_THAN": ">",
+    "GREATER_THAN_OR_EQUAL": ">=",
+    "ARRAY_CONTAINS": "array-contains",
+    "ARRAY_CONTAINS_ANY": "array-contains-any",
+    "IN": "in",
+    "NOT_IN": "not-in",
+    "IS_NAN": "is-nan",
+    "IS_NULL": "is-null",
+    "IS_NOT_NAN": "is-not-nan",
+    "IS_NOT_NULL": "is-not-null",
+}
+
+# The ASGI scope of the request being served; the router fills in "endpoint" after we set it
+_request_scope: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar(
+    "myvault_request_scope", default=None
+)
+
+
+def set_request_scope(scope: dict) -> contextvars.Token:
+    return _request_scope.set(scope)
+
+
+def reset_request_scope(token: contextvars.Token) -> None:
+    _request_scope.reset(token)
+
+
+def current_route() -> str:
+    scope = _request_scope.get()
+    if scope is None:
+        return "<background>"
+    endpoint = scope.get("endpoint")
+    if endpoint is not None:
+        module = endpoint.__module__.rsplit(".", 1)[-1]
+        return f"{scope.get('method', '')} {module}.{endpoint.__name__}"
+    return f"{scope.get('method', '')} {scope.get('path', '')}"
+
+
+def _describe_filter(f) -> list[str]:
+    if hasattr(f, "filters"):
+        # Composite (AND/OR) filter: describe each leaf
+        parts: list[str] = []
+        for sub in f.filters:
+            for kind in ("field_filter", "unary_filter", "composite_filter"):
+                if kind in sub:
+                    parts.extend(_describe_filter(getattr(sub, kind)))
+                    break
+        op = getattr(f.op, "name", str(f.op))
+        return [f"{op}({', '.join(parts)})"]
+    op = getattr(f.op, "name", str(f.op))
+    return [f"{f.field.field_path} {_OPERATORS.get(op, op)}"]
+
+
+def query_shape(query) -> dict:
+    """Normalize a query (or collection reference) to its value-free shape."""
+    if not hasattr(query, "_field_filters"):
+        query = query._query()
+    filters: list[str] = []
+    for f in query._field_filters:
+        filters.extend(_describe_filter(f))
+    orders = [
+        f"{o.field.field_path} {'DESC' if getattr(o.direction, 'name', '') == 'DESCENDING' else 'ASC'}"
+        for o in query._orders
+    ]
+    projection = None
+    if query._projection is not None:
+        projection = sorted(ref.field_path for ref in query._projection.fields)
+    return {
+        "collection": query._parent.id,
+        "filters": sorted(filters),
+        "order_by": orders,
+        "limit": query._limit,
+        "offset": bool(query._offset),
+        "select": projection,
+    }
+
+
+def shape_fingerprint(shape: dict) -> str:
+    parts = [shape["collection"]]
+    if shape["filters"]:
+        parts.append("where " + ", ".join(shape["filters"]))
+    if shape["order_by"]:
+        parts.append("order " + ", ".join(shape["order_by"]))
+    if shape["select"] is not None:
+        parts.append("select " + ", ".join(shape["select"]))
+    if shape["limit"] is not None:
+        parts.append(f"limit {shape['limit']}")
+    if shape["offset"]:
+        parts.append("offset")
+    return " | ".join(parts)
+
+
+class QueryStatsTable:
+    """Per-shape execution statistics, bounded to the most recently seen shapes."""
+
+    def __init__(self, max_shapes: int = 500, recent: int = 100):
+        self._max_shapes = max_shapes
+        self._recent = recent
+        self._shapes: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, shape: dict, duration_ms: float, docs: int, route: str, error: Optional[str] = None) -> None:
+        fingerprint = shape_fingerprint(shape)
+        with self._lock:
+            entry = self._shapes.get(fingerprint)
+            if entry is None:
+                entry = {
+                    "fingerprint": fingerprint,
+                    "shape": shape,
+                    "count": 0,
+                    "errors": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "total_docs": 0,
+                    "max_docs": 0,
+                    "routes": {},
+                    "durations": deque(maxlen=self._recent),
+                    "last_error": None,
+                    "last_seen": None,
+                }
+                self._shapes[fingerprint] = entry
+                while len(self._shapes) > self._max_shapes:
+                    self._shapes.popitem(last=False)
+            else:
+                self._shapes.move_to_end(fingerprint)
+            entry["count"] += 1
+            entry["total_ms"] += duration_ms
+            entry["max_ms"] = max(entry["max_ms"], duration_ms)
+            entry["total_docs"] += docs
+            entry["max_docs"] = max(entry["max_docs"], docs)
+            entry["routes"][route] = entry["routes"].get(route, 0) + 1
+            entry["durations"].append(duration_ms)
+            entry["last_seen"] = datetime.now(timezone.utc)
+            if error:
+                entry["errors"] += 1
+                entry["last_error"] = error
+
+    @staticmethod
+    def _render(entry: dict) -> dict:
+        durations = sorted(entry["durations"])
+        p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))] if durations else 0.0
+        return {
+            "fingerprint": entry["fingerprint"],
+            "shape": entry["shape"],
+            "count": entry["count"],
+            "errors": entry["errors"],
+            "avg_ms": round(entry["total_ms"] / entry["count"], 3),
+            "p95_ms": round(p95, 3),
+            "max_ms": round(entry["max_ms"], 3),
+            "avg_docs": round(entry["total_docs"] / entry["count"], 1),
+            "max_docs": entry["max_docs"],
+            "routes": dict(sorted(entry["routes"].items(), key=lambda kv: kv[1], reverse=True)),
+            "last_error": entry["last_error"],
+            "last_seen": entry["last_seen"],
+        }
+
+    def top(self, n: int = 20) -> dict:
+        with self._lock:
+            entries = [self._render(e) for e in self._shapes.values()]
+        return {
+            "shapes": len(entries),
+            "slowest": sorted(entries, key=lambda e: e["max_ms"], reverse=True)[:n],
+            "most_frequent": sorted(entries, key=lambda e: e["count"], reverse=True)[:n],
+            "most_documents": sorted(entries, key=lambda e: e["max_docs"], reverse=True)[:n],
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._shapes.clear()
+
+
+_stats: Optional[QueryStatsTable] = None
+
+
+def get_query_stats() -> QueryStatsTable:
+    global _stats
+    if _stats is None:
+        from .config.settings import get_settings
+        _stats = QueryStatsTable(max_shapes=get_settings().query_stats_max_shapes)
+    return _stats
+
+
+# Shapes whose composite index is missing, mapped to when that was first seen
+_missing_indexes: dict[str, float] = {}
+_missing_lock = threading.Lock()
+
+
+def _index_known_missing(fingerprint: str) -> bool:
+    from .config.settings import get_settings
+
+    with _missing_lock:
+        seen_at = _missing_indexes.get(fingerprint)
+        if seen_at is None:
+            return False
+        # Probe again now and then so a newly deployed index is picked up without a restart
+        if time.monotonic() - seen_at >= get_settings().missing_index_retry_seconds:
+            del _missing_indexes[fingerprint]
+            return False
+        return True
+
+
+def missing_indexes() -> list[str]:
+    with _missing_lock:
+        return sorted(_missing_indexes)
+
+
+def forget_missing_indexes() -> None:
+    with _missing_lock:
+        _missing_indexes.clear()
+
+
+def stream_query(query, fallback=None) -> Iterator:
+    """
+    Stream a query's snapshots, recording its shape, duration and result size.
+
+    If the query fails for lack of a composite index and a fallback query is
+    given, the fallback is streamed instead and the shape is remembered, so
+    later calls go straight to the fallback rather than paying a failing RPC.
+    """
+    if fallback is None:
+        yield from _stream_recorded(query)
+        return
+
+    from google.api_core.exceptions import FailedPrecondition
+
+    # Index requirements don't depend on limit/offset/projection, so key on filters and order only
+    shape = query_shape(query)
+    fingerprint = shape_fingerprint({**shape, "limit": None, "offset": False, "select": None})
+    if _index_known_missing(fingerprint):
+        yield from _stream_recorded(fallback)
+        return
+
+    produced = 0
+    try:
+        for snap in _stream_recorded(query):
+            produced += 1
+            yield snap
+    except FailedPrecondition as e:
+        if produced:
+            raise
+        with _missing_lock:
+            _missing_indexes[fingerprint] = time.monotonic()
+        logger.warning(f"Missing index for [{fingerprint}], using fallback query: {e}")
+        yield from _stream_recorded(fallback)
+
+
+def iter_query_pages(query, page_size: int = 500) -> Iterator[list]:
+    """
+    Page through a query with keyset cursors, starting each page after the last
+    snapshot of the previous one. Unlike offset paging, every page only reads its
+    own documents, and it stays correct when the caller deletes or updates the
+    page it was just given. Snapshots must carry the fields the query orders on
+    (keep them in any select()).
+    """
+    cursor = None
+    while True:
+        page_query = query.limit(page_size)
+        if cursor is not None:
+            page_query = page_query.start_after(cursor)
+        page = list(stream_query(page_query))
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        cursor = page[-1]
+
+
+def _stream_recorded(query) -> Iterator:
+    from .config.settings import get_settings
+
+    shape = query_shape(query)
+    start = time.perf_counter()
+    docs = 0
+    error = None
+    try:
+        for snap in query.stream():
+            docs += 1
+            yield snap
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        route = current_route()
+        get_query_stats().record(shape, duration_ms, docs, route, error)
+        if duration_ms >= get_settings().slow_query_ms:
+            logger.warning(
+                f"Slow query {duration_ms:.0f}ms, {docs} docs [{route}]: {shape_fingerprint(shape)}"
+            )
@@ -0,0 +1,176 @@
+"""
+Thumbnail and preview generation for uploaded images and PDFs.
+
+Rendering is CPU-bound, so it runs in a small process pool; uploads only queue
+the work and return. Each source gets a WebP thumbnail and a medium preview,
+stored next to the original as `<path>.thumbnail.webp` and `<path>.preview.webp`
+and recorded on the files document.
+"""
+from __future__ import annotations
+
+import io
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Optional
+
+logger = logging.getLogger("myvault.previews")
+
+# Bounding box (px) and WebP quality per variant
+VARIANTS = {
+    "thumbnail": ((256, 256), 70),
+    "preview": ((1024, 1024), 80),
+}
+
+# Fields store_previews records for each variant
+PREVIEW_FIELDS = tuple(f"{variant}_{suffix}" for variant in VARIANTS for suffix in ("path", "url", "size"))
+
+PREVIEW_IMAGE_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp"}
+PREVIEW_PDF_TYPES = {"application/pdf"}
+
+
+def derived_path(storage_path: str, variant: str) -> str:
+    return f"{storage_path}.{variant}.webp"
+
+
+def render_previews(data: bytes, content_type: str) -> dict[str, bytes]:
+    """Render every variant as WebP bytes. Runs in a worker process."""
+    from PIL import Image, ImageOps
+
+    if content_type in PREVIEW_PDF_TYPES:
+        try:
+            import pypdfium2
+        except ImportError:
+            # Optional dependency: without it PDFs just don't get previews
+            return {}
+        pdf = pypdfium2.PdfDocument(data)
+        try:
+            page = pdf[0]
+            largest = max(VARIANTS.values(), key=lambda v: v[0][0])[0]
+            width, height = page.get_size()
+            image = page.render(scale=max(largest) / max(width, height)).to_pil()
+        finally:
+            pdf.close()
+    else:
+        image = Image.open(io.BytesIO(data))
+        image.seek(0)  # first frame of animated images
+        image = ImageOps.exif_transpose(image)
+
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+
+    rendered = {}
+    for variant, (box, quality) in VARIANTS.items():
+        copy = image.copy()
+        copy.thumbnail(box, Image.LANCZOS)
+        out = io.BytesIO()
+        copy.save(out, format="WEBP", quality=quality, method=4)
+        rendered[variant] = out.getvalue()
+    return rendered
+
+
+class PreviewPipeline:
+    """Renders previews in a process pool and stores them from a matching thread pool."""
+
+    def __init__(self, workers: int, queue_limit: int):
+        self._workers = max(1, workers)
+        # Caps sources held in memory waiting for a worker; beyond it uploads skip previews
+        self._slots = threading.Semaphore(queue_limit)
+        self._lock = threading.Lock()
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._io: Optional[ThreadPoolExecutor] = None
+
+    def _pools(self) -> tuple[ProcessPoolExecutor, ThreadPoolExecutor]:
+        with self._lock:
+            if self._processes is None:
+                # spawn: forking a process that holds gRPC channels is unsafe
+                self._processes = ProcessPoolExecutor(
+                    max_workers=self._workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    max_tasks_per_child=100,
+                )
+                self._io = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="previews")
+            return self._processes, self._io
+
+    def submit(
+        self, file_id: str, storage_path: str, content_type: str, data: bytes, content_hash: Optional[str] = None
+    ) -> bool:
+        """Queue preview generation for a stored file; returns False if it was skipped."""
+        if content_type not in PREVIEW_IMAGE_TYPES | PREVIEW_PDF_TYPES:
+            return False
+        if not self._slots.acquire(blocking=False):
+            logger.warning(f"Preview queue full, skipping previews for {file_id}")
+            return False
+        try:
+            processes, io_pool = self._pools()
+            io_pool.submit(self._process, processes, file_id, storage_path, content_type, data, content_hash)
+        except Exception:
+            self._slots.release()
+            raise
+        return True
+
+    def _process(
+        self,
+        processes: ProcessPoolExecutor,
+        file_id: str,
+        storage_path: str,
+        content_type: str,
+        data: bytes,
+        content_hash: Optional[str],
+    ) -> None:
+        try:
+            rendered = processes.submit(render_previews, data, content_type).result()
+            del data
+            if rendered:
+                store_previews(file_id, storage_path, rendered, content_hash)
+        except Exception as e:
+            logger.error(f"Failed to generate previews for {file_id}: {str(e)}", exc_info=True)
+        finally:
+            self._slots.release()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._io is not None:
+                self._io.shutdown(wait=False, cancel_futures=True)
+            if self._processes is not None:
+                self._processes.shutdown(wait=False, cancel_futures=True)
+            self._processes = self._io = None
+
+
+def store_previews(file_id: str, storage_path: str, rendered: dict[str, bytes], content_hash: Optional[str] = None) -> dict:
+    """
+    Upload rendered variants next to the original and record them on the files
+    document, and on the blob_hashes entry so later duplicates reuse them.
+    """
+    from .firestore_db import get_client
+    from .storage import upload_bytes
+
+    now = datetime.now(timezone.utc)
+    updates: dict = {"previews_generated_at": now, "updated_at": now}
+    for variant, payload in rendered.items():
+        stored = upload_bytes(payload, derived_path(storage_path, variant), "image/webp")
+        updates[f"{variant}_path"] = stored["storage_path"]
+        updates[f"{variant}_url"] = stored["public_url"]
+        updates[f"{variant}_size"] = stored["size"]
+    db = get_client()
+    db.collection("files").document(file_id).update(updates)
+    if content_hash:
+        hash_ref = db.collection("blob_hashes").document(content_hash)
+        if hash_ref.get().exists:
+            hash_ref.update({field: value for field, value in updates.items() if field in PREVIEW_FIELDS or field == "updated_at"})
+    logger.info(f"Stored previews for {file_id}")
+    return updates
+
+
+_pipeline: Optional[PreviewPipeline] = None
+
+
+def get_preview_pipeline() -> PreviewPipeline:
+    global _pipeline
+    if _pipeline is None:
+        from .config.settings import get_settings
+        settings = get_settings()
+        _pipeline = PreviewPipeline(settings.preview_workers, settings.preview_queue_limit)
+    return _pipeline
@@ -0,0 +1,359 @@
+"""
+Opt-in per-request profiling.
+
+A lightweight sampling profiler that records the Python stacks of the threads
+serving a single request. The request middleware starts a profile on the event
+loop thread; work a request hands to worker threads (sync endpoints, threadpool
+calls, streamed response bodies) attaches those threads through profiled() and
+profiled_iter(). Finished profiles are kept in a bounded in-memory ring and
+exposed through /api/debug/profiles.
+"""
+from __future__ import annotations
+
+import contextvars
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, Iterator, Optional, TypeVar
+
+logger = logging.getLogger("myvault.profiling")
+
+T = TypeVar("T")
+
+# A profile whose response body is never sent (e.g. the client left first) is dropped after this long
+MAX_PROFILE_SECONDS = 600
+
+_APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Path fragments used to attribute sampled time to Firestore, Storage or plain Python
+_FIRESTORE_MARKERS = (
+    os.sep + os.path.join("google", "cloud", "firestore"),
+    os.sep + os.path.join("google", "api_core") + os.sep,
+    os.sep + "grpc" + os.sep,
+)
+_STORAGE_MARKERS = (
+    os.sep + os.path.join("google", "cloud", "storage") + os.sep,
+    os.sep + os.path.join("google", "resumable_media") + os.sep,
+    os.sep + "urllib3" + os.sep,
+)
+
+_active_profile: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar(
+    "myvault_active_profile", default=None
+)
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(_APP_ROOT):
+        short = os.path.relpath(filename, _APP_ROOT)
+    elif "site-packages" in filename:
+        short = filename.split("site-packages" + os.sep, 1)[-1]
+    else:
+        short = os.path.basename(filename)
+    return f"{code.co_name} ({short}:{code.co_firstlineno})"
+
+
+def _classify(filenames: list[str]) -> str:
+    """Attribute a sample to the innermost Firestore/Storage frame, if any."""
+    for filename in reversed(filenames):
+        if any(marker in filename for marker in _FIRESTORE_MARKERS):
+            return "firestore"
+        if any(marker in filename for marker in _STORAGE_MARKERS):
+            return "storage"
+    return "python"
+
+
+class RequestProfile:
+    """Samples collected for one request."""
+
+    def __init__(self, method: str, path: str, interval_ms: float):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.interval_ms = interval_ms
+        self.started_at = datetime.now(timezone.utc)
+        self.duration_ms: Optional[float] = None
+        self.status_code: Optional[int] = None
+        self.samples = 0
+        self._start = time.perf_counter()
+        self._threads: dict[int, int] = {}
+        # Sampled wall time (ms) per stack and per bucket
+        self._stacks: dict[tuple[str, ...], float] = {}
+        self._buckets = {"firestore": 0.0, "storage": 0.0, "python": 0.0}
+        self._lock = threading.Lock()
+
+    def attach_thread(self) -> None:
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] = self._threads.get(ident, 0) + 1
+
+    def detach_thread(self) -> None:
+        ident = threading.get_ident()
+        with self._lock:
+            depth = self._threads.get(ident, 0) - 1
+            if depth > 0:
+                self._threads[ident] = depth
+            else:
+                self._threads.pop(ident, None)
+
+    def sample(self, frames: dict, elapsed_ms: float) -> None:
+        with self._lock:
+            idents = list(self._threads)
+        for ident in idents:
+            frame = frames.get(ident)
+            if frame is None:
+                continue
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            codes.reverse()
+            # Start the stack at the outermost application frame to drop server plumbing;
+            # a thread with no application frame on its stack is idle, not serving us.
+            for i, code in enumerate(codes):
+                if code.co_filename.startswith(_APP_ROOT):
+                    codes = codes[i:]
+                    break
+            else:
+                continue
+            stack = tuple(_frame_label(code) for code in codes)
+            bucket = _classify([code.co_filename for code in codes])
+            with self._lock:
+                self._stacks[stack] = self._stacks.get(stack, 0.0) + elapsed_ms
+                self._buckets[bucket] += elapsed_ms
+                self.samples += 1
+
+    def finish(self, status_code: Optional[int]) -> None:
+        self.duration_ms = (time.perf_counter() - self._start) * 1000
+        self.status_code = status_code
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status_code": self.status_code,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms or 0.0, 3),
+            "samples": self.samples,
+            "interval_ms": self.interval_ms,
+            "time_ms": {k: round(v, 3) for k, v in self._buckets.items()},
+        }
+
+    def call_tree(self) -> dict:
+        root = {"name": "<root>", "ms": 0.0, "children": {}}
+        for stack, ms in self._stacks.items():
+            node = root
+            node["ms"] += ms
+            for label in stack:
+                node = node["children"].setdefault(label, {"name": label, "ms": 0.0, "children": {}})
+                node["ms"] += ms
+
+        def _render(node: dict) -> dict:
+            children = sorted(node["children"].values(), key=lambda n: n["ms"], reverse=True)
+            return {
+                "name": node["name"],
+                "ms": round(node["ms"], 3),
+                "children": [_render(child) for child in children],
+            }
+
+        return _render(root)
+
+    def functions(self, limit: int = 50) -> list[dict]:
+        totals: dict[str, float] = {}
+        selfs: dict[str, float] = {}
+        for stack, ms in self._stacks.items():
+            for label in set(stack):
+                totals[label] = totals.get(label, 0.0) + ms
+            if stack:
+                selfs[stack[-1]] = selfs.get(stack[-1], 0.0) + ms
+        ranked = sorted(totals.items(), key=lambda kv: kv[1], reverse=True)[:limit]
+        return [
+            {"function": label, "total_ms": round(total, 3), "self_ms": round(selfs.get(label, 0.0), 3)}
+            for label, total in ranked
+        ]
+
+    def collapsed(self) -> str:
+        """Folded stacks (weights in microseconds), as consumed by flamegraph.pl and speedscope."""
+        lines = [";".join(stack) + f" {int(ms * 1000)}" for stack, ms in self._stacks.items() if stack]
+        return "\n".join(sorted(lines)) + "\n"
+
+    def to_dict(self) -> dict:
+        result = self.summary()
+        result["functions"] = self.functions()
+        result["call_tree"] = self.call_tree()
+        return result
+
+
+class _Sampler:
+    """Single background thread sampling every active profile."""
+
+    def __init__(self):
+        self._profiles: set[RequestProfile] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles.add(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="myvault-profiler", daemon=True)
+                self._thread.start()
+
+    def remove(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles.discard(profile)
+
+    def _run(self) -> None:
+        last = time.perf_counter()
+        while True:
+            with self._lock:
+                stale = {p for p in self._profiles if time.perf_counter() - p._start > MAX_PROFILE_SECONDS}
+                if stale:
+                    logger.warning(f"Dropping {len(stale)} profile(s) still open after {MAX_PROFILE_SECONDS}s")
+                    self._profiles -= stale
+                profiles = list(self._profiles)
+                if not profiles:
+                    self._thread = None
+                    return
+            # Weight each sample by the real gap since the previous one; sleeps overshoot under load
+            now = time.perf_counter()
+            elapsed_ms = (now - last) * 1000
+            last = now
+            frames = sys._current_frames()
+            for profile in profiles:
+                profile.sample(frames, elapsed_ms)
+            del frames
+            time.sleep(min(p.interval_ms for p in profiles) / 1000.0)
+
+
+class ProfileStore:
+    """Bounded ring of finished profiles, newest last."""
+
+    def __init__(self, maxlen: int):
+        self._profiles: deque[RequestProfile] = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles.append(profile)
+
+    def list(self) -> list[RequestProfile]:
+        with self._lock:
+            return list(reversed(self._profiles))
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        with self._lock:
+            for profile in self._profiles:
+                if profile.id == profile_id:
+                    return profile
+        return None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._profiles.clear()
+
+
+_sampler = _Sampler()
+_store: Optional[ProfileStore] = None
+
+
+def get_profile_store() -> ProfileStore:
+    global _store
+    if _store is None:
+        from .config.settings import get_settings
+        _store = ProfileStore(maxlen=max(1, get_settings().profile_ring_size))
+    return _store
+
+
+def current_profile() -> Optional[RequestProfile]:
+    return _active_profile.get()
+
+
+def start_profile(method: str, path: str, interval_ms: float) -> tuple[RequestProfile, contextvars.Token]:
+    """Begin profiling the current request. The calling thread is attached immediately."""
+    profile = RequestProfile(method, path, interval_ms)
+    token = _active_profile.set(profile)
+    profile.attach_thread()
+    _sampler.add(profile)
+    return profile, token
+
+
+def profiled(fn: Callable[..., T]) -> Callable[..., T]:
+    """Wrap a callable run in a worker thread so the active request profile samples that thread."""
+    @functools.wraps(fn)
+    def run(*args, **kwargs) -> T:
+        profile = current_profile()
+        if profile is None:
+            return fn(*args, **kwargs)
+        profile.attach_thread()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.detach_thread()
+
+    return run
+
+
+def profiled_iter(iterator: Iterator[T]) -> Iterator[T]:
+    """
+    A sync response body iterator whose chunks, each produced in some worker
+    thread, are sampled by the profile of the request that created it.
+    """
+    profile = current_profile()
+    if profile is None:
+        return iterator
+
+    class _Profiled:
+        def __iter__(self):
+            return self
+
+        def __next__(self) -> T:
+            profile.attach_thread()
+            try:
+                return next(iterator)
+            finally:
+                profile.detach_thread()
+
+    return _Profiled()
+
+
+def finish_profile_after_body(
+    profile: RequestProfile, token: contextvars.Token, status_code: int, body: AsyncIterator[bytes]
+) -> AsyncIterator[bytes]:
+    """
+    End the request's profile scope now, but keep sampling until `body` has been
+    sent: streamed bodies are produced after the middleware has the response.
+    """
+    _active_profile.reset(token)
+
+    async def send() -> AsyncIterator[bytes]:
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            _complete_profile(profile, status_code)
+
+    return send()
+
+
+def finish_profile(profile: RequestProfile, token: contextvars.Token, status_code: Optional[int]) -> None:
+    _active_profile.reset(token)
+    _complete_profile(profile, status_code)
+
+
+def _complete_profile(profile: RequestProfile, status_code: Optional[int]) -> None:
+    _sampler.remove(profile)
+    profile.detach_thread()
+    profile.finish(status_code)
+    get_profile_store().add(profile)
+    logger.info(
+        f"Profiled {profile.method} {profile.path}: {profile.duration_ms:.1f}ms, "
+        f"{profile.samples} samples (id={profile.id})"
+    )
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, Literal, Union
 from enum import Enum
 
@@ -165,6 +165,118 @@ class MonthlyReport(BaseModel):
     expense_by_category: list[ExpenseReport]
 
 
+Granularity = Literal["day", "week", "month"]
+
+
+class TrendBucket(BaseModel):
+    period: str  # YYYY-MM for months, the first day (a Monday for weeks) otherwise
+    income: float
+    expense: float
+    net: float
+    count: int
+    expense_p50: Optional[float] = None
+    expense_p90: Optional[float] = None
+
+
+class ExpenseTrendOut(BaseModel):
+    granularity: Granularity
+    buckets: list[TrendBucket]
+    rows: int
+    compute_ms: float
+
+
+class WeekdayStats(BaseModel):
+    weekday: int  # 0 = Monday
+    name: str
+    total: float
+    count: int
+    average_amount: Optional[float] = None
+    average_per_day: Optional[float] = None
+    p50: Optional[float] = None
+    p90: Optional[float] = None
+
+
+class ExpenseWeekdayOut(BaseModel):
+    is_income: bool
+    weekdays: list[WeekdayStats]
+    rows: int
+    compute_ms: float
+
+
+class RollingPoint(BaseModel):
+    day: date
+    expense: float
+    income: float
+    rolling_expense: float
+    rolling_income: float
+
+
+class ExpenseRollingOut(BaseModel):
+    window_days: int
+    points: list[RollingPoint]
+    daily_expense_p50: Optional[float] = None
+    daily_expense_p90: Optional[float] = None
+    daily_expense_p99: Optional[float] = None
+    rows: int
+    compute_ms: float
+
+
+class SeriesBucket(BaseModel):
+    period: str  # YYYY-MM for months, the first day (a Monday for weeks) otherwise
+    income: float
+    expense: float
+    net: float
+    count: int
+    expense_by_category: dict[str, float]  # categories with no expense are left out
+    previous_income: Optional[float] = None  # same bucket a year earlier, with compare
+    previous_expense: Optional[float] = None
+
+
+class ExpenseSeriesOut(BaseModel):
+    granularity: Granularity
+    start_date: date
+    end_date: date
+    source: Literal["ledger", "query"]
+    total_income: float
+    total_expense: float
+    net_amount: float
+    buckets: list[SeriesBucket]
+    rows: int
+    compute_ms: float
+
+
+# Rows accepted per bulk request; writes are committed in batches of up to 500
+BULK_MAX_ROWS = 2000
+
+
+class BulkRowResult(BaseModel):
+    index: int
+    ok: bool
+    id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BulkWriteOut(BaseModel):
+    succeeded: int
+    failed: int
+    results: list[BulkRowResult]
+
+
+class BulkMutationOut(BaseModel):
+    matched: int
+    succeeded: int
+    failed: int
+
+
+class TaskBulkUpdate(BaseModel):
+    is_done: Optional[bool] = None
+    due_at: Optional[datetime] = None
+
+
+class ChatConversationStatusUpdate(BaseModel):
+    status: Literal["sent", "delivered", "read"] = "read"
+
+
 class FileUploadOut(BaseModel):
     id: str
     item_id: str
@@ -177,11 +289,42 @@ class FileUploadOut(BaseModel):
     folder: str
     uploaded_at: datetime
     item: ItemOut
+    thumbnail_url: Optional[str] = None
+    preview_url: Optional[str] = None
+    content_hash: Optional[str] = None
+    deduplicated: Optional[bool] = None
 
     class Config:
         from_attributes = True
 
 
+class FileUploadResult(BulkRowResult):
+    filename: Optional[str] = None
+    file: Optional[FileUploadOut] = None
+
+
+class FileUploadManyOut(BaseModel):
+    succeeded: int
+    failed: int
+    results: list[FileUploadResult]
+
+
+class SignedUrlBatchRequest(BaseModel):
+    file_ids: list[str] = Field(min_length=1, max_length=100)
+    expiration_hours: int = Field(default=1, ge=1, le=24)
+
+
+class SignedUrlOut(BaseModel):
+    file_id: str
+    url: str
+    expires_at: datetime
+
+
+class SignedUrlBatchOut(BaseModel):
+    urls: list[SignedUrlOut]
+    missing: list[str]
+
+
 class DocumentCreate(BaseModel):
     title: str
     content: Optional[str] = None
@@ -0,0 +1,347 @@
+"""Vectorized expense analytics over the in-memory ledger."""
+from __future__ import annotations
+
+import time
+from datetime import date, timedelta
+from typing import Optional, TYPE_CHECKING
+
+import numpy as np
+
+from ..expense_ledger import CATEGORIES, CATEGORY_CODES, EPOCH_ORDINAL, LedgerView, epoch_day
+
+if TYPE_CHECKING:
+    from ..schemas import ExpenseCategory
+
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+# Longest daily series the endpoints compute
+MAX_SERIES_DAYS = 366 * 10
+
+# Year-over-year offset for day and week buckets: 52 weeks keeps weekdays aligned
+YOY_DAYS = 364
+
+
+def day_to_date(day: int) -> date:
+    return date.fromordinal(int(day) + EPOCH_ORDINAL)
+
+
+def _weekday(days: np.ndarray) -> np.ndarray:
+    # 1970-01-01 was a Thursday; Monday = 0
+    return (days + 3) % 7
+
+
+def _month_index(days: np.ndarray) -> np.ndarray:
+    """Months since 1970-01 for epoch days."""
+    return days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+
+
+def _mask(
+    view: LedgerView,
+    start_day: Optional[int],
+    end_day: Optional[int],
+    category: Optional[ExpenseCategory],
+    is_income: Optional[bool] = None,
+) -> np.ndarray:
+    mask = np.ones(len(view), dtype=bool)
+    if start_day is not None:
+        mask &= view.days >= start_day
+    if end_day is not None:
+        mask &= view.days <= end_day
+    if category is not None:
+        code = CATEGORY_CODES.get(category.value if hasattr(category, "value") else str(category))
+        mask &= view.categories == code
+    if is_income is not None:
+        mask &= view.is_income == is_income
+    return mask
+
+
+def group_percentiles(groups: np.ndarray, values: np.ndarray, n_groups: int, percentiles: tuple) -> list[np.ndarray]:
+    """
+    Per-group percentiles (linear interpolation, as np.percentile) for group
+    indexes 0..n_groups-1 in one sort; NaN for empty groups.
+    """
+    order = np.lexsort((values, groups))
+    ordered = values[order]
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    results = []
+    for q in percentiles:
+        position = starts + (counts - 1).clip(min=0) * (q / 100)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        if len(ordered):
+            low, high = low.clip(max=len(ordered) - 1), high.clip(max=len(ordered) - 1)
+            result = ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+        else:
+            result = np.zeros(n_groups)
+        results.append(np.where(counts > 0, result, np.nan))
+    return results
+
+
+def _optional(value: float) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+def _bucket_index(days: np.ndarray, first: int, last: int, granularity: str, month_shift: int = 0) -> tuple:
+    """
+    Bucket index per epoch day and the bucket labels for first..last (weeks start
+    on Monday). `month_shift` moves month keys forward, e.g. 12 to line up last
+    year's rows with this year's buckets.
+    """
+    if granularity == "month":
+        keys = _month_index(days) + month_shift
+        bounds = _month_index(np.array([first, last]))
+        first_key, n_buckets = int(bounds[0]), int(bounds[1] - bounds[0]) + 1
+        index = keys - first_key
+        labels = [str(np.datetime64(first_key + i, "M")) for i in range(n_buckets)]
+    else:
+        step = 7 if granularity == "week" else 1
+        if step == 7:
+            days = days - _weekday(days)
+            first -= (first + 3) % 7
+        n_buckets = (last - first) // step + 1
+        index = (days - first) // step
+        labels = [day_to_date(first + i * step).isoformat() for i in range(n_buckets)]
+    return index.astype(np.int64), labels, n_buckets
+
+
+def previous_year_range(start_date: date, end_date: date, granularity: str) -> tuple[date, date]:
+    """The range whose rows feed year-over-year comparisons for start_date..end_date."""
+    if granularity == "month":
+        months = _month_index(np.array([epoch_day(start_date), epoch_day(end_date)])) - 12
+        first = np.datetime64(int(months[0]), "M").astype("datetime64[D]")
+        last = np.datetime64(int(months[1]) + 1, "M").astype("datetime64[D]") - 1
+        return first.item(), last.item()
+    return start_date - timedelta(days=YOY_DAYS), end_date - timedelta(days=YOY_DAYS)
+
+
+def expense_trend(
+    view: LedgerView,
+    granularity: str = "month",
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    category: Optional[ExpenseCategory] = None,
+) -> dict:
+    """
+    Income, expense, net and count per day, week (starting Monday) or month, with
+    the median and 90th percentile expense amount per bucket. Every bucket in the
+    range is returned, empty ones included.
+    """
+    started = time.perf_counter()
+    mask = _mask(view, epoch_day(start_date), epoch_day(end_date), category)
+    days, amounts, income = view.days[mask], view.amounts[mask], view.is_income[mask]
+    if not len(days) and (start_date is None or end_date is None):
+        return {"granularity": granularity, "buckets": [], "rows": 0, "compute_ms": 0.0}
+    first = epoch_day(start_date) if start_date else int(days.min())
+    last = epoch_day(end_date) if end_date else int(days.max())
+
+    index, labels, n_buckets = _bucket_index(days, first, last, granularity)
+    income_totals = np.bincount(index, weights=np.where(income, amounts, 0.0), minlength=n_buckets)
+    expense_totals = np.bincount(index, weights=np.where(income, 0.0, amounts), minlength=n_buckets)
+    counts = np.bincount(index, minlength=n_buckets)
+    p50, p90 = group_percentiles(index[~income], amounts[~income], n_buckets, (50, 90))
+
+    buckets = [
+        {
+            "period": labels[i],
+            "income": round(float(income_totals[i]), 2),
+            "expense": round(float(expense_totals[i]), 2),
+            "net": round(float(income_totals[i] - expense_totals[i]), 2),
+            "count": int(counts[i]),
+            "expense_p50": _optional(p50[i]),
+            "expense_p90": _optional(p90[i]),
+        }
+        for i in range(n_buckets)
+    ]
+    return {
+        "granularity": granularity,
+        "buckets": buckets,
+        "rows": int(mask.sum()),
+        "compute_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+def expense_by_weekday(
+    view: LedgerView,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    category: Optional[ExpenseCategory] = None,
+    is_income: bool = False,
+) -> dict:
+    """
+    Totals and amount distribution per weekday. `average_per_day` divides the
+    total by how many of that weekday fall in the range, so quiet days count.
+    """
+    started = time.perf_counter()
+    mask = _mask(view, epoch_day(start_date), epoch_day(end_date), category, is_income)
+    days, amounts = view.days[mask], view.amounts[mask]
+    weekday = _weekday(days).astype(np.int64)
+    totals = np.bincount(weekday, weights=amounts, minlength=7)
+    counts = np.bincount(weekday, minlength=7)
+    p50, p90 = group_percentiles(weekday, amounts, 7, (50, 90))
+
+    if len(days) or (start_date and end_date):
+        first = epoch_day(start_date) if start_date else int(days.min())
+        last = epoch_day(end_date) if end_date else int(days.max())
+        occurrences = np.bincount(_weekday(np.arange(first, last + 1)), minlength=7)
+    else:
+        occurrences = np.zeros(7, dtype=np.int64)
+
+    weekdays = [
+        {
+            "weekday": i,
+            "name": WEEKDAYS[i],
+            "total": round(float(totals[i]), 2),
+            "count": int(counts[i]),
+            "average_amount": round(float(totals[i] / counts[i]), 2) if counts[i] else None,
+            "average_per_day": round(float(totals[i] / occurrences[i]), 2) if occurrences[i] else None,
+            "p50": _optional(p50[i]),
+            "p90": _optional(p90[i]),
+        }
+        for i in range(7)
+    ]
+    return {
+        "is_income": is_income,
+        "weekdays": weekdays,
+        "rows": int(mask.sum()),
+        "compute_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+def expense_rolling(
+    view: LedgerView,
+    window_days: int = 30,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    category: Optional[ExpenseCategory] = None,
+) -> dict:
+    """
+    Daily income and expense with trailing `window_days` sums, for each day from
+    `start_date` to `end_date` (default: the year up to the latest expense), plus
+    percentiles of daily spend over the range.
+    """
+    started = time.perf_counter()
+    if end_date is None:
+        end_date = day_to_date(int(view.days.max())) if len(view) else date.today()
+    if start_date is None:
+        start_date = end_date - timedelta(days=364)
+    first, last = epoch_day(start_date), epoch_day(end_date)
+    if last < first:
+        return {"window_days": window_days, "points": [], "rows": 0, "compute_ms": 0.0}
+    # Days before the range still feed the first windows
+    lead = first - (window_days - 1)
+    mask = _mask(view, lead, last, category)
+    index = (view.days[mask] - lead).astype(np.int64)
+    amounts, income = view.amounts[mask], view.is_income[mask]
+    length = last - lead + 1
+    daily_expense = np.bincount(index, weights=np.where(income, 0.0, amounts), minlength=length)
+    daily_income = np.bincount(index, weights=np.where(income, amounts, 0.0), minlength=length)
+
+    def trailing(daily: np.ndarray) -> np.ndarray:
+        cumulative = np.concatenate(([0.0], np.cumsum(daily)))
+        return (cumulative[window_days:] - cumulative[:-window_days])
+
+    rolling_expense = trailing(daily_expense)
+    rolling_income = trailing(daily_income)
+    in_range = daily_expense[window_days - 1:]
+    p50, p90, p99 = np.percentile(in_range, (50, 90, 99)) if len(in_range) else (np.nan,) * 3
+
+    points = [
+        {
+            "day": day_to_date(first + i),
+            "expense": round(float(daily_expense[window_days - 1 + i]), 2),
+            "income": round(float(daily_income[window_days - 1 + i]), 2),
+            "rolling_expense": round(float(rolling_expense[i]), 2),
+            "rolling_income": round(float(rolling_income[i]), 2),
+        }
+        for i in range(last - first + 1)
+    ]
+    return {
+        "window_days": window_days,
+        "points": points,
+        "daily_expense_p50": _optional(p50),
+        "daily_expense_p90": _optional(p90),
+        "daily_expense_p99": _optional(p99),
+        "rows": int(mask.sum()),
+        "compute_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+def report_series(
+    view: LedgerView,
+    start_date: date,
+    end_date: date,
+    granularity: str = "month",
+    compare: bool = False,
+) -> dict:
+    """
+    Income, expense, net, count and expense per category for every bucket from
+    start_date to end_date, in one pass over the view. With `compare`, each bucket
+    also carries the totals of the same bucket a year earlier (12 months back for
+    months, 52 weeks back for days and weeks, so weekdays line up).
+    """
+    first, last = epoch_day(start_date), epoch_day(end_date)
+    mask = _mask(view, first, last, None)
+    days, amounts, income = view.days[mask], view.amounts[mask], view.is_income[mask]
+    index, labels, n_buckets = _bucket_index(days, first, last, granularity)
+
+    income_totals = np.bincount(index, weights=np.where(income, amounts, 0.0), minlength=n_buckets)
+    expense_totals = np.bincount(index, weights=np.where(income, 0.0, amounts), minlength=n_buckets)
+    counts = np.bincount(index, minlength=n_buckets)
+    # Stored categories outside ExpenseCategory are reported as "other"
+    codes = view.categories[mask].astype(np.int64)
+    codes = np.where(codes < len(CATEGORIES), codes, CATEGORY_CODES["other"])
+    by_category = np.bincount(
+        index * len(CATEGORIES) + codes,
+        weights=np.where(income, 0.0, amounts),
+        minlength=n_buckets * len(CATEGORIES),
+    ).reshape(n_buckets, len(CATEGORIES))
+
+    rows = int(mask.sum())
+    if compare:
+        prev_start, prev_end = previous_year_range(start_date, end_date, granularity)
+        prev_mask = _mask(view, epoch_day(prev_start), epoch_day(prev_end), None)
+        prev_days, prev_amounts = view.days[prev_mask], view.amounts[prev_mask]
+        prev_income = view.is_income[prev_mask]
+        if granularity == "month":
+            prev_index, _, _ = _bucket_index(prev_days, first, last, granularity, month_shift=12)
+        else:
+            prev_index, _, _ = _bucket_index(prev_days + YOY_DAYS, first, last, granularity)
+        previous_income = np.bincount(
+            prev_index, weights=np.where(prev_income, prev_amounts, 0.0), minlength=n_buckets
+        )
+        previous_expense = np.bincount(
+            prev_index, weights=np.where(prev_income, 0.0, prev_amounts), minlength=n_buckets
+        )
+        rows += int(prev_mask.sum())
+
+    buckets = []
+    for i in range(n_buckets):
+        bucket = {
+            "period": labels[i],
+            "income": round(float(income_totals[i]), 2),
+            "expense": round(float(expense_totals[i]), 2),
+            "net": round(float(income_totals[i] - expense_totals[i]), 2),
+            "count": int(counts[i]),
+            "expense_by_category": {
+                CATEGORIES[code]: round(float(total), 2)
+                for code, total in enumerate(by_category[i])
+                if total
+            },
+        }
+        if compare:
+            bucket["previous_income"] = round(float(previous_income[i]), 2)
+            bucket["previous_expense"] = round(float(previous_expense[i]), 2)
+        buckets.append(bucket)
+
+    total_income, total_expense = float(income_totals.sum()), float(expense_totals.sum())
+    return {
+        "granularity": granularity,
+        "start_date": start_date,
+        "end_date": end_date,
+        "total_income": round(total_income, 2),
+        "total_expense": round(total_expense, 2),
+        "net_amount": round(total_income - total_expense, 2),
+        "buckets": buckets,
+        "rows": rows,
+    }
@@ -2,26 +2,49 @@
 from __future__ import annotations
 
 import logging
+from collections import Counter
 from datetime import datetime, timezone
-from typing import Optional
-
-from google.cloud.firestore import Client, DocumentReference, FieldFilter
-from google.api_core.exceptions import FailedPrecondition
+from typing import Optional, TYPE_CHECKING
 
+from ..chat_status import MESSAGE_STATUSES, conversation_ref, get_status_coalescer, read_counter, set_counter
+from ..firestore_db import MAX_BATCH_WRITES, commit_write_groups, tombstone, write_results
+from ..firestore_queries import iter_query_pages, stream_query
 from ..schemas import ChatMessageCreate
 
+if TYPE_CHECKING:
+    from google.cloud.firestore import Client
+
 logger = logging.getLogger("myvault.chat_service")
 
 
-def create_chat_message(db: Client, payload: ChatMessageCreate) -> dict:
-    now = datetime.now(timezone.utc)
-    item_ref = db.collection("items").document()
-    msg_ref = db.collection("chat_messages").document()
+def _count_new_messages(db: Client, conversation_id: str, messages: int, unread: int, now: datetime) -> None:
+    """
+    Add already committed messages to a conversation's counters. Only messages not
+    sent by the user count as unread; a backfilled counter already includes them.
+    """
+    from google.cloud import firestore
+
+    @firestore.transactional
+    def apply(transaction) -> None:
+        counts, recounted = read_counter(db, transaction, conversation_id)
+        if not recounted:
+            counts["message_count"] += messages
+            counts["unread_count"] += unread
+        set_counter(db, transaction, conversation_id, counts, recounted, now, last_message_at=now)
+
+    apply(db.transaction())
+
+
+def _build_chat_docs(db: Client, payload: ChatMessageCreate, now: datetime, doc_id: Optional[str] = None) -> tuple:
+    # doc_id (used for both documents) makes writes idempotent and reproducible (synthetic data)
+    item_ref = db.collection("items").document(doc_id)
+    msg_ref = db.collection("chat_messages").document(doc_id)
     
     # Create item document
     item_doc = {
         "id": item_ref.id,
         "kind": "chat",
+        "owner": "chat_messages",
         "title": f"Chat message: {payload.message[:50]}...",
         "content": payload.message,
         "created_at": now,
@@ -39,12 +62,26 @@ def create_chat_message(db: Client, payload: ChatMessageCreate) -> dict:
         "created_at": now,
         "updated_at": now,
     }
+    return item_ref, item_doc, msg_ref, chat_doc
+
+
+def create_chat_message(db: Client, payload: ChatMessageCreate) -> dict:
+    from google.cloud import firestore
+
+    now = datetime.now(timezone.utc)
+    item_ref, item_doc, msg_ref, chat_doc = _build_chat_docs(db, payload, now)
     
-    # Write both documents
-    batch = db.batch()
-    batch.set(item_ref, item_doc)
-    batch.set(msg_ref, chat_doc)
-    batch.commit()
+    # Write both documents and count the new message on its conversation
+    @firestore.transactional
+    def create(transaction) -> None:
+        counts, recounted = read_counter(db, transaction, payload.conversation_id)
+        transaction.set(item_ref, item_doc)
+        transaction.set(msg_ref, chat_doc)
+        counts["message_count"] += 1
+        counts["unread_count"] += 0 if chat_doc["is_user"] else 1
+        set_counter(db, transaction, payload.conversation_id, counts, recounted, now, last_message_at=now)
+
+    create(db.transaction())
     
     # Return chat message with embedded item
     result = chat_doc.copy()
@@ -52,6 +89,34 @@ def create_chat_message(db: Client, payload: ChatMessageCreate) -> dict:
     return result
 
 
+def create_chat_messages_bulk(db: Client, payloads: list[ChatMessageCreate]) -> list[dict]:
+    """Create many chat messages; each item/message pair is committed in the same batch."""
+    now = datetime.now(timezone.utc)
+    ids: list[str] = []
+    from_user: list[bool] = []
+    groups: list[list[tuple]] = []
+    for payload in payloads:
+        item_ref, item_doc, msg_ref, chat_doc = _build_chat_docs(db, payload, now)
+        ids.append(msg_ref.id)
+        from_user.append(chat_doc["is_user"])
+        groups.append([("set", item_ref, item_doc), ("set", msg_ref, chat_doc)])
+    errors = commit_write_groups(db, groups)
+
+    # One counter write per conversation rather than one per message
+    created: Counter = Counter()
+    unread: Counter = Counter()
+    for payload, is_user, error in zip(payloads, from_user, errors):
+        if error is None:
+            created[payload.conversation_id] += 1
+            unread[payload.conversation_id] += 0 if is_user else 1
+    for cid, n in created.items():
+        try:
+            _count_new_messages(db, cid, n, unread[cid], now)
+        except Exception as e:
+            logger.error(f"Failed to update counters of conversation {cid}: {str(e)}", exc_info=True)
+    return write_results(ids, errors)
+
+
 def get_chat_message_by_id(db: Client, message_id: str) -> Optional[dict]:
     """Get a single chat message by ID."""
     try:
@@ -103,6 +168,8 @@ def get_chat_message_by_id(db: Client, message_id: str) -> Optional[dict]:
 
 
 def get_chat_messages(db: Client, conversation_id: Optional[str] = None, limit: int = 50, offset: int = 0) -> list[dict]:
+    from google.cloud.firestore import FieldFilter
+
     logger.info(f"Getting chat messages: conversation_id={conversation_id}, limit={limit}, offset={offset}")
     
     try:
@@ -110,12 +177,12 @@ def get_chat_messages(db: Client, conversation_id: Optional[str] = None, limit:
         if conversation_id:
             q = q.where(filter=FieldFilter("conversation_id", "==", conversation_id))
         
-        try:
-            q = q.order_by("created_at", direction="DESCENDING")
-            messages = [d.to_dict() for d in q.offset(offset).limit(limit).stream()]
-        except FailedPrecondition:
-            # Fallback without ordering if index missing
-            messages = [d.to_dict() for d in q.offset(offset).limit(limit).stream()]
+        ordered = q.order_by("created_at", direction="DESCENDING")
+        # Fall back to unordered results if the composite index is missing
+        messages = [
+            d.to_dict()
+            for d in stream_query(ordered.offset(offset).limit(limit), fallback=q.offset(offset).limit(limit))
+        ]
         
         logger.info(f"Found {len(messages)} chat messages")
         
@@ -182,24 +249,79 @@ def get_chat_messages(db: Client, conversation_id: Optional[str] = None, limit:
 
 
 def update_message_status(db: Client, message_id: str, status: str) -> Optional[dict]:
-    ref = db.collection("chat_messages").document(str(message_id))
-    if not ref.get().exists:
+    snap = db.collection("chat_messages").document(str(message_id)).get()
+    if not snap.exists:
         return None
     
-    updates = {"status": status, "updated_at": datetime.now(timezone.utc)}
-    if status == "delivered":
-        updates["delivered_at"] = datetime.now(timezone.utc)
-    elif status == "read":
-        updates["read_at"] = datetime.now(timezone.utc)
-    
-    ref.set(updates, merge=True)
-    return ref.get().to_dict()
+    # Rapid delivered -> read transitions are merged into one write by the coalescer;
+    # the request waits for that write, so the change is stored once it's acknowledged
+    data = snap.to_dict()
+    coalescer = get_status_coalescer()
+    updates, window = coalescer.submit(
+        str(message_id), data.get("status"), status, datetime.now(timezone.utc)
+    )
+    if window is not None and not coalescer.wait(window, str(message_id)):
+        raise RuntimeError(f"Status update for message {message_id} was not saved")
+    if updates:
+        data.update(updates)
+    data.setdefault("delivered_at", None)
+    data.setdefault("read_at", None)
+    return data
+
+
+def update_conversation_status(db: Client, conversation_id: str, status: str) -> dict:
+    """Move every message of a conversation that is behind `status` up to it (e.g. mark all read)."""
+    from google.cloud.firestore import FieldFilter
+
+    matched = updated = 0
+    earlier = list(MESSAGE_STATUSES[:MESSAGE_STATUSES.index(status)])
+    if earlier:
+        now = datetime.now(timezone.utc)
+        updates = {"status": status, "updated_at": now}
+        if status == "delivered":
+            updates["delivered_at"] = now
+        elif status == "read":
+            updates["read_at"] = now
+
+        q = (
+            db.collection("chat_messages")
+            .where(filter=FieldFilter("conversation_id", "==", conversation_id))
+            .where(filter=FieldFilter("status", "in", earlier))
+            .select(["status"])
+        )
+        for page in iter_query_pages(q, page_size=MAX_BATCH_WRITES):
+            errors = commit_write_groups(db, [[("update", snap.reference, updates)] for snap in page])
+            matched += len(page)
+            updated += sum(1 for error in errors if error is None)
+    if status == "read":
+        _recount_unread(db, conversation_id)
+    logger.info(f"Marked {updated}/{matched} messages in {conversation_id} as {status}")
+    return {"matched": matched, "succeeded": updated, "failed": matched - updated}
+
+
+def _recount_unread(db: Client, conversation_id: str) -> int:
+    """
+    Recount a conversation's message and unread counters from its messages. The
+    counter document is read in the same transaction, so a new message or a
+    coalesced status flush (both write it) can't land between the count and the
+    write.
+    """
+    from google.cloud import firestore
+
+    @firestore.transactional
+    def recount(transaction) -> int:
+        counts, _ = read_counter(db, transaction, conversation_id, recount=True)
+        read_at = datetime.now(timezone.utc)
+        set_counter(db, transaction, conversation_id, counts, True, read_at, last_read_at=read_at)
+        return counts["unread_count"]
+
+    return recount(db.transaction())
 
 
 def get_conversations(db: Client, limit: int = 20) -> list[dict]:
     # Get latest message per conversation
     q = db.collection("chat_messages").order_by("created_at", direction="DESCENDING").limit(1000)
-    messages = [d.to_dict() for d in q.stream()]
+    messages = [d.to_dict() for d in stream_query(q)]
     
     latest: dict[str, dict] = {}
     counts: dict[str, int] = {}
@@ -208,11 +330,21 @@ def get_conversations(db: Client, limit: int = 20) -> list[dict]:
     for m in messages:
         cid = m.get("conversation_id")
         counts[cid] = counts.get(cid, 0) + 1
-        unread[cid] = unread.get(cid, 0) + (1 if m.get("status") == "unread" else 0)
+        unread[cid] = unread.get(cid, 0) + (1 if m.get("status") != "read" and not m.get("is_user") else 0)
         if cid not in latest:
             latest[cid] = m
     
     items = sorted(latest.values(), key=lambda x: x.get("created_at"), reverse=True)[:limit]
+
+    # Prefer the maintained counters, which cover messages beyond the scanned window,
+    # once they are trusted (backfilled from a full count)
+    refs = [conversation_ref(db, it.get("conversation_id")) for it in items if it.get("conversation_id")]
+    for snap in db.get_all(refs) if refs else []:
+        counter = snap.to_dict() if snap.exists else None
+        if counter and counter.get("counted_at") and counter.get("conversation_id") in latest:
+            cid = counter["conversation_id"]
+            counts[cid] = max(counts.get(cid, 0), counter.get("message_count", 0))
+            unread[cid] = max(0, counter.get("unread_count", 0))
     return [
         {
             "conversation_id": it.get("conversation_id"),
@@ -293,8 +425,30 @@ def update_chat_message(db: Client, message_id: str, payload: ChatMessageCreate)
 
 
 def delete_chat_message(db: Client, message_id: str) -> bool:
+    from google.cloud import firestore
+
     ref = db.collection("chat_messages").document(str(message_id))
-    if not ref.get().exists:
-        return False
-    ref.delete()
-    return True
+
+    @firestore.transactional
+    def delete(transaction) -> bool:
+        snap = ref.get(transaction=transaction)
+        if not snap.exists:
+            return False
+        data = snap.to_dict() or {}
+        cid = data.get("conversation_id")
+        counter = read_counter(db, transaction, cid) if cid else None
+        transaction.delete(ref)
+        transaction.set(*tombstone(db, ref))
+        if data.get("item_id"):
+            item_ref = db.collection("items").document(str(data["item_id"]))
+            transaction.delete(item_ref)
+            transaction.set(*tombstone(db, item_ref))
+        if counter:
+            counts, recounted = counter
+            counts["message_count"] -= 1
+            if data.get("status") != "read" and not data.get("is_user"):
+                counts["unread_count"] -= 1
+            set_counter(db, transaction, cid, counts, recounted, datetime.now(timezone.utc))
+        return True
+
+    return delete(db.transaction())
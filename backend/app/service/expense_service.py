@@ -2,25 +2,33 @@
 from __future__ import annotations
 
 import logging
+import time
 from datetime import datetime, date, timezone
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 from calendar import monthrange
 
-from google.cloud.firestore import Client, FieldFilter
-
+from ..expense_ledger import (
+    LEDGER_FIELDS, LOAD_PAGE_SIZE, LedgerView, forget_expense, get_expense_ledger, ledger_row, record_expense,
+)
+from ..firestore_db import MAX_BATCH_WRITES, commit_write_groups, delete_writes, tombstone, write_results
+from ..firestore_queries import iter_query_pages, stream_query
 from ..schemas import ExpenseCreate, ExpenseUpdate, ExpenseReport, MonthlyReport
 
+if TYPE_CHECKING:
+    from google.cloud.firestore import Client
+
 logger = logging.getLogger("myvault.expense_service")
 
 
-def create_expense(db: Client, payload: ExpenseCreate) -> dict:
-    now = datetime.now(timezone.utc)
-    item_ref = db.collection("items").document()
-    expense_ref = db.collection("expenses").document()
+def _build_expense_docs(db: Client, payload: ExpenseCreate, now: datetime, doc_id: Optional[str] = None) -> tuple:
+    # doc_id (used for both documents) makes writes idempotent, e.g. for migrations
+    item_ref = db.collection("items").document(doc_id)
+    expense_ref = db.collection("expenses").document(doc_id)
 
     item_doc = {
         "id": item_ref.id,
         "kind": "expense",
+        "owner": "expenses",
         "title": payload.title,
         "content": payload.content,
         "created_at": now,
@@ -38,26 +46,49 @@ def create_expense(db: Client, payload: ExpenseCreate) -> dict:
         "updated_at": now,
         "item": item_doc,
     }
+    return item_ref, item_doc, expense_ref, expense_doc
+
+
+def create_expense(db: Client, payload: ExpenseCreate) -> dict:
+    now = datetime.now(timezone.utc)
+    item_ref, item_doc, expense_ref, expense_doc = _build_expense_docs(db, payload, now)
 
     batch = db.batch()
     batch.set(item_ref, item_doc)
     batch.set(expense_ref, expense_doc)
     batch.commit()
+    record_expense(expense_ref.id, expense_doc)
 
     expense_doc["item"] = item_doc
     return expense_doc
 
 
-def get_expenses(
+def create_expenses_bulk(db: Client, payloads: list[ExpenseCreate]) -> list[dict]:
+    """Create many expenses; each item/expense pair is committed in the same batch."""
+    now = datetime.now(timezone.utc)
+    ids: list[str] = []
+    docs: list[dict] = []
+    groups: list[list[tuple]] = []
+    for payload in payloads:
+        item_ref, item_doc, expense_ref, expense_doc = _build_expense_docs(db, payload, now)
+        ids.append(expense_ref.id)
+        docs.append(expense_doc)
+        groups.append([("set", item_ref, item_doc), ("set", expense_ref, expense_doc)])
+    errors = commit_write_groups(db, groups)
+    for doc_id, doc, error in zip(ids, docs, errors):
+        if error is None:
+            record_expense(doc_id, doc)
+    return write_results(ids, errors)
+
+
+def _filtered_expenses(
     db: Client,
-    is_income: Optional[bool] = None,
-    category: Optional[str] = None,
-    start_date: Optional[date] = None,
-    end_date: Optional[date] = None,
-    limit: int = 50,
-    offset: int = 0,
-) -> list[dict]:
-    from google.cloud import firestore
+    is_income: Optional[bool],
+    category: Optional[str],
+    start_date: Optional[date],
+    end_date: Optional[date],
+):
+    from google.cloud.firestore import FieldFilter
 
     q = db.collection("expenses")
     if is_income is not None:
@@ -68,11 +99,25 @@ def get_expenses(
         q = q.where(filter=FieldFilter("occurred_on", ">=", datetime.combine(start_date, datetime.min.time())))
     if end_date:
         q = q.where(filter=FieldFilter("occurred_on", "<=", datetime.combine(end_date, datetime.max.time())))
-    try:
-        q = q.order_by("occurred_on", direction="DESCENDING")
-    except Exception:
-        pass  # Skip ordering if index missing
-    docs = [d.to_dict() for d in q.offset(offset).limit(limit).stream()]
+    return q
+
+
+def get_expenses(
+    db: Client,
+    is_income: Optional[bool] = None,
+    category: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    limit: int = 50,
+    offset: int = 0,
+) -> list[dict]:
+    q = _filtered_expenses(db, is_income, category, start_date, end_date)
+    ordered = q.order_by("occurred_on", direction="DESCENDING")
+    # Skip ordering if index missing
+    docs = [
+        d.to_dict()
+        for d in stream_query(ordered.offset(offset).limit(limit), fallback=q.offset(offset).limit(limit))
+    ]
     # Ensure embedded item is complete for response schema
     for e in docs:
         item = e.get("item") or {}
@@ -105,6 +150,8 @@ def update_expense(db: Client, expense_id: str, payload: ExpenseUpdate) -> Optio
         updates["occurred_on"] = payload.occurred_on
     ref.set(updates, merge=True)
     result = ref.get().to_dict()
+    if result is not None:
+        record_expense(expense_id, result)
     # Fill item from items collection if needed
     if result is not None:
         item = result.get("item") or {}
@@ -119,12 +166,54 @@ def update_expense(db: Client, expense_id: str, payload: ExpenseUpdate) -> Optio
 
 def delete_expense(db: Client, expense_id: str) -> bool:
     ref = db.collection("expenses").document(str(expense_id))
-    if not ref.get().exists:
+    snap = ref.get()
+    if not snap.exists:
         return False
-    ref.delete()
+    # Remove the linked item in the same commit so it can't be left orphaned
+    batch = db.batch()
+    batch.delete(ref)
+    batch.set(*tombstone(db, ref))
+    item_id = (snap.to_dict() or {}).get("item_id")
+    if item_id:
+        item_ref = db.collection("items").document(str(item_id))
+        batch.delete(item_ref)
+        batch.set(*tombstone(db, item_ref))
+    batch.commit()
+    forget_expense(expense_id)
     return True
 
 
+def delete_expenses_matching(
+    db: Client,
+    is_income: Optional[bool] = None,
+    category: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+) -> dict:
+    """Delete every expense matching the filters, together with its linked item."""
+    q = _filtered_expenses(db, is_income, category, start_date, end_date)
+    # Same ordering as get_expenses so the existing composite indexes serve it
+    q = q.order_by("occurred_on", direction="DESCENDING").select(["item_id", "occurred_on"])
+    matched = deleted = 0
+    # Two deletes and two tombstones per expense: a page fills one batch
+    for page in iter_query_pages(q, page_size=MAX_BATCH_WRITES // 4):
+        groups = []
+        for snap in page:
+            group = delete_writes(db, snap.reference)
+            item_id = (snap.to_dict() or {}).get("item_id")
+            if item_id:
+                group.extend(delete_writes(db, db.collection("items").document(str(item_id))))
+            groups.append(group)
+        errors = commit_write_groups(db, groups)
+        matched += len(page)
+        deleted += sum(1 for error in errors if error is None)
+        for snap, error in zip(page, errors):
+            if error is None:
+                forget_expense(snap.id)
+    logger.info(f"Deleted {deleted}/{matched} expenses matching filters")
+    return {"matched": matched, "succeeded": deleted, "failed": matched - deleted}
+
+
 def get_expense_by_category_report(
     db: Client,
     start_date: Optional[date] = None,
@@ -155,3 +244,41 @@ def get_monthly_report(db: Client, year: int, month: int) -> MonthlyReport:
         net_amount=float(income_total) - float(expense_total),
         expense_by_category=category_report,
     )
+
+
+def get_report_series(
+    db: Client,
+    start_date: date,
+    end_date: date,
+    granularity: str = "month",
+    compare: bool = False,
+) -> dict:
+    """
+    Report buckets for a whole range at once. Served from the expense ledger when
+    this instance has a fresh one, otherwise from a single projected stream of the
+    range (widened to last year's range with `compare`).
+    """
+    from .analytics_service import previous_year_range, report_series
+
+    started = time.perf_counter()
+    view = get_expense_ledger().current()
+    source = "ledger"
+    if view is None:
+        source = "query"
+        stream_start = start_date
+        if compare:
+            stream_start = previous_year_range(start_date, end_date, granularity)[0]
+        q = _filtered_expenses(db, None, None, stream_start, end_date)
+        q = q.order_by("occurred_on", direction="DESCENDING").select(LEDGER_FIELDS)
+        rows = []
+        for page in iter_query_pages(q, page_size=LOAD_PAGE_SIZE):
+            for snap in page:
+                row = ledger_row(snap.to_dict() or {})
+                if row is not None:
+                    rows.append(row)
+        view = LedgerView.from_rows(rows)
+    series = report_series(view, start_date, end_date, granularity, compare)
+    series["source"] = source
+    series["compute_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    logger.info(f"Report series {start_date}..{end_date} by {granularity} from {source}: {series['rows']} rows")
+    return series
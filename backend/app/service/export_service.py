@@ -0,0 +1,454 @@
+"""Streaming exports of Firestore collections to NDJSON, CSV, Parquet and Arrow (full, partitioned or incremental)."""
+from __future__ import annotations
+
+import csv
+import gzip
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterable, Optional, Sequence, TextIO, TYPE_CHECKING, Union
+
+from ..export_schemas import (
+    EXPORT_COLLECTIONS, ID_COLUMN, export_columns, has_watermark, to_cell, to_column_value, to_json_value,
+    typed_export_columns,
+)
+from ..firestore_db import TOMBSTONES
+from ..firestore_queries import iter_query_pages
+
+if TYPE_CHECKING:
+    from google.cloud.firestore import Client
+
+logger = logging.getLogger("myvault.export_service")
+
+EXPORT_FORMATS = ("ndjson", "csv")
+# Typed, compressed columnar formats; these need the optional pyarrow package
+COLUMNAR_FORMATS = ("parquet", "arrow")
+ALL_EXPORT_FORMATS = EXPORT_FORMATS + COLUMNAR_FORMATS
+
+# Documents read per page; memory use is bounded by one page
+EXPORT_PAGE_SIZE = 500
+# Rows buffered per Parquet row group / Arrow record batch
+ROW_GROUP_SIZE = 50_000
+
+INCREMENTAL_MANIFEST = "incremental_manifest.json"
+# Incremental runs stop this far before "now", so writes still being committed
+# (transaction retries, skewed client clocks) are picked up by the next run
+INCREMENTAL_LAG_SECONDS = 60
+# Run history kept in the incremental manifest
+INCREMENTAL_RUNS_KEPT = 50
+
+
+def export_filename(stem: str, fmt: str, compress: bool) -> str:
+    # Columnar files compress internally rather than being gzipped
+    return f"{stem}.{fmt}" + (".gz" if compress and fmt not in COLUMNAR_FORMATS else "")
+
+
+def _open_text(path: Path, compress: bool) -> TextIO:
+    if compress:
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+class ExportWriter:
+    """Writes records one at a time to an NDJSON or CSV file, optionally gzipped."""
+
+    def __init__(self, path: Path, fmt: str, columns: list[str], compress: bool = False):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format {fmt!r} (expected one of {', '.join(EXPORT_FORMATS)})")
+        self.path = path
+        self.fmt = fmt
+        self.columns = columns
+        self.count = 0
+        self._file = _open_text(path, compress)
+        self._csv = None
+        if fmt == "csv":
+            # Fixed columns: one pass, same header every run; undeclared fields are left out
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(columns)
+
+    def write(self, record: dict) -> None:
+        if self._csv is not None:
+            self._csv.writerow([to_cell(record.get(column)) for column in self.columns])
+        else:
+            self._file.write(json.dumps(record, default=to_json_value, ensure_ascii=False))
+            self._file.write("\n")
+        self.count += 1
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "ExportWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _arrow_type(pa, kind: str):
+    return {
+        "string": pa.string(),
+        "json": pa.string(),
+        "category": pa.dictionary(pa.int32(), pa.string()),
+        "int": pa.int64(),
+        "float": pa.float64(),
+        "bool": pa.bool_(),
+        "timestamp": pa.timestamp("us", tz="UTC"),
+    }[kind]
+
+
+class ColumnarWriter:
+    """
+    Writes records as typed columns to a Parquet or Arrow IPC file.
+
+    Rows are buffered per column and written every `row_group_size` records as a
+    Parquet row group or Arrow record batch, so memory is bounded by one group.
+    Category columns share one dictionary for the whole file, extended as new
+    values appear (Arrow files store the additions as dictionary deltas).
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        fmt: str,
+        columns: Sequence[tuple[str, str]],
+        compress: bool = False,
+        row_group_size: int = ROW_GROUP_SIZE,
+    ):
+        if fmt not in COLUMNAR_FORMATS:
+            raise ValueError(f"Unknown columnar format {fmt!r} (expected one of {', '.join(COLUMNAR_FORMATS)})")
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise RuntimeError("Parquet and Arrow exports need the pyarrow package (pip install -r requirements-scripts.txt)") from None
+
+        self._pa = pa
+        self.path = path
+        self.fmt = fmt
+        self.columns = list(columns)
+        self.row_group_size = row_group_size
+        self.count = 0
+        self.schema = pa.schema([(name, _arrow_type(pa, kind)) for name, kind in self.columns])
+        self._buffers: list[list] = [[] for _ in self.columns]
+        self._dictionaries: dict[int, dict[str, int]] = {
+            index: {} for index, (_, kind) in enumerate(self.columns) if kind == "category"
+        }
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(str(path), self.schema, compression="zstd")
+        else:
+            options = pa.ipc.IpcWriteOptions(compression="zstd" if compress else None, emit_dictionary_deltas=True)
+            self._writer = pa.ipc.new_file(str(path), self.schema, options=options)
+
+    def write(self, record: dict) -> None:
+        for index, (name, kind) in enumerate(self.columns):
+            value = to_column_value(record.get(name), kind)
+            dictionary = self._dictionaries.get(index)
+            if dictionary is not None and value is not None:
+                value = dictionary.setdefault(value, len(dictionary))
+            self._buffers[index].append(value)
+        self.count += 1
+        if len(self._buffers[0]) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._buffers[0]:
+            return
+        pa = self._pa
+        arrays = []
+        for index, field in enumerate(self.schema):
+            dictionary = self._dictionaries.get(index)
+            if dictionary is not None:
+                arrays.append(pa.DictionaryArray.from_arrays(
+                    pa.array(self._buffers[index], pa.int32()), pa.array(list(dictionary), pa.string())
+                ))
+            else:
+                arrays.append(pa.array(self._buffers[index], field.type))
+        self._writer.write_batch(pa.record_batch(arrays, schema=self.schema))
+        self._buffers = [[] for _ in self.columns]
+
+    def close(self) -> None:
+        try:
+            self._flush()
+        finally:
+            self._writer.close()
+
+    def __enter__(self) -> "ColumnarWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def open_export_writer(
+    path: Path, fmt: str, columns: Sequence[tuple[str, str]], compress: bool = False
+) -> Union[ExportWriter, ColumnarWriter]:
+    """A writer for any export format, from (name, type) columns."""
+    if fmt in COLUMNAR_FORMATS:
+        return ColumnarWriter(path, fmt, columns, compress)
+    return ExportWriter(path, fmt, [name for name, _ in columns], compress)
+
+
+def iter_query_records(query, page_size: int = EXPORT_PAGE_SIZE) -> Iterable[dict]:
+    """Every document a query returns as a dict with its ID under `_id`, a page at a time."""
+    for page in iter_query_pages(query, page_size=page_size):
+        for snap in page:
+            yield {ID_COLUMN: snap.id, **(snap.to_dict() or {})}
+
+
+def iter_collection_records(db: Client, collection: str, page_size: int = EXPORT_PAGE_SIZE) -> Iterable[dict]:
+    """Every document in a collection, a page at a time."""
+    return iter_query_records(db.collection(collection), page_size)
+
+
+def write_records(
+    records: Iterable[dict],
+    path: Path,
+    fmt: str,
+    columns: list[str],
+    compress: bool = False,
+) -> int:
+    """Stream records into one export file; returns how many were written."""
+    with ExportWriter(path, fmt, columns, compress) as writer:
+        for record in records:
+            writer.write(record)
+    return writer.count
+
+
+def export_collection(
+    db: Client,
+    collection: str,
+    export_dir: Path,
+    formats: Iterable[str] = EXPORT_FORMATS,
+    compress: bool = False,
+    stem: Optional[str] = None,
+    page_size: int = EXPORT_PAGE_SIZE,
+) -> dict:
+    """
+    Export a collection to one file per format in a single streamed pass.
+
+    Documents are read in keyset-paged chunks and written as they arrive, so memory
+    stays constant however large the collection is. Returns the document count and
+    the files written.
+    """
+    start = time.perf_counter()
+    count, files = _export_records(
+        iter_collection_records(db, collection, page_size), export_dir, stem or collection, collection, formats, compress
+    )
+    elapsed = time.perf_counter() - start
+    logger.info(f"Exported {count} documents from '{collection}' in {elapsed:.1f}s")
+    return {"collection": collection, "count": count, "files": files}
+
+
+def _export_records(
+    records: Iterable[dict],
+    export_dir: Path,
+    stem: str,
+    collection: str,
+    formats: Iterable[str],
+    compress: bool,
+) -> tuple[int, list[str]]:
+    columns = typed_export_columns(collection)
+    writers: list = []
+    count = 0
+    try:
+        for fmt in formats:
+            writers.append(open_export_writer(export_dir / export_filename(stem, fmt, compress), fmt, columns, compress))
+        for record in records:
+            for writer in writers:
+                writer.write(record)
+            count += 1
+    finally:
+        for writer in writers:
+            writer.close()
+    return count, [str(writer.path) for writer in writers]
+
+
+def _partition_queries(db: Client, collection: str, partitions: int) -> list[tuple]:
+    """(query, start path, end path) per partition of a collection, split by Firestore."""
+    if partitions <= 1:
+        return [(db.collection(collection), None, None)]
+    try:
+        # Partition queries only exist for collection groups; MyVault's collections
+        # are top level, so the group is the collection itself
+        found = list(db.collection_group(collection).get_partitions(partitions))
+    except Exception as e:
+        logger.warning(f"Partitioning '{collection}' failed ({str(e)}); exporting it as one stream")
+        return [(db.collection(collection), None, None)]
+    return [
+        (part.query(), getattr(part.start_at, "path", None), getattr(part.end_at, "path", None))
+        for part in found
+    ]
+
+
+def export_collection_partitioned(
+    db: Client,
+    collection: str,
+    export_dir: Path,
+    partitions: int = 8,
+    workers: int = 4,
+    formats: Iterable[str] = EXPORT_FORMATS,
+    compress: bool = False,
+    stem: Optional[str] = None,
+    page_size: int = EXPORT_PAGE_SIZE,
+) -> dict:
+    """
+    Export a collection as up to `partitions` slices read concurrently by `workers` threads.
+
+    Firestore splits the collection into key ranges of roughly equal size (partition
+    queries); each range is streamed into its own `<stem>.part-NNNN.<format>` files.
+    A `<stem>.manifest.json` lists the parts with their key ranges and counts, so a
+    reader can load them in order or in parallel. Returns the manifest.
+    """
+    start = time.perf_counter()
+    stem = stem or collection
+    formats = list(formats)
+    parts = _partition_queries(db, collection, partitions)
+
+    def export_part(index: int) -> dict:
+        query, start_path, end_path = parts[index]
+        part_start = time.perf_counter()
+        count, files = _export_records(
+            iter_query_records(query, page_size), export_dir, f"{stem}.part-{index:04d}", collection, formats, compress
+        )
+        logger.info(f"Exported part {index} of '{collection}': {count} documents in {time.perf_counter() - part_start:.1f}s")
+        return {"index": index, "start": start_path, "end": end_path, "count": count, "files": [Path(f).name for f in files]}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(parts))), thread_name_prefix="export") as pool:
+        exported = list(pool.map(export_part, range(len(parts))))
+
+    elapsed = time.perf_counter() - start
+    manifest = {
+        "collection": collection,
+        "exported_at": datetime.now(timezone.utc).isoformat(),
+        "formats": formats,
+        "compressed": compress,
+        "columns": export_columns(collection),
+        "count": sum(part["count"] for part in exported),
+        "elapsed_seconds": round(elapsed, 3),
+        "partitions": exported,
+    }
+    manifest_path = export_dir / f"{stem}.manifest.json"
+    manifest_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    logger.info(
+        f"Exported {manifest['count']} documents from '{collection}' in {len(parts)} parts "
+        f"with {workers} workers in {elapsed:.1f}s"
+    )
+    return {**manifest, "manifest": str(manifest_path)}
+
+
+def count_documents(db: Client, collection: str) -> int:
+    """Document count via a server-side count() aggregation; no documents are transferred."""
+    result = db.collection(collection).count(alias="count").get()
+    return int(result[0][0].value)
+
+
+def load_incremental_manifest(path: Path) -> dict:
+    if not path.exists():
+        return {"watermarks": {}, "runs": []}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _save_manifest(path: Path, manifest: dict) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    tmp.replace(path)
+
+
+def _changed_query(db: Client, collection: str, field: str, since: datetime, until: datetime):
+    from google.cloud.firestore import FieldFilter
+
+    # A range and order on one field only needs Firestore's automatic single-field index
+    return (
+        db.collection(collection)
+        .where(filter=FieldFilter(field, ">=", since))
+        .where(filter=FieldFilter(field, "<", until))
+        .order_by(field)
+    )
+
+
+def export_incremental(
+    db: Client,
+    export_dir: Path,
+    collections: Iterable[str] = EXPORT_COLLECTIONS,
+    formats: Iterable[str] = EXPORT_FORMATS,
+    compress: bool = False,
+    lag_seconds: int = INCREMENTAL_LAG_SECONDS,
+    manifest_path: Optional[Path] = None,
+    page_size: int = EXPORT_PAGE_SIZE,
+) -> dict:
+    """
+    Export what changed since the previous run, tracked by an `updated_at` watermark.
+
+    The manifest (`incremental_manifest.json` in `export_dir` by default) keeps one
+    watermark per collection. A collection without one is exported in full; after
+    that each run writes only documents with `updated_at` in [watermark, cutoff),
+    where cutoff is the run's start minus `lag_seconds`, plus a tombstones file
+    with the documents deleted in that window. Collections whose writes don't
+    stamp `updated_at` (migration_logs) are exported in full every run.
+
+    Consumers upsert documents by `_id` and apply a tombstone only when its
+    `deleted_at` is later than the `updated_at` they hold, since an ID can be
+    reused after a delete. Returns the run entry added to the manifest.
+    """
+    start = time.perf_counter()
+    manifest_path = manifest_path or export_dir / INCREMENTAL_MANIFEST
+    manifest = load_incremental_manifest(manifest_path)
+    watermarks: dict = manifest.setdefault("watermarks", {})
+    started_at = datetime.now(timezone.utc)
+    cutoff = started_at - timedelta(seconds=lag_seconds)
+    stamp = started_at.strftime("%Y%m%d_%H%M%S")
+    collections, formats = list(collections), list(formats)
+
+    exported = []
+    deltas: dict[str, datetime] = {}
+    for collection in collections:
+        since = watermarks.get(collection) if has_watermark(collection) else None
+        if since is None:
+            mode, records = "full", iter_collection_records(db, collection, page_size)
+        else:
+            since = datetime.fromisoformat(since)
+            deltas[collection] = since
+            mode = "delta"
+            records = iter_query_records(_changed_query(db, collection, "updated_at", since, cutoff), page_size)
+        count, files = _export_records(records, export_dir, f"{collection}.{mode}.{stamp}", collection, formats, compress)
+        exported.append({
+            "collection": collection,
+            "mode": mode,
+            "since": since.isoformat() if since else None,
+            "count": count,
+            "files": [Path(f).name for f in files],
+        })
+        logger.info(f"Exported {count} documents from '{collection}' ({mode})")
+
+    deleted = None
+    if deltas:
+        # One pass over the window; filtering by collection here avoids a composite index
+        query = _changed_query(db, TOMBSTONES, "deleted_at", min(deltas.values()), cutoff)
+        records = (
+            record for record in iter_query_records(query, page_size)
+            if record.get("collection") in deltas and record["deleted_at"] >= deltas[record["collection"]]
+        )
+        count, files = _export_records(records, export_dir, f"{TOMBSTONES}.{stamp}", TOMBSTONES, formats, compress)
+        deleted = {"count": count, "files": [Path(f).name for f in files]}
+        logger.info(f"Exported {count} tombstones")
+
+    # Written only after every file is complete, so a failed run is simply repeated
+    for collection in collections:
+        if has_watermark(collection):
+            watermarks[collection] = cutoff.isoformat()
+    run = {
+        "started_at": started_at.isoformat(),
+        "cutoff": cutoff.isoformat(),
+        "formats": formats,
+        "compressed": compress,
+        "collections": exported,
+        "tombstones": deleted,
+        "elapsed_seconds": round(time.perf_counter() - start, 3),
+    }
+    manifest["runs"] = (manifest.get("runs") or [])[-(INCREMENTAL_RUNS_KEPT - 1):] + [run]
+    _save_manifest(manifest_path, manifest)
+    return {**run, "manifest": str(manifest_path)}
@@ -0,0 +1,270 @@
+"""File service: content-addressed uploads backed by Firebase Storage."""
+from __future__ import annotations
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from io import BytesIO
+from typing import Optional, Union, TYPE_CHECKING
+
+from ..firestore_db import tombstone
+from ..previews import PREVIEW_FIELDS, get_preview_pipeline
+from ..storage import upload_file, delete_file
+
+if TYPE_CHECKING:
+    from google.cloud.firestore import Client
+
+logger = logging.getLogger("myvault.file_service")
+
+# Blob fields shared by every files document pointing at the same content
+_BLOB_FIELDS = ("storage_path", "storage_bucket", "public_url") + PREVIEW_FIELDS
+
+
+def _build_file_docs(
+    db: Client,
+    blob: dict,
+    content_hash: str,
+    filename: str,
+    content_type: str,
+    size: int,
+    folder: str,
+    title: Optional[str],
+    content: Optional[str],
+    category: Optional[str],
+    person: Optional[str],
+    now: datetime,
+    doc_id: Optional[str] = None,
+) -> tuple:
+    # doc_id (used for both documents) makes writes idempotent and reproducible (synthetic data)
+    item_ref = db.collection("items").document(doc_id)
+    item_doc = {
+        "id": item_ref.id,
+        "kind": "file",
+        "owner": "files",
+        "title": title or filename or "Uploaded file",
+        "content": content,
+        "created_at": now,
+        "updated_at": now,
+    }
+    file_ref = db.collection("files").document(doc_id)
+    file_doc = {
+        "id": file_ref.id,
+        "item_id": item_ref.id,
+        "original_filename": filename or "unknown",
+        "content_type": content_type,
+        "size": size,
+        "folder": folder,
+        "uploaded_at": now,
+        "updated_at": now,
+        "content_hash": content_hash,
+        "item": item_doc,
+        # Add user metadata
+        "user_folder": folder,  # Store the user's selected folder
+        "category": category,   # User-selected category
+        "person": person,       # User-selected person
+        **{field: blob[field] for field in _BLOB_FIELDS if blob.get(field) is not None},
+    }
+    return item_ref, item_doc, file_ref, file_doc
+
+
+def _is_live(snap) -> bool:
+    return snap.exists and (snap.get("ref_count") or 0) > 0
+
+
+def _upload_blobs(uploads: list[dict], max_in_flight: int) -> dict[str, Union[dict, Exception]]:
+    """Upload one copy per content hash, at most `max_in_flight` at a time."""
+    def upload(entry: dict) -> Union[dict, Exception]:
+        try:
+            return upload_file(BytesIO(entry["data"]), entry["filename"], entry["content_type"], entry["folder"])
+        except Exception as e:
+            return e
+
+    if len(uploads) == 1:
+        return {uploads[0]["content_hash"]: upload(uploads[0])}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_in_flight, len(uploads))), thread_name_prefix="upload") as pool:
+        return dict(zip((entry["content_hash"] for entry in uploads), pool.map(upload, uploads)))
+
+
+def store_files(db: Client, uploads: list[dict], max_in_flight: int = 1) -> list[Union[tuple[dict, bool], Exception]]:
+    """
+    Create the items/files documents for a set of uploads, storing bytes only for new content.
+
+    Each upload is a dict with data, content_hash, filename, content_type, folder and
+    optionally title, content, category and person.
+
+    blob_hashes/<sha256> records the blob holding each content hash and how many
+    files documents reference it. Content not stored yet is uploaded first (one copy
+    per hash, `max_in_flight` concurrently); then every document and hash reference is
+    written in one transaction, so a concurrent delete can't remove a reused blob
+    underneath it.
+
+    Returns (files document, deduplicated) per upload, or the exception that failed it.
+    """
+    from google.cloud import firestore
+
+    hash_refs = {entry["content_hash"]: db.collection("blob_hashes").document(entry["content_hash"]) for entry in uploads}
+    live = {snap.id for snap in db.get_all(list(hash_refs.values()), field_paths=["ref_count"]) if _is_live(snap)}
+    firsts = {}
+    for entry in uploads:
+        firsts.setdefault(entry["content_hash"], entry)
+    uploaded = _upload_blobs([entry for h, entry in firsts.items() if h not in live], max_in_flight)
+
+    @firestore.transactional
+    def attach(transaction, uploaded: dict) -> Union[list, set[str]]:
+        now = datetime.now(timezone.utc)
+        blobs: dict[str, Union[tuple[dict, bool], Exception]] = {}
+        missing = set()
+        for content_hash, hash_ref in hash_refs.items():
+            snap = hash_ref.get(transaction=transaction)
+            if _is_live(snap):
+                blobs[content_hash] = (snap.to_dict(), True)
+            elif isinstance(uploaded.get(content_hash), dict):
+                blobs[content_hash] = (uploaded[content_hash], False)
+            elif content_hash in uploaded:
+                blobs[content_hash] = uploaded[content_hash]
+            else:
+                # The last reference went away after our first look; upload after all
+                missing.add(content_hash)
+        if missing:
+            return missing
+
+        results = []
+        refs = {}
+        for entry in uploads:
+            content_hash = entry["content_hash"]
+            blob = blobs[content_hash]
+            if isinstance(blob, Exception):
+                results.append(blob)
+                continue
+            item_ref, item_doc, file_ref, file_doc = _build_file_docs(
+                db, blob[0], content_hash, entry["filename"], entry["content_type"], len(entry["data"]),
+                entry["folder"], entry.get("title"), entry.get("content"), entry.get("category"), entry.get("person"), now,
+            )
+            transaction.set(item_ref, item_doc)
+            transaction.set(file_ref, file_doc)
+            # Later copies of content first stored by this call reuse it too
+            results.append((file_doc, blob[1] or content_hash in refs))
+            refs[content_hash] = refs.get(content_hash, 0) + 1
+
+        for content_hash, count in refs.items():
+            blob, existing = blobs[content_hash]
+            if existing:
+                transaction.update(hash_refs[content_hash], {"ref_count": blob["ref_count"] + count, "updated_at": now})
+            else:
+                transaction.set(hash_refs[content_hash], {
+                    "sha256": content_hash,
+                    "content_type": firsts[content_hash]["content_type"],
+                    "size": len(firsts[content_hash]["data"]),
+                    "ref_count": count,
+                    "created_at": now,
+                    "updated_at": now,
+                    **{field: blob[field] for field in _BLOB_FIELDS if blob.get(field) is not None},
+                })
+        return results
+
+    results = attach(db.transaction(), uploaded)
+    if isinstance(results, set):
+        uploaded.update(_upload_blobs([firsts[h] for h in results], max_in_flight))
+        results = attach(db.transaction(), uploaded)
+        if isinstance(results, set):
+            raise RuntimeError("Stored content was deleted while uploading; retry the upload")
+
+    used = {file_doc["storage_path"] for file_doc, _ in (r for r in results if not isinstance(r, Exception))}
+    for info in uploaded.values():
+        if isinstance(info, dict) and info["storage_path"] not in used:
+            # Another upload of the same content won the race; drop our copy
+            delete_file(info["storage_path"])
+
+    pipeline = get_preview_pipeline()
+    previewed = set()
+    for entry, result in zip(uploads, results):
+        if isinstance(result, Exception):
+            continue
+        file_doc, deduplicated = result
+        if file_doc["storage_path"] not in previewed and not file_doc.get("thumbnail_path"):
+            # Thumbnails and previews are rendered in the background
+            previewed.add(file_doc["storage_path"])
+            pipeline.submit(file_doc["id"], file_doc["storage_path"], entry["content_type"], entry["data"], entry["content_hash"])
+        logger.info(f"Stored file {file_doc['id']} ({'deduplicated' if deduplicated else 'new blob'})")
+    return results
+
+
+def store_file(
+    db: Client,
+    data: bytes,
+    content_hash: str,
+    filename: str,
+    content_type: str,
+    folder: str,
+    title: Optional[str] = None,
+    content: Optional[str] = None,
+    category: Optional[str] = None,
+    person: Optional[str] = None,
+) -> tuple[dict, bool]:
+    """Store a single upload (see store_files). Returns (files document, deduplicated)."""
+    result = store_files(db, [{
+        "data": data,
+        "content_hash": content_hash,
+        "filename": filename,
+        "content_type": content_type,
+        "folder": folder,
+        "title": title,
+        "content": content,
+        "category": category,
+        "person": person,
+    }])[0]
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+def delete_file_record(db: Client, file_id: str) -> bool:
+    """
+    Delete a files document and its item, releasing its reference on the blob.
+
+    Storage objects (original and previews) are removed only when the last
+    files document referencing them is gone.
+    """
+    from google.cloud import firestore
+
+    file_ref = db.collection("files").document(str(file_id))
+
+    @firestore.transactional
+    def detach(transaction) -> Optional[set[str]]:
+        snap = file_ref.get(transaction=transaction)
+        if not snap.exists:
+            return None
+        data = snap.to_dict() or {}
+        fields = ("storage_path", "thumbnail_path", "preview_path")
+        release = {data.get(field) for field in fields}
+
+        content_hash = data.get("content_hash")
+        if content_hash:
+            hash_ref = db.collection("blob_hashes").document(content_hash)
+            hash_snap = hash_ref.get(transaction=transaction)
+            shared = hash_snap.to_dict() if hash_snap.exists else {}
+            if (shared.get("ref_count") or 0) > 1:
+                transaction.update(hash_ref, {"ref_count": shared["ref_count"] - 1, "updated_at": datetime.now(timezone.utc)})
+                release = set()
+            elif hash_snap.exists:
+                # Previews may have been recorded on the hash entry after this document was written
+                release.update(shared.get(field) for field in fields)
+                transaction.delete(hash_ref)
+                transaction.set(*tombstone(db, hash_ref))
+        release.discard(None)
+
+        deleted = [file_ref]
+        if data.get("item_id"):
+            deleted.append(db.collection("items").document(str(data["item_id"])))
+        for ref in deleted:
+            transaction.delete(ref)
+            transaction.set(*tombstone(db, ref))
+        return release
+
+    release = detach(db.transaction())
+    if release is None:
+        return False
+    for path in sorted(release):
+        if not delete_file(path):
+            logger.warning(f"Failed to delete storage file: {path}")
+    return True
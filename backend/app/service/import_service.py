@@ -0,0 +1,462 @@
+"""Restore Firestore collections from export files (NDJSON, Parquet, Arrow)."""
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterator, Optional, TYPE_CHECKING
+
+from ..export_schemas import EXPORT_COLLECTIONS, EXPORT_COLUMNS, ID_COLUMN, to_column_value
+from ..firestore_db import MAX_BATCH_WRITES, TOMBSTONES
+
+if TYPE_CHECKING:
+    from google.cloud.firestore import Client
+
+logger = logging.getLogger("myvault.import_service")
+
+IMPORT_SUFFIXES = (".ndjson", ".ndjson.gz", ".parquet", ".arrow")
+# Collections an export file name can map to; other exports (e.g. expenses_analysis) aren't collections
+IMPORTABLE_COLLECTIONS = (*EXPORT_COLLECTIONS, TOMBSTONES)
+# Formats holding only the declared EXPORT_COLUMNS: their records are merged into
+# existing documents rather than replacing them, and restore documents partially
+COLUMNAR_SUFFIXES = (".parquet", ".arrow")
+
+# Firestore's ramp-up guidance ("500/50/5"): start new traffic at 500 writes/s
+# and raise it by 50% at most every 5 minutes
+INITIAL_WRITE_RATE = 500.0
+RAMP_FACTOR = 1.5
+RAMP_INTERVAL_SECONDS = 300
+MIN_WRITE_RATE = 20.0
+
+# Retries per batch on throttling/contention errors, backing off exponentially from BACKOFF_SECONDS
+MAX_RETRIES = 6
+BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 60.0
+
+# Records read from columnar files per Arrow batch
+READ_BATCH_ROWS = 10_000
+
+# Export stems carry a run timestamp (expenses_20241214_143022) or a suffix (.part-0001, .delta.<stamp>)
+_STAMP = re.compile(r"_\d{8}_\d{6}$")
+
+
+def is_partial_export(path: Path) -> bool:
+    """Whether the file holds only the declared columns (Parquet, Arrow) rather than whole documents."""
+    return path.name.endswith(COLUMNAR_SUFFIXES)
+
+
+def collection_for_file(path: Path) -> Optional[str]:
+    """The collection an export file holds, from its name; None if the name isn't an exported collection."""
+    collection = _STAMP.sub("", path.name.split(".")[0])
+    return collection if collection in IMPORTABLE_COLLECTIONS else None
+
+
+def ramp_duration(writes: int, initial_rate: float = INITIAL_WRITE_RATE, max_rate: Optional[float] = None) -> float:
+    """Seconds needed for `writes` document writes under the 500/50/5 ramp (a lower bound for an import)."""
+    seconds, rate = 0.0, initial_rate
+    while writes > rate * RAMP_INTERVAL_SECONDS:
+        writes -= rate * RAMP_INTERVAL_SECONDS
+        seconds += RAMP_INTERVAL_SECONDS
+        rate = min(rate * RAMP_FACTOR, max_rate) if max_rate else rate * RAMP_FACTOR
+    return seconds + writes / rate
+
+
+class WriteRateLimiter:
+    """
+    Token bucket for document writes shared by every writer thread.
+
+    The rate starts at `initial_rate` and grows by RAMP_FACTOR every
+    RAMP_INTERVAL_SECONDS up to `max_rate`; throttled() halves it and restarts
+    the ramp, so sustained contention settles on a rate Firestore accepts.
+    """
+
+    def __init__(self, initial_rate: float = INITIAL_WRITE_RATE, max_rate: Optional[float] = None):
+        self.rate = initial_rate
+        self.max_rate = max_rate
+        self._lock = threading.Lock()
+        self._tokens = initial_rate
+        self._updated = self._ramped_at = time.monotonic()
+
+    def acquire(self, writes: int) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now - self._ramped_at >= RAMP_INTERVAL_SECONDS:
+                    self.rate = min(self.rate * RAMP_FACTOR, self.max_rate) if self.max_rate else self.rate * RAMP_FACTOR
+                    self._ramped_at = now
+                # At most one second of burst
+                self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                # A batch larger than one second's budget goes into debt instead of waiting forever
+                needed = min(writes, self.rate)
+                if self._tokens >= needed:
+                    self._tokens -= writes
+                    return
+                wait = (needed - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def throttled(self) -> None:
+        with self._lock:
+            self.rate = max(MIN_WRITE_RATE, self.rate / 2)
+            self._ramped_at = time.monotonic()
+            logger.warning(f"Write throttled; import rate lowered to {self.rate:.0f} writes/s")
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise RuntimeError("Reading Parquet and Arrow exports needs the pyarrow package (pip install -r requirements-scripts.txt)") from None
+    return pyarrow
+
+
+def iter_export_file(path: Path) -> Iterator[dict]:
+    """Records of an NDJSON (optionally gzipped), Parquet or Arrow IPC export file, in file order."""
+    name = path.name
+    if name.endswith((".ndjson", ".ndjson.gz")):
+        opener = gzip.open if name.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif name.endswith(".parquet"):
+        _require_pyarrow()
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(str(path)).iter_batches(batch_size=READ_BATCH_ROWS):
+            yield from batch.to_pylist()
+    elif name.endswith(".arrow"):
+        pa = _require_pyarrow()
+        with pa.memory_map(str(path)) as source:
+            reader = pa.ipc.open_file(source)
+            for index in range(reader.num_record_batches):
+                yield from reader.get_batch(index).to_pylist()
+    else:
+        raise ValueError(f"Can't import {name}: expected one of {', '.join(IMPORT_SUFFIXES)}")
+
+
+def restore_record(collection: str, record: dict) -> tuple[str, dict]:
+    """(document ID, data) from an exported record, with the declared column types restored."""
+    data = dict(record)
+    doc_id = data.pop(ID_COLUMN, None) or data.get("id")
+    if not doc_id:
+        raise ValueError("record has no document ID")
+    for name, kind in EXPORT_COLUMNS.get(collection, ()):
+        value = data.get(name)
+        if value is None or kind in ("string", "category"):
+            continue
+        if kind == "json":
+            # Columnar files hold nested values as JSON text; NDJSON keeps them nested
+            if isinstance(value, str):
+                try:
+                    data[name] = json.loads(value)
+                except ValueError:
+                    pass
+        else:
+            data[name] = to_column_value(value, kind)
+    # Entities embed a copy of their item
+    if isinstance(data.get("item"), dict) and collection != "items":
+        data["item"] = restore_record("items", data["item"])[1]
+    return str(doc_id), data
+
+
+def _import_write(db: Client, collection: str, record: dict, partial: bool = False) -> tuple:
+    """
+    The (op, ref, data) write restoring one record: a set, or a merge for records
+    from a `partial` (columnar) export so fields it doesn't carry, such as embedded
+    `item` maps, survive on documents that already exist. Tombstone records become a
+    ("tombstone", ref, deleted_at) write: the document is deleted only if it
+    wasn't updated after the deletion (e.g. re-created under the same ID).
+    """
+    if collection == TOMBSTONES:
+        _, marker = restore_record(TOMBSTONES, record)
+        if marker.get("deleted_at") is None:
+            raise ValueError("tombstone has no deleted_at")
+        return "tombstone", db.collection(marker["collection"]).document(str(marker["doc_id"])), marker["deleted_at"]
+    doc_id, data = restore_record(collection, record)
+    return "merge" if partial else "set", db.collection(collection).document(doc_id), data
+
+
+def _commit_writes(db: Client, writes: list[tuple]) -> None:
+    """Commit one batch of import writes; batches holding tombstones run as a transaction."""
+    if not any(op == "tombstone" for op, _, _ in writes):
+        batch = db.batch()
+        for op, ref, data in writes:
+            batch.set(ref, data, merge=op == "merge")
+        batch.commit()
+        return
+
+    from google.cloud import firestore
+
+    @firestore.transactional
+    def apply(transaction) -> None:
+        targets = [ref for op, ref, _ in writes if op == "tombstone"]
+        updated = {
+            snap.reference.path: (snap.to_dict() or {}).get("updated_at")
+            for snap in db.get_all(targets, field_paths=["updated_at"], transaction=transaction)
+            if snap.exists
+        }
+        for op, ref, data in writes:
+            if op != "tombstone":
+                transaction.set(ref, data, merge=op == "merge")
+            elif ref.path in updated and not (updated[ref.path] and updated[ref.path] > data):
+                transaction.delete(ref)
+
+    apply(db.transaction())
+
+
+def _is_retryable(error: Exception) -> bool:
+    from google.api_core import exceptions
+
+    return isinstance(error, (
+        exceptions.TooManyRequests,
+        exceptions.ResourceExhausted,
+        exceptions.ServiceUnavailable,
+        exceptions.DeadlineExceeded,
+        exceptions.Aborted,
+        exceptions.InternalServerError,
+    ))
+
+
+def commit_with_backoff(db: Client, writes: list[tuple], limiter: WriteRateLimiter) -> Optional[str]:
+    """Commit one batch, retrying throttled commits with jittered exponential backoff; None or the final error."""
+    if not writes:
+        return None
+    for attempt in range(MAX_RETRIES + 1):
+        limiter.acquire(len(writes))
+        try:
+            _commit_writes(db, writes)
+            return None
+        except Exception as e:
+            if attempt == MAX_RETRIES or not _is_retryable(e):
+                logger.error(f"Batch of {len(writes)} writes failed: {str(e)}")
+                return str(e)
+            limiter.throttled()
+            delay = min(MAX_BACKOFF_SECONDS, BACKOFF_SECONDS * 2 ** attempt)
+            time.sleep(delay * random.uniform(0.5, 1.0))
+    return None
+
+
+def _retry_failed(
+    db: Client,
+    path: Path,
+    collection: str,
+    partial: bool,
+    checkpoint: dict,
+    limiter: WriteRateLimiter,
+    batch_size: int,
+) -> tuple[int, int]:
+    """
+    Write the records of `checkpoint["failed_ids"]` again, from the part of the file
+    the checkpoint has already moved past; returns (written, still failed).
+    """
+    failed = set(checkpoint["failed_ids"])
+    logger.info(f"Retrying {len(failed)} {collection} documents whose batches failed on an earlier run")
+    written, still_failed = 0, []
+
+    def commit(writes: list[tuple]) -> None:
+        nonlocal written
+        error = commit_with_backoff(db, writes, limiter)
+        if error is None:
+            written += len(writes)
+        else:
+            still_failed.extend(ref.id for _, ref, _ in writes)
+
+    writes: list[tuple] = []
+    for index, record in enumerate(iter_export_file(path)):
+        if index >= checkpoint["done"]:
+            break
+        try:
+            write = _import_write(db, collection, record, partial)
+        except Exception:
+            # Counted as invalid when it was first read
+            continue
+        if write[1].id in failed:
+            writes.append(write)
+            if len(writes) >= batch_size:
+                commit(writes)
+                writes = []
+    if writes:
+        commit(writes)
+    checkpoint["failed_ids"] = still_failed
+    return written, len(still_failed)
+
+
+def import_file(
+    db: Client,
+    path: Path,
+    collection: Optional[str] = None,
+    checkpoint: Optional[dict] = None,
+    on_checkpoint: Optional[Callable[[dict], None]] = None,
+    writers: int = 4,
+    limiter: Optional[WriteRateLimiter] = None,
+    batch_size: int = MAX_BATCH_WRITES,
+) -> dict:
+    """
+    Write one export file back to Firestore under the documents' original IDs.
+
+    Records are streamed from the file and committed in batches of `batch_size`
+    by `writers` concurrent threads, all drawing from one `limiter`. Documents
+    are written whole with set() (merged for Parquet/Arrow files, which only hold
+    the declared columns), so writing a batch twice is harmless; tombstones
+    only delete documents not updated since, so applying them in any order
+    relative to the deltas gives the same result.
+
+    `checkpoint["done"]` counts the leading records whose batch, and every batch
+    before it, has been handled; it is updated in place and passed to
+    `on_checkpoint` as batches finish, so a rerun skips straight past them.
+    IDs in batches that still failed after retrying are kept in `failed_ids`, and
+    a rerun writes those records again before it continues.
+    """
+    start = time.perf_counter()
+    collection = collection or collection_for_file(path)
+    if collection is None:
+        raise ValueError(f"{path.name} isn't an export of a known collection; pass the target collection")
+    partial = is_partial_export(path)
+    if partial and collection != TOMBSTONES:
+        logger.warning(
+            f"{path.name} only holds the declared columns of {collection}: documents are merged, "
+            "and ones missing from the target are restored partially"
+        )
+    limiter = limiter or WriteRateLimiter()
+    checkpoint = checkpoint if checkpoint is not None else {}
+    checkpoint.setdefault("done", 0)
+    checkpoint.setdefault("failed_ids", [])
+    checkpoint.setdefault("invalid", 0)
+    stats = {"collection": collection, "written": 0, "failed": 0, "invalid": 0, "skipped": checkpoint["done"], "batches": 0}
+    if checkpoint["failed_ids"]:
+        stats["retried"] = len(checkpoint["failed_ids"])
+        recovered, still_failed = _retry_failed(db, path, collection, partial, checkpoint, limiter, batch_size)
+        stats["written"] += recovered
+        stats["failed"] += still_failed
+        if on_checkpoint:
+            on_checkpoint(checkpoint)
+
+    lock = threading.Lock()
+    completed: dict[int, tuple] = {}
+    next_to_checkpoint = 0
+    in_flight = threading.BoundedSemaphore(max(1, writers) * 2)
+
+    def write_batch(seq: int, writes: list[tuple], records: int) -> None:
+        nonlocal next_to_checkpoint
+        try:
+            error = commit_with_backoff(db, writes, limiter)
+        except Exception as e:
+            error = str(e)
+        finally:
+            in_flight.release()
+
+        with lock:
+            failed_ids = [] if error is None else [ref.id for _, ref, _ in writes]
+            completed[seq] = (records, len(writes) - len(failed_ids), failed_ids)
+            stats["batches"] += 1
+            advanced = False
+            # The checkpoint only moves past a batch once every earlier batch is done
+            while next_to_checkpoint in completed:
+                batch_records, written, batch_failed = completed.pop(next_to_checkpoint)
+                checkpoint["done"] += batch_records
+                checkpoint["failed_ids"].extend(batch_failed)
+                stats["written"] += written
+                stats["failed"] += len(batch_failed)
+                next_to_checkpoint += 1
+                advanced = True
+            if advanced:
+                if on_checkpoint:
+                    on_checkpoint(checkpoint)
+                if stats["batches"] % 20 == 0:
+                    elapsed = time.perf_counter() - start
+                    logger.info(f"Imported {stats['written']} {collection} documents ({stats['written'] / elapsed:.0f}/s)")
+
+    seq = 0
+    with ThreadPoolExecutor(max_workers=max(1, writers), thread_name_prefix="import") as pool:
+        writes: list[tuple] = []
+        records = 0
+
+        def submit() -> None:
+            nonlocal seq, writes, records
+            # Blocks while `writers * 2` batches are in flight, which also bounds records held in memory
+            in_flight.acquire()
+            pool.submit(write_batch, seq, writes, records)
+            seq += 1
+            writes, records = [], 0
+
+        for index, record in enumerate(iter_export_file(path)):
+            if index < stats["skipped"]:
+                continue
+            records += 1
+            try:
+                writes.append(_import_write(db, collection, record, partial))
+            except Exception as e:
+                logger.warning(f"Skipping record {index} of {path.name}: {str(e)}")
+                stats["invalid"] += 1
+                checkpoint["invalid"] += 1
+            if len(writes) >= batch_size:
+                submit()
+        if records:
+            submit()
+
+    elapsed = time.perf_counter() - start
+    stats["elapsed_seconds"] = round(elapsed, 3)
+    stats["writes_per_second"] = round(stats["written"] / elapsed, 1) if elapsed else 0.0
+    stats["final_rate"] = round(limiter.rate, 1)
+    return stats
+
+
+def estimate_import(
+    paths: list[Path],
+    initial_rate: float = INITIAL_WRITE_RATE,
+    max_rate: Optional[float] = None,
+    collection: Optional[str] = None,
+) -> dict:
+    """
+    Dry run: read and decode every file without writing, and estimate the import time.
+
+    The estimate is the time the write ramp needs for that many writes, which
+    bounds the import from below; decode throughput shows whether reading the
+    files would be the bottleneck instead. Files that don't name a known
+    collection (and no `collection` is given) are listed as skipped.
+    """
+    start = time.perf_counter()
+    files, total, invalid = [], 0, 0
+    for path in paths:
+        target = collection or collection_for_file(path)
+        if target is None:
+            files.append({"file": str(path), "collection": None, "records": 0, "partial": False, "skipped": True})
+            continue
+        count = 0
+        for record in iter_export_file(path):
+            try:
+                if target != TOMBSTONES:
+                    restore_record(target, record)
+                count += 1
+            except Exception:
+                invalid += 1
+        files.append({
+            "file": str(path),
+            "collection": target,
+            "records": count,
+            "partial": is_partial_export(path) and target != TOMBSTONES,
+            "skipped": False,
+        })
+        total += count
+    elapsed = time.perf_counter() - start
+    partial = [entry["file"] for entry in files if entry["partial"]]
+    return {
+        "files": files,
+        "partial_restore": (
+            f"{len(partial)} Parquet/Arrow file(s) only hold the declared columns: their records are merged "
+            "into existing documents, and documents missing from the target are restored without the other fields"
+        ) if partial else None,
+        "records": total,
+        "invalid": invalid,
+        "batches": -(-total // MAX_BATCH_WRITES),
+        "decode_seconds": round(elapsed, 3),
+        "decode_records_per_second": round(total / elapsed, 1) if elapsed else 0.0,
+        "estimated_write_seconds": round(ramp_duration(total, initial_rate, max_rate), 1),
+    }
@@ -0,0 +1,286 @@
+"""Maintenance jobs over Firestore data."""
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional, TYPE_CHECKING
+
+from ..firestore_db import MAX_BATCH_WRITES, commit_write_groups, delete_writes
+from ..firestore_queries import iter_query_pages, stream_query
+
+if TYPE_CHECKING:
+    from google.cloud.firestore import Client
+    from google.cloud.storage import Bucket
+
+logger = logging.getLogger("myvault.maintenance_service")
+
+# Item kinds that only exist alongside an entity document, and the collection holding it.
+# Other kinds (notes, links, ...) are standalone items and are never orphans. The
+# entity write paths stamp that collection on the item as `owner`; items of these
+# kinds created directly through POST /api/items (and ones written before the
+# stamp existed) have none, so an unowned item without an entity isn't
+# necessarily an orphan.
+ITEM_OWNERS = {
+    "expense": "expenses",
+    "chat": "chat_messages",
+    "file": "files",
+    "task": "tasks",
+}
+
+# Firestore caps the values of an `in` filter at 30
+_IN_QUERY_LIMIT = 30
+
+# A Cloud Storage batch request carries at most 100 calls
+BLOB_DELETE_BATCH = 100
+
+# Only the fields the sweeper looks at
+_BLOB_LIST_FIELDS = "items(name,size,timeCreated),prefixes,nextPageToken"
+
+
+def find_orphan_items(db: Client, items: list) -> list:
+    """Return the item snapshots whose owning entity document no longer exists."""
+    from google.cloud.firestore import FieldFilter
+
+    by_kind: dict[str, list] = {}
+    for snap in items:
+        kind = (snap.to_dict() or {}).get("kind")
+        if kind in ITEM_OWNERS:
+            by_kind.setdefault(kind, []).append(snap)
+
+    orphans = []
+    for kind, snaps in by_kind.items():
+        owners = db.collection(ITEM_OWNERS[kind])
+        if kind == "task":
+            # Task items share the task's document ID: one batched lookup
+            found = {s.id for s in db.get_all([owners.document(snap.id) for snap in snaps], field_paths=["item_id"]) if s.exists}
+        else:
+            # Other entities point at their item through item_id
+            found = set()
+            ids = [snap.id for snap in snaps]
+            for start in range(0, len(ids), _IN_QUERY_LIMIT):
+                q = owners.where(filter=FieldFilter("item_id", "in", ids[start:start + _IN_QUERY_LIMIT])).select(["item_id"])
+                found.update((s.to_dict() or {}).get("item_id") for s in stream_query(q))
+        orphans.extend(snap for snap in snaps if snap.id not in found)
+    return orphans
+
+
+def _is_owned(snap) -> bool:
+    data = snap.to_dict() or {}
+    return data.get("owner") == ITEM_OWNERS.get(data.get("kind"))
+
+
+def reconcile_orphan_items(
+    db: Client,
+    purge: bool = False,
+    page_size: int = MAX_BATCH_WRITES,
+    limit: Optional[int] = None,
+    include_unowned: bool = False,
+) -> dict:
+    """
+    Walk the items collection in keyset-paged chunks and find items whose entity is gone.
+
+    Orphans are deleted when `purge` is set, otherwise only reported. Only items an
+    entity write path created (stamped with `owner`) are purged, unless
+    `include_unowned` is set: unowned ones may have been created directly through
+    POST /api/items and are reported as `unowned_orphans`. Returns counts per kind
+    plus throughput; `limit` stops after that many items have been scanned.
+    """
+    start = time.perf_counter()
+    stats = {
+        "scanned": 0, "orphans": 0, "unowned_orphans": 0, "purged": 0, "failed": 0,
+        "orphans_by_kind": {}, "orphan_ids": [],
+    }
+    q = db.collection("items").select(["kind", "owner"])
+    for page in iter_query_pages(q, page_size=page_size):
+        orphans = find_orphan_items(db, page)
+        stats["scanned"] += len(page)
+        stats["orphans"] += len(orphans)
+        for snap in orphans:
+            kind = (snap.to_dict() or {}).get("kind")
+            stats["orphans_by_kind"][kind] = stats["orphans_by_kind"].get(kind, 0) + 1
+        unowned = [snap for snap in orphans if not _is_owned(snap)]
+        stats["unowned_orphans"] += len(unowned)
+        if not include_unowned:
+            orphans = [snap for snap in orphans if _is_owned(snap)]
+        if purge and orphans:
+            errors = commit_write_groups(db, [delete_writes(db, snap.reference) for snap in orphans])
+            stats["purged"] += sum(1 for error in errors if error is None)
+            stats["failed"] += sum(1 for error in errors if error is not None)
+        elif len(stats["orphan_ids"]) < 1000:
+            stats["orphan_ids"].extend(snap.id for snap in orphans[:1000 - len(stats["orphan_ids"])])
+
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f"Reconciled {stats['scanned']} items ({stats['scanned'] / elapsed:.0f}/s), "
+            f"{stats['orphans']} orphans, {stats['purged']} purged"
+        )
+        if limit is not None and stats["scanned"] >= limit:
+            break
+
+    elapsed = time.perf_counter() - start
+    stats["elapsed_seconds"] = round(elapsed, 3)
+    stats["items_per_second"] = round(stats["scanned"] / elapsed, 1) if elapsed else 0.0
+    return stats
+
+
+def referenced_storage_paths(db: Client) -> set[str]:
+    """Every storage path referenced by a files document: originals and their previews."""
+    fields = ["storage_path", "thumbnail_path", "preview_path"]
+    paths: set[str] = set()
+    for page in iter_query_pages(db.collection("files").select(fields), page_size=MAX_BATCH_WRITES):
+        for snap in page:
+            data = snap.to_dict() or {}
+            paths.update(data.get(field) for field in fields)
+    paths.discard(None)
+    return paths
+
+
+def _delete_blobs(bucket: Bucket, names: list[str]) -> int:
+    """Delete blobs through the storage batch API; returns how many were deleted."""
+    from google.api_core.exceptions import NotFound
+
+    deleted = 0
+    for start in range(0, len(names), BLOB_DELETE_BATCH):
+        chunk = names[start:start + BLOB_DELETE_BATCH]
+        try:
+            with bucket.client.batch():
+                for name in chunk:
+                    bucket.delete_blob(name)
+            deleted += len(chunk)
+        except Exception as e:
+            # One failed call fails the batch; retry the chunk one blob at a time
+            logger.warning(f"Batch delete of {len(chunk)} blobs failed ({str(e)}); deleting individually")
+            for name in chunk:
+                try:
+                    bucket.delete_blob(name)
+                    deleted += 1
+                except NotFound:
+                    pass
+                except Exception as blob_error:
+                    logger.error(f"Failed to delete blob {name}: {str(blob_error)}")
+    return deleted
+
+
+def sweep_orphan_blobs(
+    db: Client,
+    bucket: Bucket,
+    delete: bool = False,
+    grace_hours: float = 24,
+    checkpoint: Optional[dict] = None,
+    on_checkpoint: Optional[Callable[[dict], None]] = None,
+    workers: int = 8,
+    max_blobs: Optional[int] = None,
+) -> dict:
+    """
+    Find blobs that no files document references, and delete them if `delete` is set.
+
+    Top-level prefixes are listed in parallel with paged list_blobs calls and compared
+    against the set of files.storage_path values. Blobs younger than `grace_hours` are
+    skipped, since uploads write the blob before the files document.
+
+    `checkpoint` maps each prefix to the last blob name handled and lists finished
+    prefixes; it is updated in place after every page and passed to `on_checkpoint`, so
+    a run stopped by `max_blobs` (or a crash) resumes where it left off. Once every
+    prefix is finished the next run starts a new pass.
+    """
+    start = time.perf_counter()
+    checkpoint = checkpoint if checkpoint is not None else {}
+    if checkpoint.get("completed"):
+        checkpoint.clear()
+    checkpoint.setdefault("after", {})
+    checkpoint.setdefault("done", [])
+    stats = {"listed": 0, "orphans": 0, "orphan_bytes": 0, "deleted": 0, "skipped_recent": 0, "orphan_names": []}
+
+    referenced = referenced_storage_paths(db)
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=grace_hours)
+    logger.info(f"Loaded {len(referenced)} referenced storage paths")
+
+    def orphans_in(blobs: list) -> list:
+        found = []
+        for blob in blobs:
+            if blob.name in referenced:
+                continue
+            if blob.time_created and blob.time_created > cutoff:
+                stats["skipped_recent"] += 1
+                continue
+            found.append(blob)
+        return found
+
+    def handle_page(blobs: list) -> None:
+        orphans = orphans_in(blobs)
+        stats["listed"] += len(blobs)
+        stats["orphans"] += len(orphans)
+        stats["orphan_bytes"] += sum(blob.size or 0 for blob in orphans)
+        if delete and orphans:
+            stats["deleted"] += _delete_blobs(bucket, [blob.name for blob in orphans])
+        elif len(stats["orphan_names"]) < 1000:
+            stats["orphan_names"].extend(blob.name for blob in orphans[:1000 - len(stats["orphan_names"])])
+
+    # Discover top-level prefixes; blobs at the bucket root are handled right here
+    listing = bucket.list_blobs(delimiter="/", fields=_BLOB_LIST_FIELDS)
+    root_blobs = list(listing)
+    handle_page(root_blobs)
+    prefixes = sorted(p for p in listing.prefixes if p not in checkpoint["done"])
+
+    pages: queue.Queue = queue.Queue(maxsize=workers * 2)
+    stop = threading.Event()
+
+    def put(entry: tuple) -> bool:
+        # Give up once the run is stopping, so no listing thread stays blocked on a full queue
+        while not stop.is_set():
+            try:
+                pages.put(entry, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def list_prefix(prefix: str) -> None:
+        # Each prefix is listed by one thread, so its pages arrive in name order
+        try:
+            after = checkpoint["after"].get(prefix)
+            blobs = bucket.list_blobs(prefix=prefix, start_offset=after, fields=_BLOB_LIST_FIELDS)
+            for page in blobs.pages:
+                page_blobs = [blob for blob in page if blob.name != after]
+                if page_blobs and not put((prefix, page_blobs, False)):
+                    return
+            put((prefix, [], True))
+        except Exception as e:
+            logger.error(f"Failed to list prefix {prefix}: {str(e)}", exc_info=True)
+            put((prefix, [], None))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="sweep") as pool:
+        for prefix in prefixes:
+            pool.submit(list_prefix, prefix)
+        remaining = len(prefixes)
+        while remaining:
+            prefix, blobs, finished = pages.get()
+            if finished is not None and not finished:
+                handle_page(blobs)
+                checkpoint["after"][prefix] = blobs[-1].name
+            else:
+                remaining -= 1
+                if finished:
+                    checkpoint["done"].append(prefix)
+                    checkpoint["after"].pop(prefix, None)
+            if on_checkpoint:
+                on_checkpoint(checkpoint)
+            if max_blobs is not None and stats["listed"] >= max_blobs:
+                logger.info(f"Reached {max_blobs} blobs; stopping until the next run")
+                stop.set()
+                pool.shutdown(wait=False, cancel_futures=True)
+                break
+
+    checkpoint["completed"] = not stop.is_set() and all(p in checkpoint["done"] for p in prefixes)
+    if on_checkpoint:
+        on_checkpoint(checkpoint)
+
+    elapsed = time.perf_counter() - start
+    stats["elapsed_seconds"] = round(elapsed, 3)
+    stats["blobs_per_second"] = round(stats["listed"] / elapsed, 1) if elapsed else 0.0
+    stats["completed"] = checkpoint["completed"]
+    return stats
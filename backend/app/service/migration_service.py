@@ -0,0 +1,318 @@
+"""SQLite (finance app export) to Firestore migration pipeline."""
+from __future__ import annotations
+
+import json
+import logging
+import multiprocessing
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import partial
+from typing import Callable, Iterator, Optional, TYPE_CHECKING
+
+from pydantic import ValidationError
+
+from ..firestore_db import MAX_BATCH_WRITES, commit_write_groups
+from ..schemas import ExpenseCategory, ExpenseCreate
+from .expense_service import _build_expense_docs
+
+if TYPE_CHECKING:
+    from google.cloud.firestore import Client
+
+logger = logging.getLogger("myvault.migration_service")
+
+MOVEMENT_COLUMNS = (
+    "_id, account, category, amount, sign, detail, date, time, "
+    "confirmed, transfer, date_idx, picture, iso_code"
+)
+# Movements are read in (date_idx, _id) order; rows without a date_idx sort first
+_MOVEMENT_SORT = "COALESCE(date_idx, 0)"
+
+# Each movement writes an item and an expense
+MOVEMENT_WRITES = 2
+
+_CATEGORIES = {category.value for category in ExpenseCategory}
+
+
+MOVEMENT_ID_PREFIX = "sqlite_movement_"
+
+# SQLite's default limit on bound parameters is 999
+_IN_CHUNK = 500
+
+
+def movement_doc_id(row_id) -> str:
+    """Deterministic ID for a movement's item and expense, so re-runs overwrite instead of duplicating."""
+    return f"{MOVEMENT_ID_PREFIX}{row_id}"
+
+
+def parse_movement_date(date_str: Optional[str]) -> Optional[datetime]:
+    """DD/MM/YYYY (as stored by the finance app) to a UTC datetime."""
+    if not date_str or "/" not in date_str:
+        return None
+    day, month, year = date_str.split("/")
+    return datetime(int(year), int(month), int(day), tzinfo=timezone.utc)
+
+
+def transform_movement(row: dict, migrated_at: str) -> ExpenseCreate:
+    """Build the expense payload for one table_movements row (raises if the row is unusable)."""
+    category = (row["category"] or "other").strip().lower()
+    return ExpenseCreate(
+        title=row["detail"] or f"{row['category']} - {row['amount']}",
+        amount=abs(float(row["amount"])),
+        category=category if category in _CATEGORIES else ExpenseCategory.OTHER,
+        is_income=row["sign"] == "+",
+        occurred_on=parse_movement_date(row["date"]),
+        content=json.dumps({
+            "original_id": row["_id"],
+            "account": row["account"],
+            "category": row["category"],
+            "sign": row["sign"],
+            "time": row["time"],
+            "confirmed": bool(row["confirmed"]),
+            "transfer": bool(row["transfer"]),
+            "date_idx": row["date_idx"],
+            "picture": row["picture"],
+            "iso_code": row["iso_code"],
+            "migrated_from": "sqlite",
+            "migrated_at": migrated_at,
+        }),
+    )
+
+
+def transform_movements(rows: list[dict], migrated_at: str) -> list[tuple]:
+    """Worker entry point: (document ID, payload or None, error or None) per row."""
+    results = []
+    for row in rows:
+        try:
+            results.append((movement_doc_id(row["_id"]), transform_movement(row, migrated_at), None))
+        except ValidationError as e:
+            error = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            results.append((movement_doc_id(row["_id"]), None, error))
+        except Exception as e:
+            results.append((movement_doc_id(row["_id"]), None, str(e)))
+    return results
+
+
+def iter_movement_chunks(conn: sqlite3.Connection, after: Optional[list], fetch_size: int) -> Iterator[list[dict]]:
+    """Stream table_movements in sort-key order with fetchmany, starting after the checkpointed key."""
+    query = f"SELECT {MOVEMENT_COLUMNS}, {_MOVEMENT_SORT} AS sort_key FROM table_movements"
+    params: tuple = ()
+    if after:
+        query += f" WHERE ({_MOVEMENT_SORT}, _id) > (?, ?)"
+        params = tuple(after)
+    cursor = conn.execute(query + f" ORDER BY {_MOVEMENT_SORT}, _id", params)
+    try:
+        while rows := cursor.fetchmany(fetch_size):
+            yield [{key: row[key] for key in row.keys()} for row in rows]
+    finally:
+        cursor.close()
+
+
+def retry_failed_movements(
+    db: Client,
+    conn: sqlite3.Connection,
+    checkpoint: dict,
+    now: datetime,
+    on_checkpoint: Optional[Callable[[dict], None]] = None,
+    batch_rows: int = MAX_BATCH_WRITES // MOVEMENT_WRITES,
+) -> dict:
+    """
+    Write the rows listed in `checkpoint["failed_ids"]` again (their batches failed
+    to commit on an earlier run, and the checkpoint has moved past them). IDs that
+    commit, or whose row is no longer in the SQLite file, are removed from the list.
+    """
+    failed_ids = list(checkpoint.get("failed_ids") or [])
+    if not failed_ids:
+        return {"retried": 0, "recovered": 0, "failed": 0}
+    logger.info(f"Retrying {len(failed_ids)} movements whose batches failed on an earlier run")
+    migrated_at = checkpoint["started_at"]
+    row_ids = [doc_id[len(MOVEMENT_ID_PREFIX):] for doc_id in failed_ids if doc_id.startswith(MOVEMENT_ID_PREFIX)]
+    rows = []
+    for offset in range(0, len(row_ids), _IN_CHUNK):
+        chunk = row_ids[offset:offset + _IN_CHUNK]
+        placeholders = ", ".join("?" * len(chunk))
+        cursor = conn.execute(
+            f"SELECT {MOVEMENT_COLUMNS} FROM table_movements WHERE CAST(_id AS TEXT) IN ({placeholders})", chunk
+        )
+        rows.extend({key: row[key] for key in row.keys()} for row in cursor)
+
+    still_failed = []
+    recovered = 0
+    entries = transform_movements(rows, migrated_at)
+    for offset in range(0, len(entries), batch_rows):
+        groups, ids = [], []
+        for doc_id, payload, error in entries[offset:offset + batch_rows]:
+            if payload is None:
+                logger.warning(f"Skipping {doc_id}: {error}")
+                checkpoint["invalid_ids"].append(doc_id)
+                continue
+            item_ref, item_doc, expense_ref, expense_doc = _build_expense_docs(db, payload, now, doc_id=doc_id)
+            groups.append([("set", item_ref, item_doc), ("set", expense_ref, expense_doc)])
+            ids.append(doc_id)
+        errors = commit_write_groups(db, groups) if groups else []
+        still_failed.extend(doc_id for doc_id, error in zip(ids, errors) if error is not None)
+        recovered += sum(1 for error in errors if error is None)
+
+    checkpoint["failed_ids"] = still_failed
+    checkpoint["migrated"] += recovered
+    if on_checkpoint:
+        on_checkpoint(checkpoint)
+    logger.info(f"Recovered {recovered}/{len(failed_ids)} previously failed movements")
+    return {"retried": len(failed_ids), "recovered": recovered, "failed": len(still_failed)}
+
+
+def migrate_movements(
+    db: Client,
+    conn: sqlite3.Connection,
+    checkpoint: Optional[dict] = None,
+    on_checkpoint: Optional[Callable[[dict], None]] = None,
+    fetch_size: int = 2000,
+    transform_workers: int = 2,
+    writers: int = 4,
+    batch_rows: int = MAX_BATCH_WRITES // MOVEMENT_WRITES,
+    limit: Optional[int] = None,
+) -> dict:
+    """
+    Migrate table_movements into items/expenses.
+
+    Rows are streamed with fetchmany, transformed in a process pool
+    (`transform_workers`, 0 = inline) and committed in full WriteBatches by
+    `writers` concurrent threads. Documents use deterministic IDs, so a batch that
+    is written twice leaves the same data.
+
+    `checkpoint["after"]` holds the (date_idx, _id) key of the last row whose batch,
+    and every batch before it, committed; it is updated in place and passed to
+    `on_checkpoint` as batches complete, so a stopped or crashed run resumes right
+    after it. Rows of batches that failed to commit are kept in `failed_ids` and
+    retried first by the next run. `limit` stops after roughly that many rows.
+    """
+    start = time.perf_counter()
+    checkpoint = checkpoint if checkpoint is not None else {}
+    checkpoint.setdefault("after", None)
+    checkpoint.setdefault("migrated", 0)
+    checkpoint.setdefault("invalid_ids", [])
+    checkpoint.setdefault("failed_ids", [])
+    # Keep the first run's timestamps so resumed or repeated runs write identical documents
+    checkpoint.setdefault("started_at", datetime.now(timezone.utc).isoformat())
+    migrated_at = checkpoint["started_at"]
+    now = datetime.fromisoformat(migrated_at)
+    stats = {"read": 0, "migrated": 0, "invalid": 0, "failed": 0, "batches": 0}
+    retry = retry_failed_movements(db, conn, checkpoint, now, on_checkpoint, batch_rows)
+    stats["migrated"] += retry["recovered"]
+    stats["failed"] += retry["failed"]
+    stats["retried"] = retry["retried"]
+
+    lock = threading.Lock()
+    completed: dict[int, tuple] = {}
+    next_to_checkpoint = 0
+    in_flight = threading.BoundedSemaphore(max(1, writers) * 2)
+
+    def write_batch(seq: int, entries: list[tuple], last_key: list) -> None:
+        nonlocal next_to_checkpoint
+        try:
+            groups, ids, invalid = [], [], []
+            for doc_id, payload, error in entries:
+                if payload is None:
+                    logger.warning(f"Skipping {doc_id}: {error}")
+                    invalid.append(doc_id)
+                    continue
+                item_ref, item_doc, expense_ref, expense_doc = _build_expense_docs(db, payload, now, doc_id=doc_id)
+                groups.append([("set", item_ref, item_doc), ("set", expense_ref, expense_doc)])
+                ids.append(doc_id)
+            errors = commit_write_groups(db, groups) if groups else []
+            failed = [doc_id for doc_id, error in zip(ids, errors) if error is not None]
+        except Exception as e:
+            logger.error(f"Batch {seq} failed: {str(e)}", exc_info=True)
+            invalid, failed = [], [doc_id for doc_id, _, _ in entries]
+        finally:
+            in_flight.release()
+
+        with lock:
+            completed[seq] = (last_key, len(entries) - len(invalid) - len(failed), invalid, failed)
+            stats["batches"] += 1
+            advanced = False
+            # The checkpoint only moves past a batch once every earlier batch is done
+            while next_to_checkpoint in completed:
+                key, ok, batch_invalid, batch_failed = completed.pop(next_to_checkpoint)
+                checkpoint["after"] = key
+                checkpoint["migrated"] += ok
+                checkpoint["invalid_ids"].extend(batch_invalid)
+                checkpoint["failed_ids"].extend(batch_failed)
+                stats["migrated"] += ok
+                stats["invalid"] += len(batch_invalid)
+                stats["failed"] += len(batch_failed)
+                next_to_checkpoint += 1
+                advanced = True
+            if advanced:
+                if on_checkpoint:
+                    on_checkpoint(checkpoint)
+                if stats["batches"] % 20 == 0:
+                    elapsed = time.perf_counter() - start
+                    logger.info(f"Migrated {stats['migrated']} movements ({stats['migrated'] / elapsed:.0f} rows/s)")
+
+    transform = partial(transform_movements, migrated_at=migrated_at)
+    processes = (
+        ProcessPoolExecutor(max_workers=transform_workers, mp_context=multiprocessing.get_context("spawn"))
+        if transform_workers > 0 else None
+    )
+    pending: deque[tuple[Future, list]] = deque()
+    seq = 0
+
+    def submit_batches(entries: list[tuple], keys: list[list]) -> None:
+        nonlocal seq
+        for offset in range(0, len(entries), batch_rows):
+            # Blocks while `writers * 2` batches are in flight, which also bounds rows held in memory
+            in_flight.acquire()
+            writes.submit(write_batch, seq, entries[offset:offset + batch_rows], keys[min(offset + batch_rows, len(keys)) - 1])
+            seq += 1
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, writers), thread_name_prefix="migrate") as writes:
+            for rows in iter_movement_chunks(conn, checkpoint["after"], fetch_size):
+                stats["read"] += len(rows)
+                keys = [[row.pop("sort_key"), row["_id"]] for row in rows]
+                if processes is None:
+                    submit_batches(transform(rows), keys)
+                else:
+                    pending.append((processes.submit(transform, rows), keys))
+                    # Keep a couple of chunks per worker queued, in read order
+                    while len(pending) > transform_workers * 2:
+                        future, chunk_keys = pending.popleft()
+                        submit_batches(future.result(), chunk_keys)
+                if limit is not None and stats["read"] >= limit:
+                    logger.info(f"Reached {limit} rows; stopping until the next run")
+                    break
+            while pending:
+                future, chunk_keys = pending.popleft()
+                submit_batches(future.result(), chunk_keys)
+    finally:
+        if processes is not None:
+            processes.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - start
+    stats["elapsed_seconds"] = round(elapsed, 3)
+    stats["rows_per_second"] = round(stats["migrated"] / elapsed, 1) if elapsed else 0.0
+    stats["total_migrated"] = checkpoint["migrated"]
+    return stats
+
+
+def migrate_currencies(db: Client, conn: sqlite3.Connection) -> dict:
+    """Store table_currencies rows as note items (deterministic IDs, safe to re-run)."""
+    now = datetime.now(timezone.utc)
+    groups = []
+    for row in conn.execute("SELECT * FROM table_currencies"):
+        currency = {key: row[key] for key in row.keys()}
+        doc_id = f"sqlite_currency_{currency.get('_id', currency.get('code'))}"
+        groups.append([("set", db.collection("items").document(doc_id), {
+            "id": doc_id,
+            "kind": "note",
+            "title": f"Currency: {currency.get('code', 'Unknown')}",
+            "content": json.dumps({**currency, "migrated_from": "sqlite", "migrated_at": now.isoformat()}, default=str),
+            "created_at": now,
+            "updated_at": now,
+        })])
+    errors = commit_write_groups(db, groups)
+    return {"migrated": sum(1 for error in errors if error is None), "failed": sum(1 for error in errors if error is not None)}
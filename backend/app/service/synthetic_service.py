@@ -0,0 +1,387 @@
+"""Deterministic synthetic data for load and scale testing."""
+from __future__ import annotations
+
+import hashlib
+import logging
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterator, Optional, TYPE_CHECKING
+
+from ..chat_status import conversation_ref
+from ..firestore_db import MAX_BATCH_WRITES
+from ..schemas import ChatMessageCreate, ExpenseCategory, ExpenseCreate, TaskCreate
+from .chat_service import _build_chat_docs
+from .expense_service import _build_expense_docs
+from .file_service import _build_file_docs
+from .import_service import WriteRateLimiter, commit_with_backoff
+from .task_service import _build_task_doc
+
+if TYPE_CHECKING:
+    from google.cloud.firestore import Client
+
+logger = logging.getLogger("myvault.synthetic_service")
+
+# Every generated document ID starts with this, so synthetic data is easy to find and remove
+SYNTHETIC_PREFIX = "synthetic"
+
+SYNTHETIC_KINDS = ("expenses", "tasks", "conversations", "files", "notes")
+
+# Per category: expected purchases per day, median amount, and log-normal spread of amounts
+_CATEGORY_PROFILES: dict[ExpenseCategory, tuple[float, float, float]] = {
+    ExpenseCategory.GROCERY: (0.45, 45.0, 0.5),
+    ExpenseCategory.VEGETABLES: (0.3, 12.0, 0.4),
+    ExpenseCategory.TRANSPORT: (0.6, 8.0, 0.6),
+    ExpenseCategory.FUEL: (0.12, 55.0, 0.3),
+    ExpenseCategory.RESTAURANT: (0.2, 30.0, 0.6),
+    ExpenseCategory.SNACKS: (0.4, 5.0, 0.5),
+    ExpenseCategory.CLOTHING: (0.05, 60.0, 0.7),
+    ExpenseCategory.FUN: (0.1, 35.0, 0.8),
+    ExpenseCategory.HEALTH: (0.05, 40.0, 0.9),
+    ExpenseCategory.PERSONAL: (0.1, 20.0, 0.7),
+    ExpenseCategory.OTHER: (0.1, 25.0, 1.0),
+}
+# Month-of-year multipliers on purchase frequency (January first); other categories are flat
+_SEASONALITY: dict[ExpenseCategory, tuple[float, ...]] = {
+    ExpenseCategory.CLOTHING: (1.4, 0.6, 0.8, 0.9, 0.9, 0.8, 1.2, 0.8, 0.9, 1.1, 1.8, 2.2),
+    ExpenseCategory.FUN: (0.6, 0.7, 0.9, 1.0, 1.2, 1.6, 1.8, 1.7, 1.1, 0.9, 0.8, 1.3),
+    ExpenseCategory.RESTAURANT: (0.8, 0.9, 0.9, 1.0, 1.0, 1.1, 1.1, 1.0, 0.9, 1.0, 1.1, 1.6),
+    ExpenseCategory.HEALTH: (1.6, 1.5, 1.1, 0.9, 0.7, 0.6, 0.6, 0.6, 0.8, 1.0, 1.3, 1.5),
+    ExpenseCategory.FUEL: (0.9, 0.9, 1.0, 1.0, 1.1, 1.2, 1.3, 1.3, 1.0, 1.0, 0.9, 1.1),
+}
+# Weekend multiplier on purchase frequency
+_WEEKEND = {ExpenseCategory.RESTAURANT: 1.8, ExpenseCategory.FUN: 2.0, ExpenseCategory.TRANSPORT: 0.5}
+
+_MERCHANTS = {
+    ExpenseCategory.GROCERY: ("Supermarket", "Corner store", "Wholesale club"),
+    ExpenseCategory.VEGETABLES: ("Farmers market", "Greengrocer"),
+    ExpenseCategory.TRANSPORT: ("Metro", "Bus", "Taxi", "Train"),
+    ExpenseCategory.FUEL: ("Fuel station",),
+    ExpenseCategory.RESTAURANT: ("Dinner out", "Lunch", "Takeaway", "Cafe"),
+    ExpenseCategory.SNACKS: ("Coffee", "Bakery", "Vending machine"),
+    ExpenseCategory.CLOTHING: ("Clothes", "Shoes"),
+    ExpenseCategory.FUN: ("Cinema", "Concert", "Games", "Museum"),
+    ExpenseCategory.HEALTH: ("Pharmacy", "Doctor", "Dentist"),
+    ExpenseCategory.PERSONAL: ("Haircut", "Toiletries", "Gift"),
+    ExpenseCategory.OTHER: ("Misc", "Household", "Repair"),
+}
+
+_TASK_TITLES = ("Pay rent", "Renew insurance", "Call bank", "Book dentist", "File taxes", "Car service", "Update resume")
+_CHAT_LINES = (
+    "How much did I spend on groceries this month?",
+    "Remind me to pay the electricity bill",
+    "Show my tasks for this week",
+    "Here is the summary you asked for.",
+    "Done, I've added that.",
+    "What's my balance trend?",
+)
+_FOLDERS = ("Personal", "Work", "Medical", "Financial", "Education", "Travel", "Legal", "documents")
+_FILE_TYPES = (("application/pdf", "pdf"), ("image/jpeg", "jpg"), ("image/png", "png"), ("text/plain", "txt"))
+
+# Chat message counts follow a Pareto distribution: most conversations are short, a few are very long
+CHAT_PARETO_ALPHA = 1.2
+CHAT_MIN_MESSAGES = 2
+CHAT_MAX_MESSAGES = 5000
+
+
+def _rng(seed: int, kind: str) -> random.Random:
+    # One stream per kind: changing how many tasks are generated doesn't change the expenses
+    return random.Random(f"{seed}:{kind}")
+
+
+def _poisson(rng: random.Random, lam: float) -> int:
+    if lam <= 0:
+        return 0
+    # Knuth's method; daily rates here are small
+    threshold, count, product = math.exp(-lam), 0, rng.random()
+    while product > threshold:
+        count += 1
+        product *= rng.random()
+    return count
+
+
+def _at(day: date, rng: random.Random, first_hour: int = 7, last_hour: int = 23) -> datetime:
+    return datetime(day.year, day.month, day.day, rng.randrange(first_hour, last_hour), rng.randrange(60),
+                    rng.randrange(60), tzinfo=timezone.utc)
+
+
+def _synthetic_id(kind: str, index: int) -> str:
+    return f"{SYNTHETIC_PREFIX}_{kind}_{index:09d}"
+
+
+def iter_expense_groups(db: Client, seed: int, start: date, end: date, scale: float = 1.0) -> Iterator[list[tuple]]:
+    """
+    Daily expenses from `start` to `end`: a Poisson number of purchases per
+    category (seasonal and weekday weighted) with log-normal amounts, a monthly
+    salary that grows 3% a year, and a monthly transfer to savings.
+    """
+    rng = _rng(seed, "expenses")
+    index = 0
+    day = start
+    while day <= end:
+        events: list[tuple] = []
+        weekend = day.weekday() >= 5
+        for category, (rate, median, spread) in _CATEGORY_PROFILES.items():
+            lam = rate * scale * _SEASONALITY.get(category, (1.0,) * 12)[day.month - 1]
+            if weekend:
+                lam *= _WEEKEND.get(category, 1.0)
+            for _ in range(_poisson(rng, lam)):
+                amount = round(rng.lognormvariate(math.log(median), spread), 2)
+                events.append((rng.choice(_MERCHANTS[category]), category, max(amount, 0.5), False))
+        if day.day == 1:
+            salary = round(4000 * 1.03 ** (day.year - start.year) * rng.uniform(0.98, 1.02), 2)
+            events.append(("Salary", ExpenseCategory.OTHER, salary, True))
+        elif day.day == 2:
+            events.append(("Monthly savings", ExpenseCategory.SAVINGS, round(rng.uniform(300, 600), 2), False))
+
+        for title, category, amount, is_income in events:
+            occurred = _at(day, rng)
+            payload = ExpenseCreate(title=title, amount=amount, category=category, is_income=is_income, occurred_on=occurred)
+            item_ref, item_doc, expense_ref, expense_doc = _build_expense_docs(
+                db, payload, occurred, doc_id=_synthetic_id("expense", index)
+            )
+            index += 1
+            yield [("set", item_ref, item_doc), ("set", expense_ref, expense_doc)]
+        day += timedelta(days=1)
+
+
+def iter_task_groups(db: Client, seed: int, start: date, end: date, count: int, today: date) -> Iterator[list[tuple]]:
+    """Tasks created across the period, due 1-30 days later; most past-due tasks are done."""
+    rng = _rng(seed, "tasks")
+    span = (end - start).days + 1
+    for index in range(count):
+        created = _at(start + timedelta(days=rng.randrange(span)), rng)
+        due = created + timedelta(days=rng.randint(1, 30), hours=rng.randint(0, 12))
+        payload = TaskCreate(title=rng.choice(_TASK_TITLES), content=f"Synthetic task {index}", due_at=due)
+        task_ref, task_doc = _build_task_doc(db, payload, created, doc_id=_synthetic_id("task", index))
+        if due.date() < today and rng.random() < 0.85:
+            task_doc["is_done"] = True
+            task_doc["updated_at"] = task_doc["item"]["updated_at"] = min(due, created + timedelta(days=rng.randint(0, 30)))
+        yield [("set", task_ref, task_doc)]
+
+
+def iter_conversation_groups(
+    db: Client, seed: int, start: date, end: date, count: int, max_messages: int = CHAT_MAX_MESSAGES
+) -> Iterator[list[tuple]]:
+    """
+    `count` conversations with Pareto-distributed message counts. Messages
+    alternate between user and assistant; all but the last few are read, and only
+    unread assistant messages count towards unread_count. Each
+    conversation's counter document is written with its final (trusted) counts.
+    """
+    rng = _rng(seed, "conversations")
+    span = (end - start).days + 1
+    horizon = datetime(end.year, end.month, end.day, 23, 59, tzinfo=timezone.utc)
+    index = 0
+    for number in range(count):
+        conversation_id = _synthetic_id("conversation", number)
+        messages = min(max_messages, int(CHAT_MIN_MESSAGES * rng.paretovariate(CHAT_PARETO_ALPHA)))
+        at = _at(start + timedelta(days=rng.randrange(span)), rng)
+        unread_from = messages - rng.randint(0, min(3, messages))
+        written = unread = 0
+        last = at
+        for position in range(messages):
+            if at > horizon:
+                break
+            payload = ChatMessageCreate(message=rng.choice(_CHAT_LINES), conversation_id=conversation_id)
+            item_ref, item_doc, msg_ref, chat_doc = _build_chat_docs(db, payload, at, doc_id=_synthetic_id("chat", index))
+            chat_doc["is_user"] = position % 2 == 0
+            if position < unread_from:
+                chat_doc.update(status="read", delivered_at=at, read_at=at)
+            elif not chat_doc["is_user"]:
+                unread += 1
+            index += 1
+            written += 1
+            yield [("set", item_ref, item_doc), ("set", msg_ref, chat_doc)]
+            last = at
+            # Replies within minutes, new exchanges hours or days apart
+            at += timedelta(seconds=rng.randint(5, 300)) if position % 2 == 0 else timedelta(minutes=rng.expovariate(1 / 720))
+        if written:
+            yield [("set", conversation_ref(db, conversation_id), {
+                "conversation_id": conversation_id,
+                "message_count": written,
+                "unread_count": unread,
+                "last_message_at": last,
+                "updated_at": last,
+                "counted_at": last,
+            })]
+
+
+def iter_file_groups(db: Client, seed: int, start: date, end: date, count: int) -> Iterator[list[tuple]]:
+    """
+    File records across the period sharing a pool of blobs (about three files per
+    content hash, like re-uploaded documents), with their blob_hashes entries.
+    Storage objects are not created; content and preview endpoints 404 for these.
+    """
+    rng = _rng(seed, "files")
+    span = (end - start).days + 1
+    distinct = max(1, count // 3)
+    blobs = []
+    for number in range(distinct):
+        content_type, extension = rng.choice(_FILE_TYPES)
+        content_hash = hashlib.sha256(f"{SYNTHETIC_PREFIX}:{seed}:{number}".encode()).hexdigest()
+        blobs.append({
+            "content_hash": content_hash,
+            "content_type": content_type,
+            "extension": extension,
+            "size": int(rng.lognormvariate(math.log(200_000), 1.2)) + 1,
+            "storage_path": f"{SYNTHETIC_PREFIX}/{content_hash}.{extension}",
+        })
+    refs = [0] * distinct
+    first_use: list[Optional[datetime]] = [None] * distinct
+    for index in range(count):
+        number = rng.randrange(distinct)
+        blob = blobs[number]
+        uploaded = _at(start + timedelta(days=rng.randrange(span)), rng)
+        refs[number] += 1
+        first_use[number] = min(first_use[number] or uploaded, uploaded)
+        item_ref, item_doc, file_ref, file_doc = _build_file_docs(
+            db,
+            {"storage_path": blob["storage_path"]},
+            blob["content_hash"],
+            f"document_{index}.{blob['extension']}",
+            blob["content_type"],
+            blob["size"],
+            rng.choice(_FOLDERS),
+            None,
+            None,
+            None,
+            None,
+            uploaded,
+            doc_id=_synthetic_id("file", index),
+        )
+        yield [("set", item_ref, item_doc), ("set", file_ref, file_doc)]
+    for blob, ref_count, created in zip(blobs, refs, first_use):
+        if ref_count:
+            yield [("set", db.collection("blob_hashes").document(blob["content_hash"]), {
+                "sha256": blob["content_hash"],
+                "content_type": blob["content_type"],
+                "size": blob["size"],
+                "ref_count": ref_count,
+                "created_at": created,
+                "updated_at": created,
+                "storage_path": blob["storage_path"],
+            })]
+
+
+def iter_note_groups(db: Client, seed: int, start: date, end: date, count: int) -> Iterator[list[tuple]]:
+    """Plain note and link items."""
+    rng = _rng(seed, "notes")
+    span = (end - start).days + 1
+    for index in range(count):
+        created = _at(start + timedelta(days=rng.randrange(span)), rng)
+        doc_id = _synthetic_id("note", index)
+        kind = "link" if rng.random() < 0.3 else "note"
+        yield [("set", db.collection("items").document(doc_id), {
+            "id": doc_id,
+            "kind": kind,
+            "title": f"Synthetic {kind} {index}",
+            "content": f"https://example.com/{index}" if kind == "link" else f"Note body {index}",
+            "created_at": created,
+            "updated_at": created,
+        })]
+
+
+class GroupWriter:
+    """Packs write groups into full batches and commits them on a pool of writer threads."""
+
+    def __init__(self, db: Client, writers: int = 8, limiter: Optional[WriteRateLimiter] = None):
+        self.db = db
+        self.limiter = limiter or WriteRateLimiter()
+        self.stats = {"groups": 0, "writes": 0, "failed_batches": 0, "failed_writes": 0}
+        self._pool = ThreadPoolExecutor(max_workers=max(1, writers), thread_name_prefix="synthetic")
+        self._in_flight = threading.BoundedSemaphore(max(1, writers) * 2)
+        self._lock = threading.Lock()
+        self._writes: list[tuple] = []
+
+    def add(self, group: list[tuple]) -> None:
+        # A group never spans two batches
+        if len(self._writes) + len(group) > MAX_BATCH_WRITES:
+            self.flush()
+        self._writes.extend(group)
+        self.stats["groups"] += 1
+
+    def flush(self) -> None:
+        if not self._writes:
+            return
+        # Blocks while `writers * 2` batches are in flight
+        self._in_flight.acquire()
+        self._pool.submit(self._commit, self._writes)
+        self._writes = []
+
+    def _commit(self, writes: list[tuple]) -> None:
+        try:
+            error = commit_with_backoff(self.db, writes, self.limiter)
+        except Exception as e:
+            error = str(e)
+        finally:
+            self._in_flight.release()
+        with self._lock:
+            if error is None:
+                self.stats["writes"] += len(writes)
+            else:
+                self.stats["failed_batches"] += 1
+                self.stats["failed_writes"] += len(writes)
+
+    def close(self) -> dict:
+        self.flush()
+        self._pool.shutdown(wait=True)
+        return self.stats
+
+
+def generate_synthetic_data(
+    db: Client,
+    seed: int = 1,
+    years: float = 3.0,
+    until: Optional[date] = None,
+    scale: float = 1.0,
+    tasks: int = 500,
+    conversations: int = 1000,
+    files: int = 300,
+    notes: int = 300,
+    kinds: tuple[str, ...] = SYNTHETIC_KINDS,
+    writers: int = 8,
+    limiter: Optional[WriteRateLimiter] = None,
+) -> dict:
+    """
+    Write a synthetic dataset covering `years` up to `until` (default today).
+
+    Output is a function of the arguments alone: the same seed, dates and sizes
+    write the same documents under the same IDs, so reruns overwrite instead of
+    adding. `scale` multiplies expense volume; the counts of other kinds scale
+    by the caller. Returns per-kind group counts and write totals.
+    """
+    start_time = time.perf_counter()
+    end = until or datetime.now(timezone.utc).date()
+    start = end - timedelta(days=int(years * 365.25))
+    sources = {
+        "expenses": lambda: iter_expense_groups(db, seed, start, end, scale),
+        "tasks": lambda: iter_task_groups(db, seed, start, end, tasks, end),
+        "conversations": lambda: iter_conversation_groups(db, seed, start, end, conversations),
+        "files": lambda: iter_file_groups(db, seed, start, end, files),
+        "notes": lambda: iter_note_groups(db, seed, start, end, notes),
+    }
+    writer = GroupWriter(db, writers, limiter)
+    generated: dict[str, int] = {}
+    try:
+        for kind in kinds:
+            before = writer.stats["groups"]
+            for group in sources[kind]():
+                writer.add(group)
+            generated[kind] = writer.stats["groups"] - before
+            logger.info(f"Generated {generated[kind]} {kind} write groups")
+    finally:
+        stats = writer.close()
+    elapsed = time.perf_counter() - start_time
+    return {
+        "seed": seed,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "generated": generated,
+        **stats,
+        "elapsed_seconds": round(elapsed, 3),
+        "writes_per_second": round(stats["writes"] / elapsed, 1) if elapsed else 0.0,
+    }
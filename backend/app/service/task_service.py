@@ -1,17 +1,27 @@
 """Task service refactored to Firestore."""
 from __future__ import annotations
 
+import logging
 from datetime import datetime, date, timezone
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 
-from google.cloud.firestore import Client, FieldFilter
+from ..firestore_db import MAX_BATCH_WRITES, commit_write_groups, tombstone, write_results
+from ..firestore_queries import iter_query_pages, stream_query
+from ..schemas import TaskBulkUpdate, TaskCreate, TaskUpdate
 
-from ..schemas import TaskCreate, TaskUpdate
+if TYPE_CHECKING:
+    from google.cloud.firestore import Client
 
+logger = logging.getLogger("myvault.task_service")
 
-def create_task(db: Client, payload: TaskCreate) -> dict:
-    now = datetime.now(timezone.utc)
-    task_ref = db.collection("tasks").document()
+# Stamped on every write to a task's items/{item_id} document, which may create it,
+# so the orphan sweeper knows the item belongs to a task
+TASK_ITEM_STAMP = {"kind": "task", "owner": "tasks"}
+
+
+def _build_task_doc(db: Client, payload: TaskCreate, now: datetime, doc_id: Optional[str] = None) -> tuple:
+    # doc_id makes writes idempotent and reproducible (synthetic data)
+    task_ref = db.collection("tasks").document(doc_id)
     
     # Create task document with embedded item data
     task_doc = {
@@ -34,20 +44,34 @@ def create_task(db: Client, payload: TaskCreate) -> dict:
             "updated_at": now
         }
     }
+    return task_ref, task_doc
+
+
+def create_task(db: Client, payload: TaskCreate) -> dict:
+    now = datetime.now(timezone.utc)
+    task_ref, task_doc = _build_task_doc(db, payload, now)
     
     # Set the task document
     task_ref.set(task_doc)
     return task_ref.get().to_dict()
 
 
-def get_tasks(
-    db: Client,
-    is_done: Optional[bool] = None,
-    due_date: Optional[date] = None,
-    overdue: bool = False,
-    limit: int = 50,
-    offset: int = 0,
-) -> list[dict]:
+def create_tasks_bulk(db: Client, payloads: list[TaskCreate]) -> list[dict]:
+    """Create many tasks through batched commits."""
+    now = datetime.now(timezone.utc)
+    ids: list[str] = []
+    groups: list[list[tuple]] = []
+    for payload in payloads:
+        task_ref, task_doc = _build_task_doc(db, payload, now)
+        ids.append(task_ref.id)
+        groups.append([("set", task_ref, task_doc)])
+    errors = commit_write_groups(db, groups)
+    return write_results(ids, errors)
+
+
+def _filtered_tasks(db: Client, is_done: Optional[bool], due_date: Optional[date], overdue: bool):
+    from google.cloud.firestore import FieldFilter
+
     q = db.collection("tasks")
     if is_done is not None:
         q = q.where(filter=FieldFilter("is_done", "==", is_done))
@@ -58,13 +82,24 @@ def get_tasks(
     
     if overdue:
         q = q.where(filter=FieldFilter("due_at", "<", datetime.now(timezone.utc))).where(filter=FieldFilter("is_done", "==", False))
-    
-    try:
-        q = q.order_by("due_at", direction="ASCENDING")
-    except Exception:
-        pass  # Skip ordering if index missing
-    
-    docs = [d.to_dict() for d in q.offset(offset).limit(limit).stream()]
+    return q
+
+
+def get_tasks(
+    db: Client,
+    is_done: Optional[bool] = None,
+    due_date: Optional[date] = None,
+    overdue: bool = False,
+    limit: int = 50,
+    offset: int = 0,
+) -> list[dict]:
+    q = _filtered_tasks(db, is_done, due_date, overdue)
+    ordered = q.order_by("due_at", direction="ASCENDING")
+    # Skip ordering if index missing
+    docs = [
+        d.to_dict()
+        for d in stream_query(ordered.offset(offset).limit(limit), fallback=q.offset(offset).limit(limit))
+    ]
     
     # Ensure all required fields are present
     for task in docs:
@@ -139,7 +174,7 @@ def update_task(db: Client, task_id: str, payload: TaskUpdate) -> Optional[dict]
         item_id = task_data.get("item_id")
         if item_id:
             item_ref = db.collection("items").document(item_id)
-            item_updates = {"updated_at": datetime.now(timezone.utc)}
+            item_updates = {**TASK_ITEM_STAMP, "updated_at": datetime.now(timezone.utc)}
             
             # Update item fields if they changed
             if payload.title is not None:
@@ -208,7 +243,7 @@ def toggle_task_completion(db: Client, task_id: str) -> Optional[dict]:
         item_id = task_data.get("item_id")
         if item_id:
             item_ref = db.collection("items").document(item_id)
-            item_updates = {"updated_at": datetime.now(timezone.utc)}
+            item_updates = {**TASK_ITEM_STAMP, "updated_at": datetime.now(timezone.utc)}
             item_ref.set(item_updates, merge=True)
             
             # Get the updated item
@@ -239,15 +274,65 @@ def toggle_task_completion(db: Client, task_id: str) -> Optional[dict]:
     return task_data
 
 
+def update_tasks_matching(
+    db: Client,
+    payload: TaskBulkUpdate,
+    is_done: Optional[bool] = None,
+    due_date: Optional[date] = None,
+    overdue: bool = False,
+) -> dict:
+    """
+    Apply the same update to every task matching the filters (e.g. mark all overdue
+    done), bumping each task's item like update_task does.
+    """
+    now = datetime.now(timezone.utc)
+    updates: dict = {"updated_at": now}
+    if payload.is_done is not None:
+        updates["is_done"] = payload.is_done
+    if payload.due_at is not None:
+        updates["due_at"] = payload.due_at
+
+    q = _filtered_tasks(db, is_done, due_date, overdue)
+    q = q.order_by("due_at", direction="ASCENDING").select(["due_at", "item_id"])
+    pages = iter_query_pages(q, page_size=MAX_BATCH_WRITES)
+    if "due_at" in updates:
+        # Pages resume after the last due_at seen, so rewriting due_at could move tasks
+        # past the cursor and update them twice; collect the matches before writing
+        snaps = [snap for page in pages for snap in page]
+        pages = (snaps[i:i + MAX_BATCH_WRITES] for i in range(0, len(snaps), MAX_BATCH_WRITES))
+    matched = updated = 0
+    for page in pages:
+        errors = commit_write_groups(db, [
+            [
+                ("update", snap.reference, updates),
+                ("merge", db.collection("items").document(str((snap.to_dict() or {}).get("item_id") or snap.id)), {**TASK_ITEM_STAMP, "updated_at": now}),
+            ]
+            for snap in page
+        ])
+        matched += len(page)
+        updated += sum(1 for error in errors if error is None)
+    logger.info(f"Updated {updated}/{matched} tasks matching filters")
+    return {"matched": matched, "succeeded": updated, "failed": matched - updated}
+
+
 def delete_task(db: Client, task_id: str) -> bool:
     ref = db.collection("tasks").document(str(task_id))
-    if not ref.get().exists:
+    snap = ref.get()
+    if not snap.exists:
         return False
-    ref.delete()
+    # Tasks share their ID with the item update_task maintains; remove both in one commit
+    item_ref = db.collection("items").document(str((snap.to_dict() or {}).get("item_id") or task_id))
+    batch = db.batch()
+    for deleted in (ref, item_ref):
+        batch.delete(deleted)
+        batch.set(*tombstone(db, deleted))
+    batch.commit()
     return True
 
 
 def get_tasks_for_calendar(db: Client, start_date: date, end_date: date) -> list[dict]:
+    from google.cloud.firestore import FieldFilter
+
     start_datetime = datetime.combine(start_date, datetime.min.time())
     end_datetime = datetime.combine(end_date, datetime.max.time())
     q = (
@@ -257,7 +342,7 @@ def get_tasks_for_calendar(db: Client, start_date: date, end_date: date) -> list
         .order_by("due_at", direction="ASCENDING")
     )
     
-    docs = [d.to_dict() for d in q.stream()]
+    docs = [d.to_dict() for d in stream_query(q)]
     
     # Ensure all required fields are present
     for task in docs:
@@ -1,61 +1,83 @@
 """
-Firebase Storage integration for file uploads.
-Handles documents, images, and other file types.
+File storage for uploads: documents, images, and other file types.
+
+Bytes live in the configured backend (Firebase Storage or local disk, see
+app/storage_backends); this module is the interface the rest of the app uses.
 """
 from __future__ import annotations
 
 import logging
 import os
+import threading
 import uuid
-from typing import Optional, BinaryIO
-from datetime import datetime, timezone
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Optional, BinaryIO, Iterable, Iterator
+from datetime import datetime, timedelta, timezone
 
-from google.cloud import storage
-from google.auth import default as google_auth_default
+from .config.settings import get_settings
+from .storage_backends import STREAM_CHUNK_SIZE, get_storage_backend
+# Firebase Storage handles, for jobs that work on the bucket directly (e.g. the orphan sweeper)
+from .storage_backends.gcs import get_bucket, get_bucket_name, get_storage_client  # noqa: F401
 
 logger = logging.getLogger("myvault.storage")
 
-_client: storage.Client | None = None
 
+class SignedUrlCache:
+    """
+    LRU cache of signed URLs by storage path, served until a margin before they expire.
 
-def _resolve_project_id() -> str | None:
-    """Resolve the Google Cloud project ID from environment or ADC."""
-    # Prefer explicit env vars
-    for key in ("GOOGLE_CLOUD_PROJECT", "GCLOUD_PROJECT", "FIREBASE_PROJECT_ID"):
-        val = os.getenv(key)
-        if val:
-            return val
-    # Fall back to ADC default project
-    try:
-        _, project_id = google_auth_default()
-        return project_id
-    except Exception:
-        return None
+    Lookups can ask for `min_remaining` instead, to only reuse a URL with at least
+    that much life left.
+    """
 
+    def __init__(self, max_entries: int, margin_seconds: float):
+        self._max_entries = max_entries
+        self._margin = timedelta(seconds=margin_seconds)
+        self._entries: OrderedDict[str, tuple[str, datetime]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, storage_path: str, min_remaining: Optional[timedelta] = None) -> Optional[tuple[str, datetime]]:
+        with self._lock:
+            entry = self._entries.get(storage_path)
+            if entry is None:
+                return None
+            now = datetime.now(timezone.utc)
+            if entry[1] - self._margin <= now:
+                del self._entries[storage_path]
+                return None
+            if min_remaining is not None and entry[1] < now + min_remaining:
+                return None
+            self._entries.move_to_end(storage_path)
+            return entry
+
+    def put(self, storage_path: str, url: str, expires_at: datetime) -> None:
+        with self._lock:
+            self._entries[storage_path] = (url, expires_at)
+            self._entries.move_to_end(storage_path)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, storage_path: str) -> None:
+        with self._lock:
+            self._entries.pop(storage_path, None)
+
+
+_signed_urls: SignedUrlCache | None = None
+
+
+def get_signed_url_cache() -> SignedUrlCache:
+    global _signed_urls
+    if _signed_urls is None:
+        settings = get_settings()
+        _signed_urls = SignedUrlCache(settings.signed_url_cache_size, settings.signed_url_margin_seconds)
+    return _signed_urls
 
-def get_storage_client() -> storage.Client:
-    """Get or create Firebase Storage client."""
-    global _client
-    if _client is None:
-        project_id = _resolve_project_id()
-        if not project_id:
-            raise RuntimeError(
-                "Firebase project ID not found. Set env var GOOGLE_CLOUD_PROJECT to your project ID (e.g., myvault-f3f99)."
-            )
-        logger.info(f"Initializing Firebase Storage client for project: {project_id}")
-        _client = storage.Client(project=project_id)
-    return _client
-
-
-def get_bucket_name() -> str:
-    """Get the Firebase Storage bucket name."""
-    project_id = _resolve_project_id()
-    if not project_id:
-        raise RuntimeError("Firebase project ID not found")
-    
-    # Default Firebase Storage bucket pattern
-    bucket_name = os.getenv("FIREBASE_STORAGE_BUCKET", f"{project_id}.appspot.com")
-    return bucket_name
+
+def warm_up() -> None:
+    """Build the client and issue a trivial RPC so credentials and connections are ready."""
+    get_storage_backend().warm_up()
 
 
 def upload_file(
@@ -65,7 +87,7 @@ def upload_file(
     folder: str = "documents"
 ) -> dict:
     """
-    Upload a file to Firebase Storage.
+    Upload a file to storage under a unique path.
     
     Args:
         file_data: Binary file data
@@ -77,33 +99,22 @@ def upload_file(
         Dict with file info including public URL
     """
     try:
-        client = get_storage_client()
-        bucket_name = get_bucket_name()
-        bucket = client.bucket(bucket_name)
-        
         # Generate unique filename to avoid conflicts
         file_extension = os.path.splitext(filename)[1]
         unique_filename = f"{uuid.uuid4()}{file_extension}"
         storage_path = f"{folder}/{unique_filename}"
         
-        # Create blob and upload
-        blob = bucket.blob(storage_path)
-        blob.upload_from_file(file_data, content_type=content_type)
-        
-        # Make the file publicly accessible
-        blob.make_public()
-        
-        # Get public URL
-        public_url = blob.public_url
+        # Upload and make the file publicly accessible
+        stored = get_storage_backend().upload(file_data, storage_path, content_type, public=True)
         
         file_info = {
             "id": str(uuid.uuid4()),
             "original_filename": filename,
             "storage_path": storage_path,
-            "storage_bucket": bucket_name,
-            "public_url": public_url,
+            "storage_bucket": stored["storage_bucket"],
+            "public_url": stored["public_url"],
             "content_type": content_type,
-            "size": blob.size,
+            "size": stored["size"],
             "folder": folder,
             "uploaded_at": datetime.now(timezone.utc),
         }
@@ -116,9 +127,17 @@ def upload_file(
         raise RuntimeError(f"Failed to upload file: {str(e)}")
 
 
+def upload_bytes(data: bytes, storage_path: str, content_type: str, public: bool = True) -> dict:
+    """Upload bytes to an exact storage path (used for derived files such as previews)."""
+    stored = get_storage_backend().upload(
+        BytesIO(data), storage_path, content_type, public=public, cache_control="public, max-age=31536000, immutable"
+    )
+    return {"storage_path": storage_path, "public_url": stored["public_url"], "size": len(data)}
+
+
 def delete_file(storage_path: str) -> bool:
     """
-    Delete a file from Firebase Storage.
+    Delete a file from storage.
     
     Args:
         storage_path: Path to file in storage
@@ -127,13 +146,8 @@ def delete_file(storage_path: str) -> bool:
         True if successful, False otherwise
     """
     try:
-        client = get_storage_client()
-        bucket_name = get_bucket_name()
-        bucket = client.bucket(bucket_name)
-        
-        blob = bucket.blob(storage_path)
-        if blob.exists():
-            blob.delete()
+        get_signed_url_cache().invalidate(storage_path)
+        if get_storage_backend().delete(storage_path):
             logger.info(f"File deleted successfully: {storage_path}")
             return True
         else:
@@ -147,7 +161,7 @@ def delete_file(storage_path: str) -> bool:
 
 def get_file_info(storage_path: str) -> Optional[dict]:
     """
-    Get information about a file in Firebase Storage.
+    Get information about a file in storage.
     
     Args:
         storage_path: Path to file in storage
@@ -156,24 +170,18 @@ def get_file_info(storage_path: str) -> Optional[dict]:
         File info dict or None if not found
     """
     try:
-        client = get_storage_client()
-        bucket_name = get_bucket_name()
-        bucket = client.bucket(bucket_name)
-        
-        blob = bucket.blob(storage_path)
-        if not blob.exists():
+        info = get_storage_backend().stat(storage_path)
+        if info is None:
             return None
-            
-        blob.reload()  # Refresh metadata
         
         return {
             "storage_path": storage_path,
-            "storage_bucket": bucket_name,
-            "public_url": blob.public_url,
-            "content_type": blob.content_type,
-            "size": blob.size,
-            "created": blob.time_created,
-            "updated": blob.updated,
+            "storage_bucket": info["storage_bucket"],
+            "public_url": info["public_url"],
+            "content_type": info["content_type"],
+            "size": info["size"],
+            "created": info["created"],
+            "updated": info["updated"],
         }
         
     except Exception as e:
@@ -181,35 +189,98 @@ def get_file_info(storage_path: str) -> Optional[dict]:
         return None
 
 
-def generate_signed_url(storage_path: str, expiration_hours: int = 1) -> Optional[str]:
+def stat_file(storage_path: str) -> Optional[dict]:
+    """Stored object metadata (size, content_type, etag, generation, updated, ...), or None if missing."""
+    return get_storage_backend().stat(storage_path)
+
+
+def iter_file_range(stat: dict, start: int, end: int, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Yield bytes start..end (inclusive) of a stored object in chunks.
+
+    Reads are pinned to the generation `stat` saw, so a replaced object fails the
+    stream instead of splicing two versions.
+    """
+    return get_storage_backend().iter_range(stat["storage_path"], start, end, stat["generation"], chunk_size)
+
+
+def get_signed_url(
+    storage_path: str,
+    expiration_hours: int = 1,
+    verify_exists: bool = True,
+    min_remaining: Optional[timedelta] = None,
+) -> Optional[tuple[str, datetime]]:
     """
-    Generate a signed URL for private file access.
+    Get a signed URL and its expiry, reusing a cached one while it has enough life left.
     
     Args:
         storage_path: Path to file in storage
-        expiration_hours: URL expiration time in hours
+        expiration_hours: Lifetime of a newly signed URL
+        verify_exists: Check the blob exists before signing. Callers holding the
+            files document can skip this RPC.
+        min_remaining: Only reuse a cached URL with at least this much life left
+            (default: any that isn't within the cache margin of expiring)
     
     Returns:
-        Signed URL or None if failed
+        (signed URL, expiry) or None if failed
     """
+    cache = get_signed_url_cache()
+    cached = cache.get(storage_path, min_remaining)
+    if cached:
+        return cached
     try:
-        client = get_storage_client()
-        bucket_name = get_bucket_name()
-        bucket = client.bucket(bucket_name)
-        
-        blob = bucket.blob(storage_path)
-        if not blob.exists():
+        backend = get_storage_backend()
+        if verify_exists and backend.stat(storage_path) is None:
             return None
-            
-        from datetime import timedelta
-        
-        url = blob.generate_signed_url(
-            expiration=datetime.now(timezone.utc) + timedelta(hours=expiration_hours),
-            method="GET"
-        )
         
-        return url
+        expires_at = datetime.now(timezone.utc) + timedelta(hours=expiration_hours)
+        url = backend.sign_url(storage_path, expires_at)
+        cache.put(storage_path, url, expires_at)
+        return url, expires_at
         
     except Exception as e:
         logger.error(f"Failed to generate signed URL for {storage_path}: {str(e)}", exc_info=True)
         return None
+
+
+def generate_signed_url(storage_path: str, expiration_hours: int = 1, verify_exists: bool = True) -> Optional[str]:
+    """
+    Generate a signed URL for private file access (cached until shortly before it expires).
+    
+    Args:
+        storage_path: Path to file in storage
+        expiration_hours: URL expiration time in hours
+        verify_exists: Check the blob exists before signing
+    
+    Returns:
+        Signed URL or None if failed
+    """
+    signed = get_signed_url(storage_path, expiration_hours, verify_exists)
+    return signed[0] if signed else None
+
+
+def get_signed_urls(
+    storage_paths: Iterable[str],
+    expiration_hours: int = 1,
+    min_remaining: Optional[timedelta] = None,
+) -> dict[str, tuple[str, datetime]]:
+    """
+    Signed URLs for many paths already known to exist (e.g. a page of files documents).
+    Cache misses are signed concurrently, since signing may be a remote IAM call.
+    `min_remaining` is as for get_signed_url.
+    """
+    paths = list(dict.fromkeys(storage_paths))
+    results: dict[str, tuple[str, datetime]] = {}
+    misses = []
+    for path in paths:
+        cached = get_signed_url_cache().get(path, min_remaining)
+        if cached:
+            results[path] = cached
+        else:
+            misses.append(path)
+    if misses:
+        with ThreadPoolExecutor(max_workers=min(8, len(misses))) as pool:
+            for path, signed in zip(misses, pool.map(lambda p: get_signed_url(p, expiration_hours, False, min_remaining), misses)):
+                if signed:
+                    results[path] = signed
+    return results
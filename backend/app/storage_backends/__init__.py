@@ -0,0 +1,29 @@
+"""Storage backends: Firebase Storage (default) or local disk, chosen by STORAGE_BACKEND."""
+from __future__ import annotations
+
+from typing import Optional
+
+from .base import STREAM_CHUNK_SIZE, StorageBackend
+
+_backend: Optional[StorageBackend] = None
+
+
+def get_storage_backend() -> StorageBackend:
+    global _backend
+    if _backend is None:
+        from ..config.settings import get_settings
+        settings = get_settings()
+        if settings.storage_backend == "local":
+            from .local import LocalBackend
+            _backend = LocalBackend(
+                settings.local_storage_root, settings.local_storage_base_url, settings.local_storage_signing_key
+            )
+        elif settings.storage_backend == "gcs":
+            from .gcs import GCSBackend
+            _backend = GCSBackend()
+        else:
+            raise RuntimeError(f"Unknown STORAGE_BACKEND {settings.storage_backend!r} (expected 'gcs' or 'local')")
+    return _backend
+
+
+__all__ = ["STREAM_CHUNK_SIZE", "StorageBackend", "get_storage_backend"]
@@ -0,0 +1,61 @@
+"""Interface every storage backend implements."""
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import BinaryIO, Iterator, Optional
+
+# Bytes fetched per read when streaming stored content
+STREAM_CHUNK_SIZE = 256 * 1024
+
+
+class StorageBackend(ABC):
+    """
+    Where uploaded bytes live. Storage paths are backend-neutral keys such as
+    "documents/<uuid>.pdf"; callers never see bucket or disk locations.
+    """
+
+    name: str
+
+    @abstractmethod
+    def upload(
+        self,
+        file_data: BinaryIO,
+        storage_path: str,
+        content_type: str,
+        public: bool = True,
+        cache_control: Optional[str] = None,
+    ) -> dict:
+        """Store a stream at storage_path. Returns storage_path, storage_bucket, public_url and size."""
+
+    @abstractmethod
+    def delete(self, storage_path: str) -> bool:
+        """Remove an object; False if nothing was stored there."""
+
+    @abstractmethod
+    def stat(self, storage_path: str) -> Optional[dict]:
+        """
+        Object metadata, or None if missing: size, content_type, etag, generation,
+        created, updated, public_url and storage_bucket.
+        """
+
+    @abstractmethod
+    def iter_range(
+        self,
+        storage_path: str,
+        start: int,
+        end: int,
+        generation: Optional[int] = None,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+    ) -> Iterator[bytes]:
+        """
+        Yield bytes start..end (inclusive) in chunks. With `generation`, fail rather
+        than mix in bytes from an object that was replaced.
+        """
+
+    @abstractmethod
+    def sign_url(self, storage_path: str, expires_at: datetime) -> str:
+        """A URL granting read access until expires_at."""
+
+    def warm_up(self) -> None:
+        """Prepare clients/connections before serving."""
@@ -0,0 +1,135 @@
+"""Google Cloud Storage (Firebase Storage) backend."""
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from functools import lru_cache
+from typing import BinaryIO, Iterator, Optional, TYPE_CHECKING
+
+from ..config.settings import get_settings, get_project_id
+from .base import STREAM_CHUNK_SIZE, StorageBackend
+
+if TYPE_CHECKING:
+    from google.cloud import storage
+
+logger = logging.getLogger("myvault.storage")
+
+_client: storage.Client | None = None
+_bucket: storage.Bucket | None = None
+
+
+def get_storage_client() -> storage.Client:
+    """Get or create Firebase Storage client."""
+    global _client
+    if _client is None:
+        # Deferred: only needed once a file endpoint (or the startup warm-up) runs
+        from google.cloud import storage
+
+        project_id = get_project_id()
+        if not project_id:
+            raise RuntimeError(
+                "Firebase project ID not found. Set env var GOOGLE_CLOUD_PROJECT to your project ID (e.g., myvault-f3f99)."
+            )
+        logger.info(f"Initializing Firebase Storage client for project: {project_id}")
+        _client = storage.Client(project=project_id)
+    return _client
+
+
+@lru_cache(maxsize=1)
+def get_bucket_name() -> str:
+    """Get the Firebase Storage bucket name (resolved once per process)."""
+    bucket_name = get_settings().firebase_storage_bucket
+    if bucket_name:
+        return bucket_name
+    project_id = get_project_id()
+    if not project_id:
+        raise RuntimeError("Firebase project ID not found")
+    
+    # Default Firebase Storage bucket pattern
+    return f"{project_id}.appspot.com"
+
+
+def get_bucket() -> storage.Bucket:
+    """Get the Firebase Storage bucket handle, resolved once per process."""
+    global _bucket
+    if _bucket is None:
+        _bucket = get_storage_client().bucket(get_bucket_name())
+    return _bucket
+
+
+class GCSBackend(StorageBackend):
+    name = "gcs"
+
+    def upload(
+        self,
+        file_data: BinaryIO,
+        storage_path: str,
+        content_type: str,
+        public: bool = True,
+        cache_control: Optional[str] = None,
+    ) -> dict:
+        bucket = get_bucket()
+        blob = bucket.blob(storage_path)
+        if cache_control:
+            blob.cache_control = cache_control
+        blob.upload_from_file(file_data, content_type=content_type)
+        if public:
+            blob.make_public()
+        return {
+            "storage_path": storage_path,
+            "storage_bucket": bucket.name,
+            "public_url": blob.public_url,
+            "size": blob.size,
+        }
+
+    def delete(self, storage_path: str) -> bool:
+        blob = get_bucket().blob(storage_path)
+        if not blob.exists():
+            return False
+        blob.delete()
+        return True
+
+    def stat(self, storage_path: str) -> Optional[dict]:
+        bucket = get_bucket()
+        blob = bucket.get_blob(storage_path)
+        if blob is None:
+            return None
+        return {
+            "storage_path": storage_path,
+            "storage_bucket": bucket.name,
+            "public_url": blob.public_url,
+            "content_type": blob.content_type,
+            "size": blob.size or 0,
+            "etag": blob.etag,
+            "generation": blob.generation,
+            "created": blob.time_created,
+            "updated": blob.updated,
+        }
+
+    def iter_range(
+        self,
+        storage_path: str,
+        start: int,
+        end: int,
+        generation: Optional[int] = None,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+    ) -> Iterator[bytes]:
+        # One exact ranged request per chunk; raw_download skips decompressive
+        # transcoding, keeping offsets in stored bytes
+        blob = get_bucket().blob(storage_path)
+        position = start
+        while position <= end:
+            last = min(position + chunk_size - 1, end)
+            chunk = blob.download_as_bytes(
+                start=position, end=last, if_generation_match=generation, raw_download=True
+            )
+            if not chunk:
+                break
+            yield chunk
+            position += len(chunk)
+
+    def sign_url(self, storage_path: str, expires_at: datetime) -> str:
+        return get_bucket().blob(storage_path).generate_signed_url(expiration=expires_at, method="GET")
+
+    def warm_up(self) -> None:
+        get_bucket().get_blob("_warmup/ping")
@@ -0,0 +1,184 @@
+"""
+Local-disk storage backend, for single-node deployments, benchmarks and offline runs.
+
+Objects are sharded by the SHA-256 of their storage path
+(`<root>/ab/cd/abcd...`), so no directory grows large and no storage path can
+escape the root. Each object has a JSON sidecar (`<hash>.json`) holding its
+storage path, content type, ETag and generation. Writes go to a temporary file
+that is renamed into place, so readers never see a partial object.
+
+Content is served by the API under /api/files/local/<storage path>: public
+objects directly, private ones through URLs signed with HMAC-SHA256.
+"""
+from __future__ import annotations
+
+import hashlib
+import hmac
+import json
+import logging
+import mmap
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional
+from urllib.parse import quote
+
+from .base import STREAM_CHUNK_SIZE, StorageBackend
+
+logger = logging.getLogger("myvault.storage")
+
+# Prefix of the API route serving local objects
+LOCAL_ROUTE = "/api/files/local/"
+
+
+class _HashingReader:
+    """File-like wrapper computing the MD5 (the ETag) of what is read through it."""
+
+    def __init__(self, file_data: BinaryIO):
+        self._file = file_data
+        self.md5 = hashlib.md5()
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._file.read(size)
+        self.md5.update(chunk)
+        return chunk
+
+
+class LocalBackend(StorageBackend):
+    name = "local"
+
+    def __init__(self, root: str, base_url: str, signing_key: str):
+        self.root = Path(root).resolve()
+        self.base_url = base_url.rstrip("/")
+        if not signing_key:
+            # Signed URLs then stop working when the process restarts
+            logger.warning("LOCAL_STORAGE_SIGNING_KEY is not set; using a random per-process key")
+            signing_key = os.urandom(32).hex()
+        self._key = signing_key.encode()
+
+    def _disk_path(self, storage_path: str) -> Path:
+        digest = hashlib.sha256(storage_path.encode()).hexdigest()
+        return self.root / digest[:2] / digest[2:4] / digest
+
+    @staticmethod
+    def _meta_path(path: Path) -> Path:
+        return path.with_name(path.name + ".json")
+
+    def _read_meta(self, path: Path) -> Optional[dict]:
+        try:
+            with open(self._meta_path(path), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _url(self, storage_path: str) -> str:
+        return f"{self.base_url}{LOCAL_ROUTE}{quote(storage_path)}"
+
+    def _signature(self, storage_path: str, expires: int) -> str:
+        return hmac.new(self._key, f"{storage_path}\n{expires}".encode(), hashlib.sha256).hexdigest()
+
+    def upload(
+        self,
+        file_data: BinaryIO,
+        storage_path: str,
+        content_type: str,
+        public: bool = True,
+        cache_control: Optional[str] = None,
+    ) -> dict:
+        path = self._disk_path(storage_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        reader = _HashingReader(file_data)
+        tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp, "wb") as out:
+                shutil.copyfileobj(reader, out, STREAM_CHUNK_SIZE)
+            size = tmp.stat().st_size
+            now = datetime.now(timezone.utc)
+            existing = self._read_meta(path)
+            meta = {
+                "storage_path": storage_path,
+                "content_type": content_type,
+                "size": size,
+                "etag": reader.md5.hexdigest(),
+                "generation": time.time_ns(),
+                "public": public,
+                "cache_control": cache_control,
+                "created": (existing or {}).get("created") or now.isoformat(),
+                "updated": now.isoformat(),
+            }
+            meta_tmp = tmp.with_name(tmp.name + ".json")
+            with open(meta_tmp, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(tmp, path)
+            os.replace(meta_tmp, self._meta_path(path))
+        finally:
+            for leftover in (tmp, tmp.with_name(tmp.name + ".json")):
+                leftover.unlink(missing_ok=True)
+        return {"storage_path": storage_path, "storage_bucket": self.name, "public_url": self._url(storage_path), "size": size}
+
+    def delete(self, storage_path: str) -> bool:
+        path = self._disk_path(storage_path)
+        self._meta_path(path).unlink(missing_ok=True)
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            return False
+        return True
+
+    def stat(self, storage_path: str) -> Optional[dict]:
+        path = self._disk_path(storage_path)
+        meta = self._read_meta(path)
+        if meta is None or not path.exists():
+            return None
+        return {
+            "storage_path": storage_path,
+            "storage_bucket": self.name,
+            "public_url": self._url(storage_path),
+            "content_type": meta["content_type"],
+            "size": meta["size"],
+            "etag": meta["etag"],
+            "generation": meta["generation"],
+            "public": meta.get("public", False),
+            "created": datetime.fromisoformat(meta["created"]),
+            "updated": datetime.fromisoformat(meta["updated"]),
+        }
+
+    def iter_range(
+        self,
+        storage_path: str,
+        start: int,
+        end: int,
+        generation: Optional[int] = None,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+    ) -> Iterator[bytes]:
+        path = self._disk_path(storage_path)
+        # The open descriptor keeps reading this version even if the object is replaced
+        with open(path, "rb") as f:
+            if generation is not None and (self._read_meta(path) or {}).get("generation") != generation:
+                raise FileNotFoundError(f"{storage_path} changed since generation {generation}")
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                end = min(end, size - 1)
+                position = start
+                while position <= end:
+                    last = min(position + chunk_size, end + 1)
+                    yield mapped[position:last]
+                    position = last
+
+    def sign_url(self, storage_path: str, expires_at: datetime) -> str:
+        expires = int(expires_at.timestamp())
+        return f"{self._url(storage_path)}?expires={expires}&signature={self._signature(storage_path, expires)}"
+
+    def verify_signature(self, storage_path: str, expires: Optional[int], signature: Optional[str]) -> bool:
+        """Check a signed URL's parameters: the HMAC matches and it hasn't expired."""
+        if expires is None or not signature or expires < time.time():
+            return False
+        return hmac.compare_digest(self._signature(storage_path, expires), signature)
+
+    def warm_up(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
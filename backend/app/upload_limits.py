@@ -0,0 +1,79 @@
+"""
+Request body size limits for upload endpoints, enforced before the body is buffered.
+
+Starlette spools a multipart body in full while parsing the form, before the
+endpoint runs, so a limit checked in the endpoint only applies after the whole
+upload has been received. This ASGI middleware rejects oversized uploads up
+front: from Content-Length when the client sends one, and otherwise as soon as
+the streamed body passes the limit.
+"""
+from __future__ import annotations
+
+import logging
+
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger("myvault.upload_limits")
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class UploadSizeLimitMiddleware:
+    """Answers 413 for POST bodies larger than `limits[path]`; other requests pass through untouched."""
+
+    def __init__(self, app, limits: dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get("path")) if scope["type"] == "http" and scope["method"] == "POST" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        too_large = self._response(limit)
+        headers = dict(scope.get("headers") or [])
+        length = headers.get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > limit:
+            logger.warning(f"Rejected {scope['path']} upload of {int(length)} bytes (limit {limit})")
+            await too_large(scope, receive, send)
+            return
+
+        received = 0
+        exceeded = False
+        started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            # The form parser turns our exception into a 400; answer 413 instead
+            if exceeded:
+                return
+            started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except _BodyTooLarge:
+            pass
+        if exceeded and not started:
+            logger.warning(f"Rejected {scope['path']} upload: body passed {limit} bytes")
+            await too_large(scope, receive, send)
+
+    @staticmethod
+    def _response(limit: int) -> JSONResponse:
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"Request body exceeds the maximum upload size of {limit // (1024 * 1024)}MB"},
+        )
@@ -4,19 +4,30 @@ FastAPI application with Firestore database for personal data management.
 """
 from __future__ import annotations
 
+import asyncio
 import logging
 import sys
 import time
+from contextlib import asynccontextmanager
 from typing import Callable
 
 from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
 
 from app.config import get_settings
 from dotenv import load_dotenv
 import os
 from app.api.routers import api_router
+from app.api.debug import debug_access_allowed
+from app.api.files import UPLOAD_BODY_LIMITS
+from app.profiling import finish_profile, finish_profile_after_body, profiled, start_profile
+from app.firestore_queries import set_request_scope, reset_request_scope
+from app.chat_status import get_status_coalescer
+from app.previews import get_preview_pipeline
+from app.upload_limits import UploadSizeLimitMiddleware
+from app import firestore_db, storage
 
 
 def setup_logging():
@@ -46,6 +57,27 @@ def setup_logging():
     logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
 
 
+async def warm_up_clients(readiness: dict) -> None:
+    """Build the Firestore and Storage clients and prime their connections, retrying until it succeeds."""
+    logger = logging.getLogger("myvault")
+    delay = 1.0
+    while True:
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(
+                asyncio.to_thread(firestore_db.warm_up),
+                asyncio.to_thread(storage.warm_up),
+            )
+            readiness.update(ready=True, error=None, warmup_ms=round((time.perf_counter() - start) * 1000, 1))
+            logger.info(f"Clients warmed up in {readiness['warmup_ms']}ms")
+            return
+        except Exception as e:
+            readiness["error"] = str(e)
+            logger.warning(f"Client warm-up failed, retrying in {delay:.0f}s: {str(e)}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60.0)
+
+
 def create_app() -> FastAPI:
     """Create and configure FastAPI application."""
     load_dotenv()
@@ -59,7 +91,27 @@ def create_app() -> FastAPI:
     logger.info(f"CORS origins: {settings.cors_origins}")
     logger.info(f"Using database: {settings.firestore_database_id}")
 
+    readiness = {"ready": not settings.warmup_on_startup, "error": None, "warmup_ms": None}
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # Pay credential discovery, channel setup and TLS handshakes before taking traffic
+        warmup_task = None
+        if settings.warmup_on_startup:
+            warmup_task = asyncio.create_task(warm_up_clients(readiness))
+            try:
+                await asyncio.wait_for(asyncio.shield(warmup_task), timeout=settings.warmup_timeout_seconds)
+            except asyncio.TimeoutError:
+                logger.warning("Client warm-up still running; serving with /health reporting not ready")
+        yield
+        if warmup_task is not None and not warmup_task.done():
+            warmup_task.cancel()
+        # Write chat status updates still in a coalescing window whose requests were cut short
+        await asyncio.to_thread(get_status_coalescer().flush)
+        get_preview_pipeline().shutdown()
+
     app = FastAPI(
+        lifespan=lifespan,
         title=settings.app_name,
         description="""
         ## MyVault Personal Data Management API
@@ -93,12 +145,18 @@ def create_app() -> FastAPI:
         }
     )
 
+    # Reject oversized uploads before the multipart body is spooled (inside CORS, so 413s carry its headers)
+    app.add_middleware(
+        UploadSizeLimitMiddleware,
+        limits={f"/api/files{path}": limit for path, limit in UPLOAD_BODY_LIMITS.items()},
+    )
+
     # Enhanced CORS configuration
     app.add_middleware(
         CORSMiddleware,
         allow_origins=settings.cors_origins,
         allow_credentials=True,
-        allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+        allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
         allow_headers=["*"],
         expose_headers=["*"]
     )
@@ -119,7 +177,29 @@ def create_app() -> FastAPI:
         except Exception as e:
             logger.warning(f"Error logging request details: {str(e)}")
 
-        response = await call_next(request)
+        scope_token = set_request_scope(request.scope)
+        profile = None
+        if settings.profile_all_requests or (
+            "x-profile-request" in request.headers
+            and debug_access_allowed(request.headers.get("x-profile-request"))
+        ):
+            profile, profile_token = start_profile(
+                request.method, request.url.path, settings.profile_sample_interval_ms
+            )
+
+        try:
+            response = await call_next(request)
+        except Exception:
+            if profile is not None:
+                finish_profile(profile, profile_token, 500)
+            raise
+        finally:
+            reset_request_scope(scope_token)
+        if profile is not None:
+            response.headers["X-Profile-Id"] = profile.id
+            response.body_iterator = finish_profile_after_body(
+                profile, profile_token, response.status_code, response.body_iterator
+            )
         process_time = time.time() - start_time
         try:
             status_indicator = "SUCCESS" if response.status_code < 400 else "ERROR"
@@ -132,6 +212,10 @@ def create_app() -> FastAPI:
         return response
 
     app.include_router(api_router, prefix="/api")
+    # Sync endpoints run in worker threads; attach those to the request's profile
+    for route in app.routes:
+        if isinstance(route, APIRoute) and not asyncio.iscoroutinefunction(route.dependant.call):
+            route.dependant.call = profiled(route.dependant.call)
 
     @app.get("/")
     async def root():
@@ -139,7 +223,16 @@ def create_app() -> FastAPI:
 
     @app.get("/health")
     async def health_check():
-        return {"status": "healthy", "environment": settings.environment, "database": settings.firestore_database_id}
+        body = {
+            "status": "healthy" if readiness["ready"] else "starting",
+            "environment": settings.environment,
+            "database": settings.firestore_database_id,
+            "warmup_ms": readiness["warmup_ms"],
+        }
+        if not readiness["ready"]:
+            body["error"] = readiness["error"]
+            return JSONResponse(status_code=503, content=body)
+        return body
 
     return app
 
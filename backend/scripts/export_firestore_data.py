@@ -1,177 +1,142 @@
 #!/usr/bin/env python3
 """
 Firestore Data Export Script
-Exports data from Firestore collections to JSON/CSV for analysis
+Exports data from Firestore collections to NDJSON/CSV (optionally gzipped) or typed
+Parquet/Arrow files (with pyarrow installed) for analysis.
+Documents are streamed page by page straight to the output files, so memory use
+does not grow with collection size. The incremental command exports only what
+changed since its previous run, plus tombstones for deleted documents.
 """
 
+import argparse
 import json
-import csv
 import os
 import sys
 from datetime import datetime
-from typing import Dict, List, Any
 import logging
 from pathlib import Path
 
 # Add the parent directory to the path so we can import app modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from app.export_schemas import EXPENSE_ANALYSIS_COLUMNS, EXPORT_COLLECTIONS, ID_COLUMN
 from app.firestore_db import get_db
+from app.service.export_service import (
+    ALL_EXPORT_FORMATS, EXPORT_FORMATS, INCREMENTAL_LAG_SECONDS, count_documents, export_collection,
+    export_collection_partitioned, export_filename, export_incremental, iter_collection_records, open_export_writer,
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+
 class FirestoreDataExporter:
-    def __init__(self, export_dir: str = "exports"):
+    def __init__(
+        self,
+        export_dir: str = "exports",
+        compress: bool = False,
+        partitions: int = 1,
+        workers: int = 4,
+        formats=EXPORT_FORMATS,
+    ):
         self.export_dir = Path(export_dir)
         self.export_dir.mkdir(exist_ok=True)
-        self.db = get_db()
-        
-    def export_collection_to_json(self, collection_name: str, filename: str = None):
-        """Export a Firestore collection to JSON"""
-        if not filename:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{collection_name}_{timestamp}.json"
-        
-        filepath = self.export_dir / filename
+        self.compress = compress
+        self.formats = list(formats)
+        self.partitions = partitions
+        self.workers = workers
+        self.db = get_db
         
-        logger.info(f"Exporting collection '{collection_name}' to {filepath}")
+    def _stem(self, name: str) -> str:
+        return f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+    def export_collection(self, collection_name: str, formats=None):
+        """Export a Firestore collection to every requested format in one streamed pass (per partition)"""
+        logger.info(f"Exporting collection '{collection_name}' to {self.export_dir}")
+        formats = formats or self.formats
         
         try:
             with self.db() as db:
-                # Get all documents from collection
-                docs = db.collection(collection_name).stream()
-                
-                data = []
-                for doc in docs:
-                    doc_data = doc.to_dict()
-                    doc_data['_id'] = doc.id  # Add document ID
-                    data.append(doc_data)
-                
-                # Write to JSON file
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, indent=2, default=str, ensure_ascii=False)
-                
-                logger.info(f"Exported {len(data)} documents to {filepath}")
-                return filepath
+                if self.partitions > 1:
+                    manifest = export_collection_partitioned(
+                        db, collection_name, self.export_dir, self.partitions, self.workers, formats,
+                        compress=self.compress, stem=self._stem(collection_name),
+                    )
+                    files = [str(self.export_dir / f) for part in manifest["partitions"] for f in part["files"]]
+                    result = {"collection": collection_name, "count": manifest["count"], "files": files + [manifest["manifest"]]}
+                else:
+                    result = export_collection(
+                        db, collection_name, self.export_dir, formats, compress=self.compress, stem=self._stem(collection_name)
+                    )
+                logger.info(f"Exported {result['count']} documents to {', '.join(result['files'])}")
+                return result
                 
         except Exception as e:
             logger.error(f"Failed to export collection '{collection_name}': {e}")
             raise
     
-    def export_collection_to_csv(self, collection_name: str, filename: str = None):
-        """Export a Firestore collection to CSV"""
-        if not filename:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{collection_name}_{timestamp}.csv"
-        
-        filepath = self.export_dir / filename
-        
-        logger.info(f"Exporting collection '{collection_name}' to {filepath}")
-        
-        try:
-            with self.db() as db:
-                # Get all documents from collection
-                docs = db.collection(collection_name).stream()
-                
-                data = []
-                fieldnames = set()
-                
-                # First pass: collect all data and find all field names
-                for doc in docs:
-                    doc_data = doc.to_dict()
-                    doc_data['_id'] = doc.id
-                    data.append(doc_data)
-                    fieldnames.update(doc_data.keys())
-                
-                # Convert to list and sort for consistent column order
-                fieldnames = sorted(list(fieldnames))
-                
-                # Write to CSV file
-                with open(filepath, 'w', newline='', encoding='utf-8') as f:
-                    writer = csv.DictWriter(f, fieldnames=fieldnames)
-                    writer.writeheader()
-                    
-                    for row in data:
-                        # Ensure all fields are present (fill missing with empty string)
-                        row_with_all_fields = {field: row.get(field, '') for field in fieldnames}
-                        writer.writerow(row_with_all_fields)
-                
-                logger.info(f"Exported {len(data)} documents to {filepath}")
-                return filepath
-                
-        except Exception as e:
-            logger.error(f"Failed to export collection '{collection_name}': {e}")
-            raise
+    def export_collection_to_json(self, collection_name: str):
+        """Export a Firestore collection to NDJSON (one document per line)"""
+        return self.export_collection(collection_name, ["ndjson"])["files"][0]
+    
+    def export_collection_to_csv(self, collection_name: str):
+        """Export a Firestore collection to CSV with the collection's declared columns"""
+        return self.export_collection(collection_name, ["csv"])["files"][0]
     
     def export_expenses_for_analysis(self):
-        """Export expenses with enhanced analysis fields"""
+        """Export expenses with enhanced analysis fields (typed columns in Parquet/Arrow)"""
         logger.info("Exporting expenses for analysis...")
         
         try:
             with self.db() as db:
-                # Get all expenses
-                expenses = db.collection("expenses").stream()
-                
-                analysis_data = []
-                for expense in expenses:
-                    expense_data = expense.to_dict()
-                    
-                    # Parse content field if it's JSON
-                    content = {}
-                    if expense_data.get('content'):
-                        try:
-                            content = json.loads(expense_data['content'])
-                        except:
-                            content = {}
-                    
-                    # Create analysis-friendly record
-                    analysis_record = {
-                        'id': expense.id,
-                        'title': expense_data.get('title', ''),
-                        'amount': expense_data.get('amount', 0),
-                        'category': expense_data.get('category', ''),
-                        'is_income': expense_data.get('is_income', False),
-                        'occurred_on': expense_data.get('occurred_on', ''),
-                        'created_at': expense_data.get('created_at', ''),
-                        'updated_at': expense_data.get('updated_at', ''),
-                        'original_id': content.get('original_id', ''),
-                        'account': content.get('account', ''),
-                        'sign': content.get('sign', ''),
-                        'time': content.get('time', ''),
-                        'confirmed': content.get('confirmed', False),
-                        'transfer': content.get('transfer', False),
-                        'date_idx': content.get('date_idx', ''),
-                        'migrated_from': content.get('migrated_from', ''),
-                        'migrated_at': content.get('migrated_at', '')
-                    }
-                    
-                    analysis_data.append(analysis_record)
-                
-                # Export to both JSON and CSV
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                stem = self._stem("expenses_analysis")
+                files = [self.export_dir / export_filename(stem, fmt, self.compress) for fmt in self.formats]
+                writers = []
+                try:
+                    for path, fmt in zip(files, self.formats):
+                        writers.append(open_export_writer(path, fmt, EXPENSE_ANALYSIS_COLUMNS, self.compress))
+                    for expense_data in iter_collection_records(db, "expenses"):
+                        # Only migrated expenses carry a JSON object in content
+                        content = {}
+                        raw = expense_data.get('content')
+                        if isinstance(raw, str) and raw.startswith('{'):
+                            try:
+                                content = json.loads(raw)
+                            except ValueError:
+                                content = {}
+                        
+                        # Create analysis-friendly record
+                        analysis_record = {
+                            'id': expense_data[ID_COLUMN],
+                            'title': expense_data.get('title', ''),
+                            'amount': expense_data.get('amount', 0),
+                            'category': expense_data.get('category', ''),
+                            'is_income': expense_data.get('is_income', False),
+                            'occurred_on': expense_data.get('occurred_on', ''),
+                            'created_at': expense_data.get('created_at', ''),
+                            'updated_at': expense_data.get('updated_at', ''),
+                            'original_id': content.get('original_id', ''),
+                            'account': content.get('account', ''),
+                            'sign': content.get('sign', ''),
+                            'time': content.get('time', ''),
+                            'confirmed': content.get('confirmed', False),
+                            'transfer': content.get('transfer', False),
+                            'date_idx': content.get('date_idx', ''),
+                            'migrated_from': content.get('migrated_from', ''),
+                            'migrated_at': content.get('migrated_at', '')
+                        }
+                        for writer in writers:
+                            writer.write(analysis_record)
+                finally:
+                    for writer in writers:
+                        writer.close()
                 
-                json_file = self.export_dir / f"expenses_analysis_{timestamp}.json"
-                csv_file = self.export_dir / f"expenses_analysis_{timestamp}.csv"
+                logger.info(f"Exported {writers[0].count if writers else 0} expenses for analysis")
+                for path in files:
+                    logger.info(f"Written: {path}")
                 
-                # Write JSON
-                with open(json_file, 'w', encoding='utf-8') as f:
-                    json.dump(analysis_data, f, indent=2, default=str, ensure_ascii=False)
-                
-                # Write CSV
-                if analysis_data:
-                    fieldnames = analysis_data[0].keys()
-                    with open(csv_file, 'w', newline='', encoding='utf-8') as f:
-                        writer = csv.DictWriter(f, fieldnames=fieldnames)
-                        writer.writeheader()
-                        writer.writerows(analysis_data)
-                
-                logger.info(f"Exported {len(analysis_data)} expenses for analysis")
-                logger.info(f"JSON: {json_file}")
-                logger.info(f"CSV: {csv_file}")
-                
-                return json_file, csv_file
+                return files
                 
         except Exception as e:
             logger.error(f"Failed to export expenses for analysis: {e}")
@@ -179,22 +144,11 @@ class FirestoreDataExporter:
     
     def export_all_collections(self):
         """Export all main collections"""
-        collections = [
-            'expenses',
-            'tasks', 
-            'chat',
-            'files',
-            'items',
-            'migration_logs'
-        ]
-        
         exported_files = []
         
-        for collection in collections:
+        for collection in EXPORT_COLLECTIONS:
             try:
-                json_file = self.export_collection_to_json(collection)
-                csv_file = self.export_collection_to_csv(collection)
-                exported_files.extend([json_file, csv_file])
+                exported_files.extend(self.export_collection(collection)["files"])
                 
             except Exception as e:
                 logger.warning(f"Failed to export collection '{collection}': {e}")
@@ -202,6 +156,21 @@ class FirestoreDataExporter:
         
         logger.info(f"Export completed. Files saved to: {self.export_dir}")
         return exported_files
+
+    def export_incremental(self, collections=EXPORT_COLLECTIONS, lag_seconds: int = INCREMENTAL_LAG_SECONDS):
+        """Export documents changed since the last incremental run, plus tombstones"""
+        try:
+            with self.db() as db:
+                run = export_incremental(
+                    db, self.export_dir, collections, self.formats, compress=self.compress, lag_seconds=lag_seconds
+                )
+            for entry in run["collections"]:
+                logger.info(f"{entry['collection']}: {entry['count']} documents ({entry['mode']})")
+            logger.info(f"Incremental export up to {run['cutoff']} recorded in {run['manifest']}")
+            return run
+        except Exception as e:
+            logger.error(f"Incremental export failed: {e}")
+            raise
     
     def create_export_summary(self):
         """Create a summary of all exported data"""
@@ -215,12 +184,10 @@ class FirestoreDataExporter:
         
         try:
             with self.db() as db:
-                # Get collection stats
-                collections = ['expenses', 'tasks', 'chat', 'files', 'items']
-                
-                for collection in collections:
+                # Get collection stats (count() aggregation, no documents read back)
+                for collection in EXPORT_COLLECTIONS:
                     try:
-                        count = len(list(db.collection(collection).stream()))
+                        count = count_documents(db, collection)
                         summary["collections_exported"].append({
                             "name": collection,
                             "record_count": count
@@ -242,36 +209,53 @@ class FirestoreDataExporter:
             raise
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage:")
-        print("  python export_firestore_data.py all                    # Export all collections")
-        print("  python export_firestore_data.py expenses               # Export expenses only")
-        print("  python export_firestore_data.py analysis               # Export expenses for analysis")
-        print("  python export_firestore_data.py collection <name>      # Export specific collection")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        description="Export Firestore collections to NDJSON/CSV",
+        epilog=(
+            "commands: all (every collection), expenses (expenses only), "
+            "analysis (expenses for analysis), collection <name> (one collection), "
+            "incremental [name] (changes since the last incremental run)"
+        ),
+    )
+    parser.add_argument("command", choices=["all", "expenses", "analysis", "collection", "incremental"])
+    parser.add_argument("name", nargs="?", help="Collection name for 'collection' (optional for 'incremental')")
+    parser.add_argument(
+        "--format", dest="formats", action="append", choices=ALL_EXPORT_FORMATS,
+        help="Output format, repeatable (default: ndjson and csv; parquet/arrow need pyarrow)",
+    )
+    parser.add_argument("--gzip", action="store_true", help="Write .gz compressed files (zstd inside Arrow files)")
+    parser.add_argument("--export-dir", default="exports", help="Output directory")
+    parser.add_argument("--partitions", type=int, default=1, help="Split each collection into this many parts (writes a manifest)")
+    parser.add_argument("--workers", type=int, default=4, help="Parts exported concurrently")
+    parser.add_argument(
+        "--lag", type=int, default=INCREMENTAL_LAG_SECONDS,
+        help="Incremental runs stop this many seconds before now (leaves room for in-flight writes)",
+    )
+    args = parser.parse_args()
+    if args.command == "collection" and not args.name:
+        parser.error("'collection' needs a collection name")
     
-    exporter = FirestoreDataExporter()
+    exporter = FirestoreDataExporter(
+        args.export_dir, compress=args.gzip, partitions=args.partitions, workers=args.workers,
+        formats=args.formats or EXPORT_FORMATS,
+    )
     
     try:
-        if sys.argv[1] == "all":
+        if args.command == "all":
             exporter.export_all_collections()
             exporter.create_export_summary()
             
-        elif sys.argv[1] == "expenses":
-            exporter.export_collection_to_json("expenses")
-            exporter.export_collection_to_csv("expenses")
+        elif args.command == "expenses":
+            exporter.export_collection("expenses")
             
-        elif sys.argv[1] == "analysis":
+        elif args.command == "analysis":
             exporter.export_expenses_for_analysis()
             
-        elif sys.argv[1] == "collection" and len(sys.argv) == 3:
-            collection_name = sys.argv[2]
-            exporter.export_collection_to_json(collection_name)
-            exporter.export_collection_to_csv(collection_name)
-            
-        else:
-            print("Invalid command. Use 'all', 'expenses', 'analysis', or 'collection <name>'")
-            sys.exit(1)
+        elif args.command == "collection":
+            exporter.export_collection(args.name)
+
+        elif args.command == "incremental":
+            exporter.export_incremental([args.name] if args.name else EXPORT_COLLECTIONS, args.lag)
         
         print(f"Export completed successfully! Files saved to: {exporter.export_dir}")
         
@@ -281,4 +265,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
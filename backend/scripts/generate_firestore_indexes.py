@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Firestore Composite Index Generator
+Derives firestore.indexes.json from the query shapes built in app/service and app/api
+"""
+
+import argparse
+import ast
+import json
+import logging
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SOURCE_DIRS = [BACKEND_DIR / "app" / "service", BACKEND_DIR / "app" / "api"]
+DEFAULT_OUTPUT = BACKEND_DIR.parent / "firestore.indexes.json"
+
+EQUALITY_OPS = {"==", "in", "array-contains", "array-contains-any"}
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def _literal(node) -> Optional[str]:
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    return None
+
+
+def _direction(call: ast.Call) -> str:
+    for kw in call.keywords:
+        if kw.arg == "direction":
+            text = _literal(kw.value) or (kw.value.attr if isinstance(kw.value, ast.Attribute) else "")
+            return "DESCENDING" if "DESC" in text.upper() else "ASCENDING"
+    return "ASCENDING"
+
+
+def _where_filter(call: ast.Call) -> Optional[Tuple[str, str]]:
+    """Extract (field, op) from .where("f", "op", v) or .where(filter=FieldFilter("f", "op", v))."""
+    args = call.args
+    for kw in call.keywords:
+        if kw.arg == "filter" and isinstance(kw.value, ast.Call):
+            args = kw.value.args
+    if len(args) >= 2 and _literal(args[0]) and _literal(args[1]):
+        return _literal(args[0]), _literal(args[1])
+    return None
+
+
+class QueryShapeCollector(ast.NodeVisitor):
+    """Collects, per function and collection, the filters and orderings used on its queries.
+
+    Functions that build and return a filtered query (e.g. _filtered_expenses) are
+    reported in `helpers`; given those, a second pass folds a helper's filters into
+    the shape of each function that orders and runs the query it returns.
+    """
+
+    def __init__(self, module: str, helpers: Optional[Dict[str, Dict]] = None):
+        self.module = module
+        self.shapes: List[Dict] = []
+        self.helpers: Dict[str, Dict] = dict(helpers or {})
+
+    def visit_FunctionDef(self, node):
+        variables: Dict[str, str] = {}
+        shapes: Dict[str, Dict] = {}
+
+        def shape_for(collection: str) -> Dict:
+            return shapes.setdefault(collection, {"equality": set(), "range": set(), "orders": []})
+
+        def collection_of(expr) -> Optional[str]:
+            while True:
+                if isinstance(expr, ast.Call):
+                    func = expr.func
+                    if isinstance(func, ast.Attribute) and func.attr in ("collection", "collection_group"):
+                        return _literal(expr.args[0]) if expr.args else None
+                    if isinstance(func, ast.Name) and func.id in self.helpers:
+                        helper = self.helpers[func.id]
+                        shape = shape_for(helper["collection"])
+                        shape["equality"] |= helper["equality"]
+                        shape["range"] |= helper["range"]
+                        return helper["collection"]
+                    expr = func
+                elif isinstance(expr, ast.Attribute):
+                    expr = expr.value
+                elif isinstance(expr, ast.Name):
+                    return variables.get(expr.id)
+                else:
+                    return None
+
+        # Resolve query variables first so reassignments like q = q.where(...) map to their collection
+        for stmt in ast.walk(node):
+            if isinstance(stmt, ast.Assign) and len(stmt.targets) == 1 and isinstance(stmt.targets[0], ast.Name):
+                collection = collection_of(stmt.value)
+                if collection:
+                    variables[stmt.targets[0].id] = collection
+
+        for call in ast.walk(node):
+            if not (isinstance(call, ast.Call) and isinstance(call.func, ast.Attribute)):
+                continue
+            if call.func.attr not in ("where", "order_by"):
+                continue
+            collection = collection_of(call.func.value)
+            if not collection:
+                continue
+            shape = shape_for(collection)
+            if call.func.attr == "where":
+                found = _where_filter(call)
+                if found:
+                    field, op = found
+                    (shape["equality"] if op in EQUALITY_OPS else shape["range"]).add(field)
+            else:
+                field = _literal(call.args[0]) if call.args else None
+                if field and field != "__name__" and field not in [f for f, _ in shape["orders"]]:
+                    shape["orders"].append((field, _direction(call)))
+
+        returned = next(
+            (
+                variables.get(stmt.value.id)
+                for stmt in ast.walk(node)
+                if isinstance(stmt, ast.Return) and isinstance(stmt.value, ast.Name)
+            ),
+            None,
+        )
+        for collection, shape in shapes.items():
+            if collection == returned and not shape["orders"]:
+                # Query builder: its filters count where callers order and run the query
+                self.helpers[node.name] = {"collection": collection, "equality": shape["equality"], "range": shape["range"]}
+                continue
+            self.shapes.append({"function": f"{self.module}.{node.name}", "collection": collection, **shape})
+        self.generic_visit(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+
+def composite_indexes(shape: Dict) -> List[Tuple[str, Tuple[Tuple[str, str], ...]]]:
+    """Composite indexes needed by one query shape.
+
+    Equality filters combined with an ordering need one index per equality field
+    (Firestore merges them), plus one covering all equality fields together.
+    """
+    sort_fields = list(shape["orders"])
+    for field in sorted(shape["range"]):
+        if field not in [f for f, _ in sort_fields]:
+            sort_fields.insert(0, (field, "ASCENDING"))
+    equality = sorted(f for f in shape["equality"] if f not in [s for s, _ in sort_fields])
+    if not sort_fields or not equality:
+        return []
+    groups = [[field] for field in equality]
+    if len(equality) > 1:
+        groups.append(equality)
+    return [
+        (shape["collection"], tuple((field, "ASCENDING") for field in group) + tuple(sort_fields))
+        for group in groups
+    ]
+
+
+def collect_shapes() -> List[Dict]:
+    shapes: List[Dict] = []
+    for directory in SOURCE_DIRS:
+        for path in sorted(directory.glob("*.py")):
+            module = path.relative_to(BACKEND_DIR).with_suffix("").as_posix().replace("/", ".")
+            tree = ast.parse(path.read_text(encoding="utf-8"), filename=str(path))
+            helpers = QueryShapeCollector(module)
+            helpers.visit(tree)
+            collector = QueryShapeCollector(module, helpers.helpers)
+            collector.visit(tree)
+            shapes.extend(collector.shapes)
+    return shapes
+
+
+def build_manifest(shapes: List[Dict]) -> Dict:
+    seen = set()
+    indexes = []
+    for shape in shapes:
+        for collection, fields in composite_indexes(shape):
+            if (collection, fields) in seen:
+                continue
+            seen.add((collection, fields))
+            indexes.append({
+                "collectionGroup": collection,
+                "queryScope": "COLLECTION",
+                "fields": [{"fieldPath": field, "order": order} for field, order in fields],
+            })
+    indexes.sort(key=lambda i: (i["collectionGroup"], [f["fieldPath"] for f in i["fields"]]))
+    return {"indexes": indexes, "fieldOverrides": []}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate firestore.indexes.json from backend query shapes")
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT), help="Manifest path (default: repo root)")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero if the manifest is out of date")
+    parser.add_argument("--verbose", action="store_true", help="Print the query shapes found")
+    args = parser.parse_args()
+
+    shapes = collect_shapes()
+    if args.verbose:
+        for shape in shapes:
+            logger.info(
+                f"{shape['function']}: {shape['collection']} eq={sorted(shape['equality'])} "
+                f"range={sorted(shape['range'])} order={shape['orders']}"
+            )
+
+    manifest = build_manifest(shapes)
+    rendered = json.dumps(manifest, indent=2) + "\n"
+    output = Path(args.output)
+
+    if args.check:
+        current = output.read_text(encoding="utf-8") if output.exists() else ""
+        if current != rendered:
+            print(f"{output} is out of date; run scripts/generate_firestore_indexes.py")
+            sys.exit(1)
+        print(f"{output} is up to date ({len(manifest['indexes'])} indexes)")
+        return
+
+    output.write_text(rendered, encoding="utf-8")
+    print(f"Wrote {len(manifest['indexes'])} composite indexes to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Synthetic Data Generator
+Fills a (non-production) Firestore database with realistic volumes of expenses,
+tasks, conversations, files and notes for load and scale testing. Output is
+deterministic for a given seed, dates and sizes, so benchmark runs are
+reproducible; every document ID starts with "synthetic_".
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+from datetime import date
+
+# Add the parent directory to the path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.firestore_db import get_db
+from app.service.import_service import INITIAL_WRITE_RATE, WriteRateLimiter
+from app.service.synthetic_service import SYNTHETIC_KINDS, generate_synthetic_data
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate deterministic synthetic data for load testing")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed (same seed and options = same documents)")
+    parser.add_argument("--years", type=float, default=3.0, help="Years of history to generate")
+    parser.add_argument("--until", type=date.fromisoformat, default=None, help="Last day of the history, YYYY-MM-DD (default: today)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier on every volume (10 = ten times the defaults)")
+    parser.add_argument("--tasks", type=int, default=500, help="Tasks at scale 1")
+    parser.add_argument("--conversations", type=int, default=1000, help="Conversations at scale 1")
+    parser.add_argument("--files", type=int, default=300, help="Files at scale 1")
+    parser.add_argument("--notes", type=int, default=300, help="Notes and links at scale 1")
+    parser.add_argument("--only", action="append", choices=SYNTHETIC_KINDS, help="Generate only these kinds (repeatable)")
+    parser.add_argument("--writers", type=int, default=8, help="Concurrent batch writers")
+    parser.add_argument("--initial-rate", type=float, default=INITIAL_WRITE_RATE, help="Starting writes per second")
+    parser.add_argument("--max-rate", type=float, default=None, help="Cap on writes per second while ramping up")
+    args = parser.parse_args()
+
+    if args.until is None:
+        logger.info("No --until given: dates are relative to today, pass --until to reproduce this run exactly")
+
+    try:
+        with get_db() as db:
+            stats = generate_synthetic_data(
+                db,
+                seed=args.seed,
+                years=args.years,
+                until=args.until,
+                scale=args.scale,
+                tasks=int(args.tasks * args.scale),
+                conversations=int(args.conversations * args.scale),
+                files=int(args.files * args.scale),
+                notes=int(args.notes * args.scale),
+                kinds=tuple(args.only or SYNTHETIC_KINDS),
+                writers=args.writers,
+                limiter=WriteRateLimiter(args.initial_rate, args.max_rate),
+            )
+        print(json.dumps(stats, indent=2))
+        print("Synthetic data generated successfully!")
+    except Exception as e:
+        print(f"Generation failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
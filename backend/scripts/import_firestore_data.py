@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Firestore Data Import
+Restores documents from export files (NDJSON, Parquet or Arrow) under their
+original IDs, e.g. to rebuild a staging database from a production export.
+Writes are spread over concurrent batch writers that ramp up within Firestore's
+write-rate guidance and back off when throttled; progress is checkpointed so
+an interrupted import resumes where it stopped.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+
+# Add the parent directory to the path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.firestore_db import get_db
+from app.service.import_service import (
+    IMPORT_SUFFIXES, INITIAL_WRITE_RATE, WriteRateLimiter, collection_for_file, estimate_import, import_file,
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def expand_paths(paths: list[str], collection: str = None) -> list[Path]:
+    """
+    Files as given; directories expand to their export files in the order they were
+    written. Without a target `collection`, directory files whose name isn't an
+    exported collection (e.g. expenses_analysis) are skipped.
+    """
+    files = []
+    for raw in paths:
+        path = Path(raw)
+        if path.is_dir():
+            found = [p for p in path.iterdir() if p.name.endswith(IMPORT_SUFFIXES)]
+            if collection is None:
+                for p in found:
+                    if collection_for_file(p) is None:
+                        logger.warning(f"Skipping {p.name}: not an export of a known collection (use --collection to import it)")
+                found = [p for p in found if collection_for_file(p) is not None]
+            files.extend(sorted(found, key=lambda p: (p.stat().st_mtime, p.name)))
+        else:
+            files.append(path)
+    return files
+
+
+def load_checkpoint(path: Path) -> dict:
+    if not path.exists():
+        return {"files": {}}
+    checkpoint = json.loads(path.read_text(encoding="utf-8"))
+    logger.info(f"Resuming from {path}")
+    return checkpoint
+
+
+def save_checkpoint(path: Path, checkpoint: dict):
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(checkpoint, indent=2), encoding="utf-8")
+    tmp.replace(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import export files back into Firestore")
+    parser.add_argument("paths", nargs="+", help="Export files or directories (NDJSON, Parquet, Arrow)")
+    parser.add_argument("--collection", default=None, help="Target collection (default: taken from each file name)")
+    parser.add_argument("--checkpoint", default="import.checkpoint.json", help="Checkpoint file")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and import everything again")
+    parser.add_argument("--writers", type=int, default=8, help="Concurrent batch writers")
+    parser.add_argument("--initial-rate", type=float, default=INITIAL_WRITE_RATE, help="Starting writes per second")
+    parser.add_argument("--max-rate", type=float, default=None, help="Cap on writes per second while ramping up")
+    parser.add_argument("--dry-run", action="store_true", help="Decode the files and estimate the import time without writing")
+    args = parser.parse_args()
+
+    files = expand_paths(args.paths, args.collection)
+    missing = [str(path) for path in files if not path.exists()]
+    if missing:
+        print(f"Files not found: {', '.join(missing)}")
+        sys.exit(1)
+    unknown = [path.name for path in files if args.collection is None and collection_for_file(path) is None]
+    if unknown:
+        print(f"Not exports of a known collection: {', '.join(unknown)}; pass --collection to import them")
+        sys.exit(1)
+
+    if args.dry_run:
+        print(json.dumps(estimate_import(files, args.initial_rate, args.max_rate, args.collection), indent=2))
+        return
+
+    checkpoint_path = Path(args.checkpoint)
+    if args.restart and checkpoint_path.exists():
+        checkpoint_path.unlink()
+    checkpoint = load_checkpoint(checkpoint_path)
+    limiter = WriteRateLimiter(args.initial_rate, args.max_rate)
+
+    results = []
+    try:
+        with get_db() as db:
+            for path in files:
+                state = checkpoint["files"].setdefault(str(path.resolve()), {})
+                if state.get("complete"):
+                    logger.info(f"Skipping {path.name}: already imported")
+                    continue
+                logger.info(f"Importing {path.name}...")
+                stats = import_file(
+                    db,
+                    path,
+                    collection=args.collection,
+                    checkpoint=state,
+                    on_checkpoint=lambda _: save_checkpoint(checkpoint_path, checkpoint),
+                    writers=args.writers,
+                    limiter=limiter,
+                )
+                # Files with failed batches stay incomplete: the next run retries them
+                state["complete"] = not state.get("failed_ids")
+                save_checkpoint(checkpoint_path, checkpoint)
+                logger.info(
+                    f"Imported {stats['written']} documents into '{stats['collection']}' at "
+                    f"{stats['writes_per_second']} writes/s ({stats['failed']} failed, {stats['invalid']} invalid)"
+                )
+                results.append({"file": str(path), **stats})
+    except Exception as e:
+        print(f"Import failed: {e}")
+        print(f"Re-run the same command to resume from {checkpoint_path}")
+        sys.exit(1)
+
+    print(json.dumps(results, indent=2))
+    incomplete = [path for path, state in checkpoint["files"].items() if state.get("failed_ids")]
+    if incomplete:
+        print(f"Import finished with failed batches in {len(incomplete)} file(s); re-run the same command to retry them")
+        sys.exit(1)
+    print("Import completed successfully!")
+
+
+if __name__ == "__main__":
+    main()
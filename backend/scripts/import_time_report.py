@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Import Time Report
+Measures the cold-start import cost of the backend with `python -X importtime`
+and lists the heaviest packages, so start-up regressions on Cloud Run are visible
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Imported lazily by the app (first Firestore/Storage use or the startup warm-up)
+DEFERRED_MODULES = ["google.cloud.firestore", "google.cloud.storage"]
+
+
+def measure(statement: str) -> Tuple[float, List[Tuple[str, int, int]]]:
+    """Run `statement` in a fresh interpreter; return wall time (ms) and (module, self_us, cumulative_us) rows."""
+    env = dict(os.environ, PYTHONPATH=str(BACKEND_DIR), WARMUP_ON_STARTUP="false")
+    with tempfile.TemporaryDirectory() as workdir:  # main.py writes myvault.log into the cwd
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", statement],
+            cwd=workdir, env=env, capture_output=True, text=True,
+        )
+        wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr else "import failed")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return wall_ms, rows
+
+
+def by_package(rows: List[Tuple[str, int, int]]) -> Dict[str, int]:
+    totals: Dict[str, int] = {}
+    for name, self_us, _ in rows:
+        parts = name.split(".")
+        package = ".".join(parts[:3]) if parts[0] == "google" else parts[0]
+        totals[package] = totals.get(package, 0) + self_us
+    return totals
+
+
+def print_report(title: str, wall_ms: float, rows: List[Tuple[str, int, int]], top: int):
+    total_ms = sum(self_us for _, self_us, _ in rows) / 1000
+    print(f"\n{title}")
+    print(f"  interpreter wall time: {wall_ms:8.1f} ms")
+    print(f"  import time (sum):     {total_ms:8.1f} ms across {len(rows)} modules")
+    print(f"  {'package':<40} {'ms':>8} {'share':>7}")
+    for package, self_us in sorted(by_package(rows).items(), key=lambda kv: kv[1], reverse=True)[:top]:
+        print(f"  {package:<40} {self_us / 1000:8.1f} {self_us / 1000 / total_ms:7.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report backend cold-start import time")
+    parser.add_argument("--top", type=int, default=15, help="Number of packages to list")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per measurement; the fastest is reported")
+    args = parser.parse_args()
+
+    app_runs = [measure("import main") for _ in range(args.runs)]
+    print_report("Application import (import main)", *min(app_runs, key=lambda r: r[0]), args.top)
+
+    deferred = "import main; " + "; ".join(f"import {m}" for m in DEFERRED_MODULES)
+    sdk_runs = [measure(deferred) for _ in range(args.runs)]
+    print_report("Application plus deferred Google Cloud SDKs", *min(sdk_runs, key=lambda r: r[0]), args.top)
+
+
+if __name__ == "__main__":
+    main()
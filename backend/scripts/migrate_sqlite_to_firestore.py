@@ -1,32 +1,39 @@
 #!/usr/bin/env python3
 """
 SQLite to Firestore Migration Script
-Migrates financial data from SQLite to Firestore collections
+Migrates financial data from SQLite to Firestore collections.
+Movements are streamed, transformed in parallel and written in full batches by
+several writers; progress is checkpointed so an interrupted run resumes where it
+stopped, and re-running never creates duplicates.
 """
 
-import sqlite3
+import argparse
 import json
 import os
+import sqlite3
 import sys
 from datetime import datetime
-from typing import Dict, List, Any
+from pathlib import Path
 import logging
 
 # Add the parent directory to the path so we can import app modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.firestore_db import get_db
-from app.schemas import ExpenseCreate, TaskCreate, ItemCreate
+from app.service.migration_service import migrate_movements, migrate_currencies
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+
 class SQLiteToFirestoreMigrator:
-    def __init__(self, sqlite_path: str):
+    def __init__(self, sqlite_path: str, checkpoint_path: str, **options):
         self.sqlite_path = sqlite_path
-        self.db = get_db()
-        
+        self.checkpoint_path = Path(checkpoint_path)
+        self.options = options
+        self.db = get_db
+
     def connect_sqlite(self):
         """Connect to SQLite database"""
         try:
@@ -36,174 +43,123 @@ class SQLiteToFirestoreMigrator:
         except Exception as e:
             logger.error(f"Failed to connect to SQLite: {e}")
             raise
-    
-    def migrate_movements_to_expenses(self):
+
+    def load_checkpoint(self) -> dict:
+        if not self.checkpoint_path.exists():
+            return {}
+        checkpoint = json.loads(self.checkpoint_path.read_text(encoding="utf-8"))
+        logger.info(f"Resuming from {self.checkpoint_path}: {checkpoint.get('migrated', 0)} movements already migrated")
+        return checkpoint
+
+    def save_checkpoint(self, state: dict):
+        tmp = self.checkpoint_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(state, indent=2, default=str), encoding="utf-8")
+        tmp.replace(self.checkpoint_path)
+
+    def migrate_movements_to_expenses(self) -> dict:
         """Migrate table_movements to expenses collection"""
         logger.info("Starting migration of movements to expenses...")
-        
         conn = self.connect_sqlite()
-        cursor = conn.cursor()
-        
         try:
-            # Get all movements
-            cursor.execute("""
-                SELECT _id, account, category, amount, sign, detail, date, time, 
-                       confirmed, transfer, date_idx, picture, iso_code
-                FROM table_movements 
-                ORDER BY date_idx
-            """)
-            
-            movements = cursor.fetchall()
-            logger.info(f"Found {len(movements)} movements to migrate")
-            
-            migrated_count = 0
-            for movement in movements:
-                try:
-                    # Parse date and time
-                    date_str = movement['date']
-                    time_str = movement['time']
-                    
-                    # Convert DD/MM/YYYY to ISO format
-                    if date_str and '/' in date_str:
-                        day, month, year = date_str.split('/')
-                        date_iso = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-                    else:
-                        date_iso = datetime.now().isoformat()
-                    
-                    # Create expense record
-                    expense_data = {
-                        "title": movement['detail'] or f"{movement['category']} - {movement['amount']}",
-                        "amount": abs(float(movement['amount'])),
-                        "category": movement['category'] or "other",
-                        "is_income": movement['sign'] == "+",
-                        "occurred_on": date_iso,
-                        "content": json.dumps({
-                            "original_id": movement['_id'],
-                            "account": movement['account'],
-                            "sign": movement['sign'],
-                            "time": time_str,
-                            "confirmed": bool(movement['confirmed']),
-                            "transfer": bool(movement['transfer']),
-                            "date_idx": movement['date_idx'],
-                            "picture": movement['picture'],
-                            "iso_code": movement['iso_code'],
-                            "migrated_from": "sqlite",
-                            "migrated_at": datetime.now().isoformat()
-                        })
-                    }
-                    
-                    # Create expense in Firestore
-                    with self.db() as db:
-                        from app.service.expense_service import create_expense
-                        expense = create_expense(db, expense_data)
-                        logger.info(f"Migrated expense: {expense.get('id')} - {expense_data['title']}")
-                    
-                    migrated_count += 1
-                    
-                except Exception as e:
-                    logger.error(f"Failed to migrate movement {movement['_id']}: {e}")
-                    continue
-            
-            logger.info(f"Successfully migrated {migrated_count} expenses")
-            
+            with self.db() as db:
+                stats = migrate_movements(
+                    db,
+                    conn,
+                    checkpoint=self.load_checkpoint(),
+                    on_checkpoint=self.save_checkpoint,
+                    **self.options,
+                )
+            logger.info(
+                f"Migrated {stats['migrated']} movements at {stats['rows_per_second']} rows/s "
+                f"({stats['invalid']} invalid, {stats['failed']} failed)"
+            )
+            return stats
         finally:
             conn.close()
-    
-    def migrate_currencies_to_items(self):
+
+    def migrate_currencies_to_items(self) -> dict:
         """Migrate table_currencies to items collection"""
         logger.info("Starting migration of currencies to items...")
-        
         conn = self.connect_sqlite()
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute("SELECT * FROM table_currencies")
-            currencies = cursor.fetchall()
-            logger.info(f"Found {len(currencies)} currencies to migrate")
-            
-            migrated_count = 0
-            for currency in currencies:
-                try:
-                    item_data = {
-                        "kind": "currency",
-                        "title": f"Currency: {currency.get('code', 'Unknown')}",
-                        "content": json.dumps({
-                            "code": currency.get('code'),
-                            "name": currency.get('name'),
-                            "symbol": currency.get('symbol'),
-                            "rate": currency.get('rate'),
-                            "migrated_from": "sqlite",
-                            "migrated_at": datetime.now().isoformat()
-                        })
-                    }
-                    
-                    with self.db() as db:
-                        from app.service.expense_service import create_expense
-                        item = create_expense(db, item_data)
-                        logger.info(f"Migrated currency: {item.get('id')} - {item_data['title']}")
-                    
-                    migrated_count += 1
-                    
-                except Exception as e:
-                    logger.error(f"Failed to migrate currency {currency.get('_id')}: {e}")
-                    continue
-            
-            logger.info(f"Successfully migrated {migrated_count} currencies")
-            
+            with self.db() as db:
+                stats = migrate_currencies(db, conn)
+            logger.info(f"Successfully migrated {stats['migrated']} currencies")
+            return stats
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Skipping currencies: {e}")
+            return {"migrated": 0, "failed": 0}
         finally:
             conn.close()
-    
-    def create_migration_log(self):
+
+    def create_migration_log(self, movements: dict, currencies: dict):
         """Create a migration log entry"""
         migration_log = {
             "migration_date": datetime.now().isoformat(),
             "source_database": self.sqlite_path,
             "tables_migrated": ["table_movements", "table_currencies"],
-            "status": "completed"
+            "movements": movements,
+            "currencies": currencies,
+            "status": "completed" if not movements["failed"] else "completed_with_errors",
         }
-        
+
         with self.db() as db:
             db.collection("migration_logs").add(migration_log)
             logger.info("Migration log created")
-    
-    def run_migration(self):
+
+    def run_migration(self) -> dict:
         """Run the complete migration"""
         logger.info("Starting SQLite to Firestore migration...")
-        
+
         try:
-            # Migrate data
-            self.migrate_movements_to_expenses()
-            self.migrate_currencies_to_items()
-            
-            # Create migration log
-            self.create_migration_log()
-            
+            movements = self.migrate_movements_to_expenses()
+            currencies = self.migrate_currencies_to_items()
+            self.create_migration_log(movements, currencies)
+
             logger.info("Migration completed successfully!")
-            
+            return {"movements": movements, "currencies": currencies}
+
         except Exception as e:
             logger.error(f"Migration failed: {e}")
             raise
 
+
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python migrate_sqlite_to_firestore.py <path_to_sqlite_file>")
-        sys.exit(1)
-    
-    sqlite_path = sys.argv[1]
-    
-    if not os.path.exists(sqlite_path):
-        print(f"SQLite file not found: {sqlite_path}")
+    parser = argparse.ArgumentParser(description="Migrate a SQLite finance export to Firestore")
+    parser.add_argument("sqlite_path", help="Path to the SQLite file")
+    parser.add_argument("--checkpoint", default=None, help="Checkpoint file (default: <sqlite_path>.checkpoint.json)")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and migrate every row again")
+    parser.add_argument("--fetch-size", type=int, default=2000, help="Rows read from SQLite per fetch")
+    parser.add_argument("--transform-workers", type=int, default=2, help="Processes transforming rows (0 = inline)")
+    parser.add_argument("--writers", type=int, default=4, help="Concurrent Firestore batch writers")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after about this many rows; resume on the next run")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.sqlite_path):
+        print(f"SQLite file not found: {args.sqlite_path}")
         sys.exit(1)
-    
+
+    checkpoint_path = args.checkpoint or f"{args.sqlite_path}.checkpoint.json"
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
     try:
-        migrator = SQLiteToFirestoreMigrator(sqlite_path)
-        migrator.run_migration()
+        migrator = SQLiteToFirestoreMigrator(
+            args.sqlite_path,
+            checkpoint_path,
+            fetch_size=args.fetch_size,
+            transform_workers=args.transform_workers,
+            writers=args.writers,
+            limit=args.limit,
+        )
+        stats = migrator.run_migration()
+        print(json.dumps(stats, indent=2))
         print("Migration completed successfully!")
-        
+
     except Exception as e:
         print(f"Migration failed: {e}")
         sys.exit(1)
 
+
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Orphan Item Reconciliation
+Finds items whose expense, task, chat message or file document no longer exists,
+and reports or purges them. Safe to schedule (e.g. as a Cloud Run job).
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+
+# Add the parent directory to the path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.firestore_db import get_db, MAX_BATCH_WRITES
+from app.service.maintenance_service import reconcile_orphan_items
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report or purge orphaned items")
+    parser.add_argument(
+        "--purge",
+        action="store_true",
+        help="Delete orphans (default: report only). Only items created by the expense, chat and file write paths are "
+             "deleted; items of those kinds created directly with POST /api/items have no entity and are left alone",
+    )
+    parser.add_argument(
+        "--include-unowned",
+        action="store_true",
+        help="With --purge, also delete orphans without an owner stamp: items written before the stamp existed, "
+             "but also any expense/task/chat/file item created directly with POST /api/items",
+    )
+    parser.add_argument("--page-size", type=int, default=MAX_BATCH_WRITES, help="Items read per page")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after scanning this many items")
+    args = parser.parse_args()
+
+    with get_db() as db:
+        stats = reconcile_orphan_items(
+            db, purge=args.purge, page_size=args.page_size, limit=args.limit, include_unowned=args.include_unowned
+        )
+
+    if not args.purge and stats["orphans"]:
+        logger.info("Dry run: re-run with --purge to delete the orphans listed below")
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
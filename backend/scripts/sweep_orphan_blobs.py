@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Storage Orphan Sweeper
+Finds blobs in the Firebase Storage bucket that no `files` document references
+(left by failed deletes or uploads whose Firestore batch failed) and deletes them.
+Runs incrementally: progress is checkpointed after every page of blobs.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+
+# Add the parent directory to the path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.firestore_db import get_db
+from app.storage import get_bucket
+from app.service.maintenance_service import sweep_orphan_blobs
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find and delete storage blobs without a files document")
+    parser.add_argument("--delete", action="store_true", help="Delete orphaned blobs (default: report only)")
+    parser.add_argument("--grace-hours", type=float, default=24, help="Ignore blobs newer than this (in-flight uploads)")
+    parser.add_argument("--checkpoint", default="sweep_checkpoint.json", help="Checkpoint file for incremental runs")
+    parser.add_argument("--workers", type=int, default=8, help="Prefixes listed in parallel")
+    parser.add_argument("--max-blobs", type=int, default=None, help="Stop after this many blobs; resume on the next run")
+    args = parser.parse_args()
+
+    checkpoint_path = Path(args.checkpoint)
+    checkpoint = json.loads(checkpoint_path.read_text(encoding="utf-8")) if checkpoint_path.exists() else {}
+    if checkpoint.get("after") or checkpoint.get("done"):
+        logger.info(f"Resuming from {checkpoint_path}: {len(checkpoint.get('done', []))} prefixes already swept")
+
+    def save_checkpoint(state: dict):
+        tmp = checkpoint_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+        tmp.replace(checkpoint_path)
+
+    with get_db() as db:
+        stats = sweep_orphan_blobs(
+            db,
+            get_bucket(),
+            delete=args.delete,
+            grace_hours=args.grace_hours,
+            checkpoint=checkpoint,
+            on_checkpoint=save_checkpoint,
+            workers=args.workers,
+            max_blobs=args.max_blobs,
+        )
+
+    if not args.delete and stats["orphans"]:
+        logger.info("Dry run: re-run with --delete to remove the orphans listed below")
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()